@@ -16,6 +16,155 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
 
+import asyncio
+import bisect
+import contextlib
+import glob
+import hashlib
+import hmac
+import logging
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import time
+import warnings
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pytj.utils import write_atomically
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# The binary delta format, see Diff.to_delta(). The header is the magic,
+# the version and the type of the values, which is followed by the length
+# of the base list plus one as a varint, or 0 if it is not known, and the
+# opcodes. Every opcode is followed by a varint count and the insert opcode
+# by that many length prefixed values.
+DELTA_HEADER = struct.Struct('>4sBc')
+DELTA_MAGIC = b'PTJD'
+DELTA_VERSION = 1
+DELTA_COPY = 1
+DELTA_DELETE = 2
+DELTA_INSERT = 3
+
+
+def ignore_case(value):
+    """A key function for :class:`.Diff` to compare strings case
+    insensitively.
+
+    :param str value:
+    :return:
+    """
+    return value.lower()
+
+
+def ignore_whitespace(value):
+    """A key function for :class:`.Diff` to compare strings ignoring all the
+    white space characters.
+
+    :param str value:
+    :return:
+    """
+    return ''.join(value.split())
+
+
+# The patterns splitting the text into the tokens of the intraline diffs.
+# Every character belongs to a token, so the tokens join to the text again.
+TOKEN_PATTERNS = {
+    'word': re.compile(r'\w+|\s+|[^\w\s]'),
+    'char': re.compile(r'.', re.DOTALL),
+}
+
+
+def tokenize(text, granularity='word'):
+    """Splits the text into the tokens of the given granularity. A word
+    token is a run of word characters, a run of white space characters or a
+    single punctuation character, i.e. a CSV separator.
+
+    :param str text:
+    :param str granularity: ``"word"`` or ``"char"``.
+    :return: list
+    """
+    if granularity not in TOKEN_PATTERNS:
+        raise ValueError(
+            "Unknown granularity: %s, should be one of %s" % (
+                granularity, ', '.join(sorted(TOKEN_PATTERNS))
+            )
+        )
+    return TOKEN_PATTERNS[granularity].findall(text)
+
+
+class SequenceView(object):
+    """A read only view of the values[start:stop] range of a sequence. The
+    values are read from the sequence on demand and are never copied.
+
+    :param values: The viewed sequence. Anything that can be indexed with
+      integers can be viewed.
+    :param int start: The index of the first value.
+    :param int stop: The index after the last value.
+    """
+
+    __slots__ = ('values', 'start', 'stop')
+
+    def __init__(self, values, start, stop):
+        self.values = values
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        length = self.stop - self.start
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return SequenceView(
+                self.values, self.start + start, self.start + max(start, stop)
+            )
+
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('SequenceView index out of range')
+        return self.values[self.start + index]
+
+    def __iter__(self):
+        values = self.values
+        for i in range(self.start, self.stop):
+            yield values[i]
+
+    def __eq__(self, other):
+        try:
+            if len(other) != len(self):
+                return False
+        except TypeError:
+            return NotImplemented
+        return all(x == y for x, y in zip(self, other))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'SequenceView(%r)' % list(self)
+
 
 class Hunk(object):
     """A Hunk stores all information about a contiguous change of the
@@ -26,6 +175,9 @@ class Hunk(object):
     :param b_idx: _b_idx_ is the index in the B list.
     """
 
+    __slots__ = ('a_idx', 'b_idx', 'delete_values', 'insert_values',
+                 'refined')
+
     def __init__(self, a_idx, b_idx):
         self.a_idx = a_idx
 
@@ -36,6 +188,9 @@ class Hunk(object):
         # A list of values to be inserted into the B list at b_idx.
         self.insert_values = []
 
+        # The intraline Diffs by granularity and algorithm, see refine().
+        self.refined = None
+
     @property
     def insert(self):
         """Has the Hunk any values to insert?
@@ -51,29 +206,60 @@ class Hunk(object):
     def to_s(self):
         """I guess it is the string repr which should be __str__
         """
+        return ''.join(self.iter_lines())
+
+    def iter_lines(self):
+        """Yields the lines of the standard UNIX diff output of this Hunk one
+        by one, so they can be written to a file without building the whole
+        text first.
+        """
         show_separator = False
         if self.insert and self.delete:
-            s = "%sc%s\n" % (self.a_range, self.b_range)
+            yield "%sc%s\n" % (self.a_range, self.b_range)
             show_separator = True
         elif self.insert:
-            s = "%sa%s\n" % (self.a_idx, self.b_range)
+            yield "%sa%s\n" % (self.a_idx, self.b_range)
         else:
-            s = "%sd%s\n" % (self.a_range, self.b_idx)
+            yield "%sd%s\n" % (self.a_range, self.b_idx)
 
         for value in self.delete_values:
-            s = "%s< %s\n" % (s, value)
+            yield "< %s\n" % value
 
         if show_separator:
-            s = "%s---\n" % s
+            yield "---\n"
 
         for value in self.insert_values:
-            s = "%s> %s\n" % (s, value)
-
-        return s
+            yield "> %s\n" % value
 
     def inspect(self):
         print(self.to_s())
 
+    def refine(self, granularity='word', algorithm='lcs'):
+        """Returns the intraline Diff of this Hunk, which is the Diff of the
+        tokens of the deleted and inserted lines, see :func:`.tokenize`. The
+        lines are joined with a newline, so the line breaks are tokens too.
+
+        The Diff is computed the first time it is needed and is cached on the
+        Hunk, so only the refined Hunks are ever tokenized. The Hunks of the
+        returned Diff index the token lists, which are its ``a`` and ``b``
+        attributes.
+
+        :param str granularity: ``"word"`` or ``"char"``.
+        :param str algorithm: The algorithm of the intraline Diff.
+        :return: :class:`.Diff`
+        """
+        cache_key = (granularity, algorithm)
+        if self.refined is None:
+            self.refined = {}
+        elif cache_key in self.refined:
+            return self.refined[cache_key]
+
+        a = tokenize('\n'.join(self.delete_values), granularity)
+        b = tokenize('\n'.join(self.insert_values), granularity)
+        diff = Diff(a, b, algorithm=algorithm)
+        self.refined[cache_key] = diff
+        return diff
+
     @property
     def a_range(self):
         """No docstring at the origin
@@ -106,6 +292,247 @@ class Hunk(object):
             return "%s,%s" % (start_idx, end_idx)
 
 
+class CompactHunk(Hunk):
+    """A Hunk which only stores the ranges of the change. The deleted and
+    inserted values are returned as :class:`.SequenceView` instances, which
+    read the values from the A and B lists on demand.
+
+    :param int a_idx: The index in the A list.
+    :param int a_len: The number of values deleted from the A list.
+    :param int b_idx: The index in the B list.
+    :param int b_len: The number of values inserted from the B list.
+    :param a: The A list.
+    :param b: The B list.
+    """
+
+    __slots__ = ('a_len', 'b_len', 'a', 'b')
+
+    def __init__(self, a_idx, a_len, b_idx, b_len, a, b):
+        self.a_idx = a_idx
+        self.a_len = a_len
+        self.b_idx = b_idx
+        self.b_len = b_len
+        self.a = a
+        self.b = b
+        self.refined = None
+
+    @property
+    def delete_values(self):
+        """The values to be deleted from the A list starting at a_idx.
+        """
+        return SequenceView(self.a, self.a_idx, self.a_idx + self.a_len)
+
+    @property
+    def insert_values(self):
+        """The values to be inserted into the B list at b_idx.
+        """
+        return SequenceView(self.b, self.b_idx, self.b_idx + self.b_len)
+
+    @property
+    def insert(self):
+        """Has the Hunk any values to insert?
+        """
+        return self.b_len > 0
+
+    @property
+    def delete(self):
+        """Has the Hunk any values to be deleted?
+        """
+        return self.a_len > 0
+
+
+def restore_diff(algorithm, compact, ranges, delete_values, insert_values,
+                 approximate=False, key=None):
+    """Restores a pickled :class:`.Diff`, see :meth:`.Diff.__reduce__`.
+
+    :param str algorithm: The algorithm of the Diff.
+    :param bool compact: The compact flag of the Diff.
+    :param ranges: An array of (a_idx, a_len, b_idx, b_len) integers for
+      every Hunk.
+    :param list delete_values: The deleted values of all the Hunks.
+    :param list insert_values: The inserted values of all the Hunks.
+    :param bool approximate: The approximate flag of the Diff.
+    :param key: The key function of the Diff.
+    :return: :class:`.Diff`
+    """
+    diff = Diff.__new__(Diff)
+    diff.algorithm = algorithm
+    diff.key = key
+    diff.compact = compact
+    diff.stats = None
+    diff.budget = None
+    diff.approximate = approximate
+    diff.a = None
+    diff.b = None
+    diff.index_translation_table = None
+
+    hunks = []
+    if compact:
+        # The values are stored by their indices in the A and B lists so
+        # the Hunks can view into them.
+        a = {}
+        b = {}
+    a_pos = b_pos = 0
+    for i in range(0, len(ranges), 4):
+        a_idx, a_len, b_idx, b_len = ranges[i:i + 4]
+        if compact:
+            for j in range(a_len):
+                a[a_idx + j] = delete_values[a_pos + j]
+            for j in range(b_len):
+                b[b_idx + j] = insert_values[b_pos + j]
+            hunk = CompactHunk(a_idx, a_len, b_idx, b_len, a, b)
+        else:
+            hunk = Hunk(a_idx, b_idx)
+            hunk.delete_values = delete_values[a_pos:a_pos + a_len]
+            hunk.insert_values = insert_values[b_pos:b_pos + b_len]
+        a_pos += a_len
+        b_pos += b_len
+        hunks.append(hunk)
+    diff._hunks = hunks
+    return diff
+
+
+class DiffCancelled(Exception):
+    """Raised when a :class:`.Diff` is cancelled with the cancellation token
+    of its :class:`.DiffBudget`.
+    """
+
+
+class DiffBudget(object):
+    """Limits the work of a :class:`.Diff`. Pass an instance of this class
+    to a Diff with the ``budget`` argument.
+
+    The cost is the number of matching value pairs processed by the LCS
+    algorithm, the number of diagonals searched by the Myers algorithm or the
+    number of values in the ranges split by the patience and histogram
+    algorithms. When the cost or the time runs out the algorithm stops
+    searching for matches and the ranges that are not processed yet are
+    only matched at their common prefix and suffix, so the Diff is still
+    valid but not minimal, which is flagged by its ``approximate``
+    attribute.
+
+    :param int max_cost: The maximum cost or None.
+    :param float timeout: The maximum time in seconds or None.
+    :param cancel: An optional cancellation token, i.e. a
+      ``threading.Event``. If it is set from another thread,
+      :class:`.DiffCancelled` is raised while the Diff is computed.
+    """
+
+    # The number of the iterations of the loops, which don't add any cost,
+    # between the calls of check().
+    check_interval = 4096
+
+    def __init__(self, max_cost=None, timeout=None, cancel=None):
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.cancel = cancel
+        self.cost = 0
+        self.deadline = None
+        self.exhausted = False
+
+    def start(self):
+        """Resets the cost and starts the timer, so a DiffBudget can be used
+        for more than one Diff.
+        """
+        self.cost = 0
+        self.exhausted = False
+        self.deadline = None
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+
+    def spend(self, cost):
+        """Adds the given cost.
+
+        :param int cost:
+        :return: False if the budget is exhausted.
+        """
+        self.cost += cost
+        if self.max_cost is not None and self.cost > self.max_cost:
+            self.exhausted = True
+        return self.check()
+
+    def check(self):
+        """Checks the cancellation token and the time without adding any
+        cost. The algorithms call it every :attr:`.check_interval`
+        iterations of the loops that don't add any cost, i.e. the scan of
+        the values without a match.
+
+        :return: False if the budget is exhausted.
+        """
+        if self.cancel is not None and self.cancel.is_set():
+            raise DiffCancelled('The diff is cancelled')
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exhausted = True
+        return not self.exhausted
+
+
+class DiffStats(object):
+    """Collects the statistics of a :class:`.Diff` to profile pathological
+    inputs. Pass ``stats=True`` or an instance of this class to a Diff.
+
+    The counters that are not measured by the algorithm of the Diff are left
+    as None, i.e. the Myers algorithm doesn't build the reverse hash of the B
+    list. The timings are in seconds and stored by phase, which are
+    ``"intern"``, ``"index_translations"`` and ``"hunks"``.
+
+    When the index translations are computed the statistics are logged at the
+    DEBUG level to the ``pytj.algorithm_diff`` logger and passed to the
+    callback, the ``"hunks"`` timing is only added when the Hunks are created
+    later.
+
+    :param callback: An optional function called with the DiffStats.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.a_length = 0
+        self.b_length = 0
+        self.prefix_length = 0
+        self.suffix_length = 0
+        self.distinct_keys = None
+        self.match_pairs = None
+        self.lcs_length = 0
+        self.peak_thresholds = None
+        self.peak_links = None
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the time spent in the block to the timing of the given phase.
+
+        :param str name:
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = \
+                self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        """Returns the statistics as a dictionary.
+        """
+        return {
+            'a_length': self.a_length,
+            'b_length': self.b_length,
+            'prefix_length': self.prefix_length,
+            'suffix_length': self.suffix_length,
+            'distinct_keys': self.distinct_keys,
+            'match_pairs': self.match_pairs,
+            'lcs_length': self.lcs_length,
+            'peak_thresholds': self.peak_thresholds,
+            'peak_links': self.peak_links,
+            'timings': dict(self.timings),
+        }
+
+    def report(self):
+        """Logs the statistics and calls the callback.
+        """
+        logger.debug('diff stats: %s', self.as_dict())
+        if self.callback is not None:
+            self.callback(self)
+
+
 class Diff(object):
     """This class is an implementation of the classic UNIX diff functionality.
     It's based on an original implementation by Lars Christensen, which based
@@ -116,29 +543,600 @@ class Diff(object):
 
     :param a:
     :param b:
+    :param str algorithm: The name of the algorithm used to compute the index
+      translations. ``"lcs"`` (the default) is the Hunt-Szymanski style LCS
+      algorithm and ``"myers"`` is the linear space Myers O(ND) algorithm,
+      which runs in time proportional to the number of edits and is not
+      affected by the number of repeated values in the lists.
+      ``"patience"`` and ``"histogram"`` match the unique or rarely occurring
+      values first and split the lists at them, which suits the sources and
+      reports full of repeated boilerplate lines, see
+      :meth:`.compute_patience_index_translations` and
+      :meth:`.compute_histogram_index_translations`.
+    :param key: An optional function returning the value that is used to
+      compare the values of the lists, i.e. :func:`.ignore_case` or
+      :func:`.ignore_whitespace`. Every distinct value is replaced with an
+      integer id before the index translations are computed, so the values
+      should be hashable.
+    :param bool compact: If True, the Hunks only store their ranges and read
+      the changed values from the _a_ and _b_ lists on demand, so the lists
+      should not be modified while the Diff is in use. See
+      :class:`.CompactHunk`.
+    :param stats: True or a :class:`.DiffStats` instance to collect the
+      statistics of the Diff in the ``stats`` attribute, which is None by
+      default.
+    :param budget: An optional :class:`.DiffBudget` limiting the cost and
+      time of the Diff. The ``approximate`` attribute is True if the budget
+      ran out before the Diff was complete.
     """
 
-    def __init__(self, a, b):
+    # Maps algorithm names to the class methods computing the index
+    # translation table.
+    algorithms = {
+        'lcs': 'compute_index_translations',
+        'myers': 'compute_myers_index_translations',
+        'patience': 'compute_patience_index_translations',
+        'histogram': 'compute_histogram_index_translations',
+    }
+
+    def __init__(self, a, b, algorithm='lcs', key=None, compact=False,
+                 stats=None, budget=None):
+        if algorithm not in self.algorithms:
+            raise ValueError(
+                "Unknown diff algorithm: %s, should be one of %s" % (
+                    algorithm, ', '.join(sorted(self.algorithms))
+                )
+            )
+        self.algorithm = algorithm
+        self.key = key
+        self.compact = compact
+        if stats is True:
+            stats = DiffStats()
+        self.stats = stats or None
+        self.budget = budget
+        self.approximate = False
+
+        self.a = None
+        self.b = None
+        self.index_translation_table = None
+        self._hunks = None
+
         # Create a new Diff between the _a_ list and _b_ list.
-        self.hunks = []
         self.diff(a, b)
 
-    def patch(self, values):
+    @property
+    def hunks(self):
+        """The list of Hunks. It is created by walking the index translation
+        table the first time it is needed. Use :meth:`.iter_hunks` to process
+        the Hunks without keeping all of them in memory.
+        """
+        if self._hunks is None:
+            if self.stats is None:
+                self._hunks = list(self.iter_hunks())
+            else:
+                with self.stats.phase('hunks'):
+                    self._hunks = list(self.iter_hunks())
+        return self._hunks
+
+    @hunks.setter
+    def hunks(self, hunks):
+        self._hunks = hunks
+
+    def iter_hunks(self):
+        """Yields the Hunks while walking the index translation table.
+
+        Every Hunk covers the values between two consecutive matching values
+        of the A and B lists, so a Hunk is complete as soon as the next
+        matching value is found.
+        """
+        if self._hunks is not None:
+            for hunk in self._hunks:
+                yield hunk
+            return
+
+        a = self.a
+        b = self.b
+        a_idx = b_idx = 0
+        for ai, bi in enumerate(self.index_translation_table):
+            if bi is None:
+                continue
+            if ai != a_idx or bi != b_idx:
+                yield self.create_hunk(a_idx, ai, b_idx, bi)
+            a_idx = ai + 1
+            b_idx = bi + 1
+
+        # The remainder of the A list has to be deleted and the remainder of
+        # the B list are new values.
+        if a_idx < len(a) or b_idx < len(b):
+            yield self.create_hunk(a_idx, len(a), b_idx, len(b))
+
+    def create_hunk(self, a_start, a_end, b_start, b_end):
+        """Creates a Hunk which deletes a[a_start:a_end] and inserts
+        b[b_start:b_end].
+
+        :param int a_start:
+        :param int a_end:
+        :param int b_start:
+        :param int b_end:
+        :return: :class:`.Hunk`
+        """
+        if self.compact:
+            return CompactHunk(
+                a_start, a_end - a_start, b_start, b_end - b_start,
+                self.a, self.b
+            )
+        hunk = Hunk(a_start, b_start)
+        hunk.delete_values = list(self.a[a_start:a_end])
+        hunk.insert_values = list(self.b[b_start:b_end])
+        return hunk
+
+    def update(self, start, stop, values):
+        """Replaces the b[start:stop] range of the B list with the given
+        values and repairs the Diff.
+
+        The B list is modified in place, so the Diff keeps following the
+        list of the caller, i.e. the lines of an editor. It should be a
+        ``list``, copy the B list before the update to keep it unchanged.
+
+        Only the window of the edit is diffed again, which reaches from the
+        last matching value before the edit to the first matching value after
+        it, including the Hunks touching the edit. The Hunks and the index
+        translation table are repaired within the window, the Hunks after
+        the window are shifted and, if the edit changes the length of the B
+        list, so are the B indices of the table after the window. So the
+        time of an update mostly depends on the size of the edit and of the
+        Hunks around it, not on the size of the lists. The result is a valid
+        diff, but it is only minimal within the window.
+
+        :param int start:
+        :param int stop:
+        :param values: The new values.
+        :return: The Diff itself.
+        """
+        if self.a is None:
+            raise ValueError(
+                'The A and B lists of the Diff are needed to update it, see '
+                'bind()'
+            )
+        if not isinstance(self.b, list):
+            raise TypeError(
+                'The B list of the Diff is modified by update(), so it should '
+                'be a list, not %s' % type(self.b).__name__
+            )
+        if not 0 <= start <= stop <= len(self.b):
+            raise IndexError(
+                'Invalid range %s:%s of the B list' % (start, stop)
+            )
+
+        hunks = self.hunks
+        # the Hunks touching the edit are hunks[first:last + 1]
+        first = bisect.bisect_left(
+            [hunk.b_idx + len(hunk.insert_values) for hunk in hunks], start
+        )
+        last = bisect.bisect_right([hunk.b_idx for hunk in hunks], stop) - 1
+
+        def offset(index):
+            """The offset of the A and B indices after the given Hunk.
+            """
+            if index < 0:
+                return 0
+            hunk = hunks[index]
+            return hunk.a_idx + len(hunk.delete_values) - \
+                hunk.b_idx - len(hunk.insert_values)
+
+        if first <= last and hunks[first].b_idx <= start:
+            a_start = hunks[first].a_idx
+            b_start = hunks[first].b_idx
+        else:
+            a_start = start + offset(first - 1)
+            b_start = start
+        b_end = stop
+        if first <= last:
+            b_end = max(
+                stop, hunks[last].b_idx + len(hunks[last].insert_values)
+            )
+        a_end = b_end + offset(last)
+
+        values = list(values)
+        delta = len(values) - (stop - start)
+        self.b[start:stop] = values
+        b_end += delta
+
+        window = Diff(
+            self.a[a_start:a_end], self.b[b_start:b_end],
+            algorithm=self.algorithm, key=self.key
+        )
+        new_hunks = [
+            self.create_hunk(
+                a_start + hunk.a_idx,
+                a_start + hunk.a_idx + len(hunk.delete_values),
+                b_start + hunk.b_idx,
+                b_start + hunk.b_idx + len(hunk.insert_values)
+            )
+            for hunk in window.iter_hunks()
+        ]
+        for hunk in hunks[last + 1:]:
+            hunk.b_idx += delta
+
+        self._hunks = hunks[:first] + new_hunks + hunks[last + 1:]
+        table = self.index_translation_table
+        if table is not None:
+            table[a_start:a_end] = [
+                None if bi is None else b_start + bi
+                for bi in window.index_translation_table
+            ]
+            if delta:
+                table[a_end:] = [
+                    None if bi is None else bi + delta
+                    for bi in table[a_end:]
+                ]
+        return self
+
+    def rebuild_index_translation_table(self):
+        """Rebuilds the index translation table from the Hunks, i.e. after
+        :meth:`.update` or for a restored Diff which is bound to its lists.
+
+        :return: The index translation table.
+        """
+        if self.a is None:
+            raise ValueError(
+                'The A list of the Diff is needed to rebuild its index '
+                'translation table, see bind()'
+            )
+        table = [None] * len(self.a)
+        a_idx = b_idx = 0
+        for hunk in self.iter_hunks():
+            for i in range(hunk.a_idx - a_idx):
+                table[a_idx + i] = b_idx + i
+            a_idx = hunk.a_idx + len(hunk.delete_values)
+            b_idx = hunk.b_idx + len(hunk.insert_values)
+        for i in range(len(self.a) - a_idx):
+            table[a_idx + i] = b_idx + i
+        self.index_translation_table = table
+        return table
+
+    @classmethod
+    def from_hunks(cls, hunks, a=None, b=None, algorithm='lcs', key=None,
+                   compact=False, approximate=False):
+        """Creates a Diff from its Hunks without computing anything. The index
+        translation table is rebuilt when it is needed, see
+        :meth:`.rebuild_index_translation_table`.
+
+        :param list hunks: The :class:`.Hunk` instances sorted by their
+          positions, or None if the index translation table is set instead.
+        :param a: The A list or None.
+        :param b: The B list or None.
+        :param str algorithm: The algorithm of the Diff.
+        :param key: The key function of the Diff.
+        :param bool compact: The compact flag of the Diff.
+        :param bool approximate: The approximate flag of the Diff.
+        :return: :class:`.Diff`
+        """
+        diff = cls.__new__(cls)
+        diff.algorithm = algorithm
+        diff.key = key
+        diff.compact = compact
+        diff.stats = None
+        diff.budget = None
+        diff.approximate = approximate
+        diff.a = a
+        diff.b = b
+        diff.index_translation_table = None
+        diff._hunks = hunks
+        return diff
+
+    def invert(self):
+        """Returns the Diff of the B and A lists, which turns the B list into
+        the A list, by swapping the ranges and the values of the Hunks. Its
+        time is proportional to the number of the Hunks.
+
+        :return: :class:`.Diff`
+        """
+        hunks = []
+        for hunk in self.iter_hunks():
+            if isinstance(hunk, CompactHunk):
+                hunks.append(CompactHunk(
+                    hunk.b_idx, hunk.b_len, hunk.a_idx, hunk.a_len, hunk.b,
+                    hunk.a
+                ))
+            else:
+                inverted = Hunk(hunk.b_idx, hunk.a_idx)
+                inverted.delete_values = hunk.insert_values
+                inverted.insert_values = hunk.delete_values
+                hunks.append(inverted)
+        return self.from_hunks(
+            hunks, self.b, self.a, self.algorithm, self.key, self.compact,
+            self.approximate
+        )
+
+    def compose(self, other):
+        """Combines this Diff of the A and B lists with the given Diff of the
+        B and C lists into a Diff of the A and C lists, without patching the
+        lists or diffing them again.
+
+        The Hunks of both Diffs are merged by their ranges in the B list. The
+        Hunks that overlap or touch in the B list are combined into a single
+        Hunk, the values of the B list between them are taken from the other
+        Hunks of the group, and the common prefix and suffix of the deleted
+        and inserted values of the combined Hunk are dropped. So the time is
+        proportional to the number and the size of the Hunks, not to the
+        length of the lists. The result is a valid diff, but it is not
+        necessarily minimal, i.e. a value that is moved by two edits is not
+        matched again.
+
+        :param other: The :class:`.Diff` of the B and C lists.
+        :return: :class:`.Diff`
+        """
+        if self.b is not None and other.a is not None \
+                and len(self.b) != len(other.a):
+            raise ValueError(
+                'The B list of the Diff is not the A list of the other Diff'
+            )
+        key = self.key or (lambda value: value)
+        # the ranges of the Hunks in the B list with their values in the A,
+        # B and C lists
+        first = [
+            (hunk.b_idx, hunk.b_idx + len(hunk.insert_values),
+             hunk.delete_values, hunk.insert_values)
+            for hunk in self.iter_hunks()
+        ]
+        second = [
+            (hunk.a_idx, hunk.a_idx + len(hunk.delete_values),
+             hunk.insert_values, hunk.delete_values)
+            for hunk in other.iter_hunks()
+        ]
+
+        def b_values(pieces, ends, start, end):
+            """Returns b[start:end] from the given pieces, which cover it.
+            """
+            values = []
+            for k in range(bisect.bisect_right(ends, start), len(pieces)):
+                b_start, b_end, own, b = pieces[k]
+                if b_start >= end:
+                    break
+                values.extend(b[
+                    max(start, b_start) - b_start:min(end, b_end) - b_start
+                ])
+            if len(values) != end - start:
+                raise ValueError(
+                    'The B list of the Diff is not the A list of the other '
+                    'Diff'
+                )
+            return values
+
+        def group_values(pieces, other_pieces, start, end):
+            """Returns the values of a group in the A or the C list, which
+            are the own values of the pieces and the B values between them.
+            """
+            ends = [piece[1] for piece in other_pieces]
+            values = []
+            for b_start, b_end, own, b in pieces:
+                if b_start > start:
+                    values.extend(
+                        b_values(other_pieces, ends, start, b_start)
+                    )
+                values.extend(own)
+                start = b_end
+            if start < end:
+                values.extend(b_values(other_pieces, ends, start, end))
+            return values
+
+        hunks = []
+        # the offsets of the A and C indices from the B indices
+        a_offset = c_offset = 0
+        i = j = 0
+        while i < len(first) or j < len(second):
+            if j == len(second) or \
+                    i < len(first) and first[i][:2] <= second[j][:2]:
+                start, end = first[i][:2]
+            else:
+                start, end = second[j][:2]
+            i_start = i
+            j_start = j
+            while True:
+                if i < len(first) and first[i][0] <= end:
+                    end = max(end, first[i][1])
+                    i += 1
+                elif j < len(second) and second[j][0] <= end:
+                    end = max(end, second[j][1])
+                    j += 1
+                else:
+                    break
+
+            delete_values = group_values(
+                first[i_start:i], second[j_start:j], start, end
+            )
+            insert_values = group_values(
+                second[j_start:j], first[i_start:i], start, end
+            )
+            a_idx = start + a_offset
+            c_idx = start + c_offset
+            a_offset = a_idx + len(delete_values) - end
+            c_offset = c_idx + len(insert_values) - end
+
+            # drop the values that are changed back
+            prefix = 0
+            length = min(len(delete_values), len(insert_values))
+            while prefix < length and \
+                    key(delete_values[prefix]) == key(insert_values[prefix]):
+                prefix += 1
+            suffix = 0
+            while suffix < length - prefix and \
+                    key(delete_values[-1 - suffix]) == \
+                    key(insert_values[-1 - suffix]):
+                suffix += 1
+            if prefix + suffix == len(delete_values) == len(insert_values):
+                continue
+
+            hunk = Hunk(a_idx + prefix, c_idx + prefix)
+            hunk.delete_values = list(
+                delete_values[prefix:len(delete_values) - suffix]
+            )
+            hunk.insert_values = list(
+                insert_values[prefix:len(insert_values) - suffix]
+            )
+            hunks.append(hunk)
+
+        return self.from_hunks(
+            hunks, self.a, other.b, self.algorithm, self.key,
+            approximate=self.approximate or other.approximate
+        )
+
+    def iter_refined_hunks(self, granularity='word', algorithm='lcs'):
+        """Yields the Hunks which replace values together with their
+        intraline Diffs, see :meth:`.Hunk.refine`. The Hunks which only
+        insert or only delete values are not refined.
+
+        :param str granularity: ``"word"`` or ``"char"``.
+        :param str algorithm: The algorithm of the intraline Diffs.
+        :return: Tuples of :class:`.Hunk` and :class:`.Diff`.
+        """
+        for hunk in self.hunks:
+            if hunk.delete and hunk.insert:
+                yield hunk, hunk.refine(granularity, algorithm)
+
+    def __reduce__(self):
+        """Pickles the Diff with the ranges and the changed values of its
+        Hunks only, the A and B lists are not included. The key function is
+        included if it can be pickled, otherwise a warning is issued and the
+        restored Diff has no key function.
+        """
+        ranges = array('l')
+        delete_values = []
+        insert_values = []
+        for hunk in self.iter_hunks():
+            delete = hunk.delete_values
+            insert = hunk.insert_values
+            ranges.extend([hunk.a_idx, len(delete), hunk.b_idx, len(insert)])
+            delete_values.extend(delete)
+            insert_values.extend(insert)
+        key = self.key
+        if key is not None:
+            try:
+                pickle.dumps(key)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                warnings.warn(
+                    'The key function %r of the Diff can not be pickled, the '
+                    'restored Diff compares the values without it' % key
+                )
+                key = None
+        return restore_diff, (
+            self.algorithm, self.compact, ranges, delete_values,
+            insert_values, self.approximate, key
+        )
+
+    def bind(self, a, b):
+        """Attaches the A and B lists to a Diff that is restored from its
+        Hunks, i.e. an unpickled Diff, so the unified and context formats can
+        show the unchanged lines. The :class:`.CompactHunk` instances are
+        created again as views into the given lists, so they follow the
+        lists, i.e. in :meth:`.update`.
+
+        :param a:
+        :param b:
+        :return: The Diff itself.
+        """
+        self.a = a
+        self.b = b
+        if self._hunks is not None and self.compact:
+            self._hunks = [
+                CompactHunk(
+                    hunk.a_idx, hunk.a_len, hunk.b_idx, hunk.b_len, a, b
+                )
+                for hunk in self._hunks
+            ]
+        return self
+
+    def patch(self, values, inplace=False):
         """Modify the _values_ list according to the stored diff information.
 
         :param list values:
+        :param bool inplace: If True the _values_ list is modified in place
+          and returned, otherwise a new list is returned.
         :return:
         """
-        import copy
-        res = copy.copy(values)
+        return self.apply_edits(
+            values,
+            [(hunk.a_idx, hunk.a_idx + len(hunk.delete_values),
+              hunk.insert_values) for hunk in self.iter_hunks()],
+            inplace
+        )
 
-        for hunk in self.hunks:
-            if hunk.delete:
-                res = res[0: hunk.b_idx] + res[hunk.b_idx + len(hunk.delete_values):]
+    def unpatch(self, values, inplace=False):
+        """Reverts the stored diff information from the _values_ list, that
+        is, it creates the A list from the B list without computing the
+        reverse diff.
 
-            if hunk.insert:
-                res = res[0:hunk.b_idx] + hunk.insert_values + res[hunk.b_idx:]
-        return res
+        :param list values:
+        :param bool inplace: If True the _values_ list is modified in place
+          and returned, otherwise a new list is returned.
+        :return:
+        """
+        return self.apply_edits(
+            values,
+            [(hunk.b_idx, hunk.b_idx + len(hunk.insert_values),
+              hunk.delete_values) for hunk in self.iter_hunks()],
+            inplace
+        )
+
+    @classmethod
+    def apply_edits(cls, values, edits, inplace=False):
+        """Replaces the values[start:end] ranges with the new values in one
+        pass over the _values_ list.
+
+        :param list values:
+        :param list edits: A list of (start, end, new_values) tuples sorted by
+          start, the indices are in the original _values_ list.
+        :param bool inplace: If True the _values_ list is modified in place.
+        :return:
+        """
+        if not inplace:
+            res = []
+            pos = 0
+            for start, end, new_values in edits:
+                res.extend(values[pos:start])
+                res.extend(new_values)
+                pos = end
+            res.extend(values[pos:])
+            return res
+
+        length = len(values)
+        new_length = length
+        for start, end, new_values in edits:
+            new_length += len(new_values) - (end - start)
+        if new_length > length:
+            values.extend([None] * (new_length - length))
+
+        # The unchanged segments between the edits are moved to their new
+        # positions. Segments moving to the left only overwrite values that
+        # are already moved, so they are moved immediately, segments moving
+        # to the right are moved afterwards starting from the last one. The
+        # new values are written at the end, when every segment is in place.
+        right_moves = []
+        new_values_positions = []
+        shift = 0
+        pos = 0
+        for start, end, new_values in edits + [(length, length, ())]:
+            if start > pos:
+                if shift < 0:
+                    values[pos + shift:start + shift] = values[pos:start]
+                elif shift > 0:
+                    right_moves.append((pos, start, shift))
+            if new_values:
+                new_values_positions.append((start + shift, new_values))
+            shift += len(new_values) - (end - start)
+            pos = end
+
+        for start, end, shift in reversed(right_moves):
+            values[start + shift:end + shift] = values[start:end]
+
+        for start, new_values in new_values_positions:
+            values[start:start + len(new_values)] = new_values
+
+        if new_length < length:
+            del values[new_length:]
+
+        return values
 
     def edit_script(self):
         """
@@ -163,59 +1161,301 @@ class Diff(object):
 
         return script
 
+    def to_delta(self):
+        """Encodes the Hunks in the compact binary delta format, which is
+        applied with :func:`.apply_delta`. Unlike :meth:`.edit_script` the
+        values are stored exactly. They should all be strings, which are
+        stored as UTF-8, or all bytes.
+
+        :return: bytes
+        """
+        body = bytearray()
+        value_type = None
+        a_idx = 0
+        for hunk in self.iter_hunks():
+            if hunk.a_idx > a_idx:
+                body.append(DELTA_COPY)
+                write_varint(body, hunk.a_idx - a_idx)
+            delete_count = len(hunk.delete_values)
+            if delete_count:
+                body.append(DELTA_DELETE)
+                write_varint(body, delete_count)
+            insert_values = hunk.insert_values
+            if len(insert_values):
+                body.append(DELTA_INSERT)
+                write_varint(body, len(insert_values))
+                for value in insert_values:
+                    if isinstance(value, str):
+                        data = value.encode('utf-8', 'surrogateescape')
+                        type_ = b's'
+                    elif isinstance(value, bytes):
+                        data = value
+                        type_ = b'b'
+                    else:
+                        raise TypeError(
+                            'Only str and bytes values can be encoded in a '
+                            'delta, not %s' % value.__class__.__name__
+                        )
+                    if value_type is None:
+                        value_type = type_
+                    elif value_type != type_:
+                        raise TypeError(
+                            'The values of a delta should all be str or all '
+                            'be bytes'
+                        )
+                    write_varint(body, len(data))
+                    body += data
+            a_idx = hunk.a_idx + delete_count
+
+        delta = bytearray(
+            DELTA_HEADER.pack(DELTA_MAGIC, DELTA_VERSION, value_type or b's')
+        )
+        # the lengths of the A lists of unpickled Diffs are not known
+        write_varint(delta, 0 if self.a is None else len(self.a) + 1)
+        delta += body
+        return bytes(delta)
+
     def to_s(self):
         """Return the diff list as standard UNIX diff output.
         """
-        value = ''.join(map(Hunk.to_s, self.hunks))
-        return value
+        return ''.join(self.iter_lines())
 
     def inspect(self):
         print(self.to_s())
 
-    def diff(self, a, b):
-        """no docstring on the origin
+    def write_to(self, fileobj, format='normal', context=3, a_label='a',
+                 b_label='b'):
+        """Writes the diff to the given file object line by line, so the
+        whole diff text is never held in memory.
+
+        :param fileobj: A file like object with a ``writelines()`` method.
+        :param str format: One of ``"normal"``, ``"unified"`` or
+          ``"context"``.
+        :param int context: The number of unchanged lines around the changes
+          for the unified and context formats.
+        :param str a_label: The name of the A list in the header of the
+          unified and context formats.
+        :param str b_label: The name of the B list in the header of the
+          unified and context formats.
+        :return:
+        """
+        fileobj.writelines(
+            self.iter_lines(format, context, a_label, b_label)
+        )
 
-        :param a:
-        :param b:
+    def iter_lines(self, format='normal', context=3, a_label='a',
+                   b_label='b'):
+        """Yields the lines of the diff output in the given format. See
+        :meth:`.write_to` for the parameters.
+        """
+        if format == 'normal':
+            for hunk in self.iter_hunks():
+                for line in hunk.iter_lines():
+                    yield line
+        elif format in ('unified', 'context') and self.a is None:
+            raise ValueError(
+                "The A list is needed for the %s format, it is not available "
+                "for unpickled diffs" % format
+            )
+        elif format == 'unified':
+            for line in self.iter_unified_lines(context, a_label, b_label):
+                yield line
+        elif format == 'context':
+            for line in self.iter_context_lines(context, a_label, b_label):
+                yield line
+        else:
+            raise ValueError(
+                "Unknown diff format: %s, should be one of normal, unified, "
+                "context" % format
+            )
+
+    def iter_groups(self, context=3):
+        """Yields lists of Hunks that are close enough to each other to share
+        their surrounding unchanged lines in the unified and context formats.
+
+        :param int context: The number of unchanged lines around the changes.
+        :return:
+        """
+        group = []
+        for hunk in self.iter_hunks():
+            if group:
+                last = group[-1]
+                gap = hunk.a_idx - last.a_idx - len(last.delete_values)
+                if gap > 2 * context:
+                    yield group
+                    group = []
+            group.append(hunk)
+        if group:
+            yield group
+
+    def group_ranges(self, group, context):
+        """Returns the (a_start, a_end, b_start, b_end) range of the given
+        group of Hunks including the surrounding unchanged lines.
+
+        :param list group: A list of Hunks.
+        :param int context: The number of unchanged lines around the changes.
         :return:
         """
-        index_translation_table = self.compute_index_translations(a, b)
+        first = group[0]
+        last = group[-1]
+        a_end = last.a_idx + len(last.delete_values)
+        b_end = last.b_idx + len(last.insert_values)
+        leading = min(context, first.a_idx)
+        trailing = min(context, len(self.a) - a_end)
+        return (
+            first.a_idx - leading, a_end + trailing,
+            first.b_idx - leading, b_end + trailing
+        )
 
-        ai = bi = 0
-        table_length = len(index_translation_table)
+    def iter_unified_lines(self, context=3, a_label='a', b_label='b'):
+        """Yields the lines of the diff in unified format.
+        """
+        a = self.a
+        header = False
+        for group in self.iter_groups(context):
+            if not header:
+                yield "--- %s\n" % a_label
+                yield "+++ %s\n" % b_label
+                header = True
+
+            a_start, a_end, b_start, b_end = self.group_ranges(group, context)
+            yield "@@ -%s +%s @@\n" % (
+                self.unified_range(a_start, a_end),
+                self.unified_range(b_start, b_end)
+            )
+
+            a_idx = a_start
+            for hunk in group:
+                for ai in range(a_idx, hunk.a_idx):
+                    yield " %s\n" % a[ai]
+                for value in hunk.delete_values:
+                    yield "-%s\n" % value
+                for value in hunk.insert_values:
+                    yield "+%s\n" % value
+                a_idx = hunk.a_idx + len(hunk.delete_values)
+
+            for ai in range(a_idx, a_end):
+                yield " %s\n" % a[ai]
+
+    def iter_context_lines(self, context=3, a_label='a', b_label='b'):
+        """Yields the lines of the diff in context format.
+        """
+        a = self.a
+        header = False
+        for group in self.iter_groups(context):
+            if not header:
+                yield "*** %s\n" % a_label
+                yield "--- %s\n" % b_label
+                header = True
+
+            a_start, a_end, b_start, b_end = self.group_ranges(group, context)
+            yield "***************\n"
+
+            yield "*** %s ****\n" % self.context_range(a_start, a_end)
+            if any(hunk.delete for hunk in group):
+                a_idx = a_start
+                for hunk in group:
+                    for ai in range(a_idx, hunk.a_idx):
+                        yield "  %s\n" % a[ai]
+                    prefix = "! " if hunk.insert else "- "
+                    for value in hunk.delete_values:
+                        yield "%s%s\n" % (prefix, value)
+                    a_idx = hunk.a_idx + len(hunk.delete_values)
+                for ai in range(a_idx, a_end):
+                    yield "  %s\n" % a[ai]
+
+            yield "--- %s ----\n" % self.context_range(b_start, b_end)
+            if any(hunk.insert for hunk in group):
+                # the unchanged lines are the same in A and B
+                a_idx = a_start
+                for hunk in group:
+                    for ai in range(a_idx, hunk.a_idx):
+                        yield "  %s\n" % a[ai]
+                    prefix = "! " if hunk.delete else "+ "
+                    for value in hunk.insert_values:
+                        yield "%s%s\n" % (prefix, value)
+                    a_idx = hunk.a_idx + len(hunk.delete_values)
+                for ai in range(a_idx, a_end):
+                    yield "  %s\n" % a[ai]
 
-        while ai < table_length:
-            # Check if value from index ai should be included in B.
-            dest_index = index_translation_table[ai]
-            if dest_index is not None:
-                # Yes, it needs to go to position dest_index. All values from
-                # bi to new_index - 1 are new values in B, not in A.
-                while bi < dest_index:
-                    self.insert_element(ai, bi, b[bi])
-                    bi += 1
-                bi += 1
-            else:
-                # No, it's not in B. Put it onto the deletion list.
-                self.delete_element(ai, bi, a[ai])
-            ai += 1
+    @classmethod
+    def unified_range(cls, start_idx, end_idx):
+        """Formats the given range for the unified format hunk headers.
 
-        # The remainder of the A list has to be deleted.
-        while ai < len(a):
-            self.delete_element(ai, bi, a[ai])
-            ai += 1
+        :param int start_idx:
+        :param int end_idx:
+        :return:
+        """
+        length = end_idx - start_idx
+        if length == 1:
+            return "%s" % (start_idx + 1)
+        if length == 0:
+            # an empty range refers to the line before it
+            return "%s,0" % start_idx
+        return "%s,%s" % (start_idx + 1, length)
 
-        # The remainder of the B list are new values.
-        while bi < len(b):
-            self.insert_element(ai, bi, b[bi])
-            bi += 1
+    @classmethod
+    def context_range(cls, start_idx, end_idx):
+        """Formats the given range for the context format hunk headers.
+
+        :param int start_idx:
+        :param int end_idx:
+        :return:
+        """
+        length = end_idx - start_idx
+        if length == 0:
+            return "%s" % start_idx
+        return Hunk.range(start_idx + 1, end_idx)
+
+    def diff(self, a, b):
+        """Computes the index translation table between the _a_ and _b_
+        lists. The Hunks are created from it when they are first needed.
+
+        :param a:
+        :param b:
+        :return:
+        """
+        self.a = a
+        self.b = b
+        self._hunks = None
+        compute = getattr(self, self.algorithms[self.algorithm])
+
+        budget = self.budget
+        if budget is not None:
+            budget.start()
+
+        stats = self.stats
+        if stats is None:
+            a_ids, b_ids = self.intern(a, b, self.key)
+            self.index_translation_table = compute(a_ids, b_ids, None, budget)
+            self.approximate = budget is not None and budget.exhausted
+            return
+
+        with stats.phase('intern'):
+            a_ids, b_ids = self.intern(a, b, self.key)
+        with stats.phase('index_translations'):
+            self.index_translation_table = \
+                compute(a_ids, b_ids, stats, budget)
+        self.approximate = budget is not None and budget.exhausted
+        stats.a_length = len(a_ids)
+        stats.b_length = len(b_ids)
+        stats.lcs_length = \
+            len(self.index_translation_table) - \
+            self.index_translation_table.count(None)
+        stats.report()
 
     @classmethod
-    def compute_index_translations(cls, a, b):
+    def compute_index_translations(cls, a, b, stats=None, budget=None):
         """Computes the index translation LUT which show what item of the a is
         where on the b.
 
+        If the budget runs out, the longest common subsequence of the values
+        of the A list processed so far is used.
+
         :param list a:
         :param list b:
+        :param stats: An optional :class:`.DiffStats` to record the counters.
+        :param budget: An optional :class:`.DiffBudget`.
         :return:
         """
         # import copy
@@ -237,36 +1477,40 @@ class Diff(object):
         #     except ValueError:
         #         continue
 
-        a_end_idx = len(a) - 1
-        b_end_idx = len(b) - 1
-        start_idx = 0
-
-        # start looking for the same elements from the beginning of a
-        while start_idx < a_end_idx and start_idx < b_end_idx and a[start_idx] ==  b[start_idx]:
-            index_translation_table[start_idx] = start_idx
-            start_idx += 1
-
-        # when we find the first different element
-        # go to the end of the a and b
-        # and start looking for the same elements from the ends of a and b
-        while a_end_idx >= start_idx and b_end_idx >= start_idx and a[a_end_idx]  == b[b_end_idx]:
-            index_translation_table[a_end_idx] = b_end_idx
-            a_end_idx -= 1
-            b_end_idx -= 1
-
-        # now if we have reached to start_idx in both a and b just return
-        # the index_translation_table
-        if start_idx >= a_end_idx and start_idx >= b_end_idx:
+        # match the elements at the beginning and at the end of a and b
+        start_idx, suffix_length = \
+            cls.match_common_ends(a, b, index_translation_table, stats)
+        a_end_idx = len(a) - suffix_length - 1
+        b_end_idx = len(b) - suffix_length - 1
+
+        if stats is not None:
+            stats.distinct_keys = 0
+            stats.match_pairs = 0
+            stats.peak_thresholds = 0
+            stats.peak_links = 0
+
+        # now if we have reached to start_idx in a or b just return the
+        # index_translation_table
+        if start_idx > a_end_idx or start_idx > b_end_idx:
             return index_translation_table
 
         links = []
         thresholds = []
         b_hashes_to_indices = cls.reverse_hash(b, start_idx, b_end_idx)
+        match_pairs = 0
 
         for ai in range(start_idx, a_end_idx + 1):
+            if budget is not None \
+                    and not (ai - start_idx) % budget.check_interval \
+                    and not budget.check():
+                break
             a_value = a[ai]
             if a_value not in b_hashes_to_indices:
                 continue
+            match_pairs += len(b_hashes_to_indices[a_value])
+            if budget is not None \
+                    and not budget.spend(len(b_hashes_to_indices[a_value])):
+                break
             k = None
             for bi in b_hashes_to_indices[a_value]:
                 if k and thresholds[k] > bi > thresholds[k - 1]:
@@ -290,9 +1534,622 @@ class Diff(object):
                 index_translation_table[link[1]] = link[2]
                 link = link[0]
 
-        print("index_translation_table: %s" % index_translation_table)
+        if stats is not None:
+            stats.distinct_keys = len(b_hashes_to_indices)
+            stats.match_pairs = match_pairs
+            # both lists only grow
+            stats.peak_thresholds = len(thresholds)
+            stats.peak_links = len(links)
         return index_translation_table
 
+    @classmethod
+    def compute_myers_index_translations(cls, a, b, stats=None, budget=None):
+        """Computes the index translation LUT with the Myers O(ND) algorithm.
+
+        The lists are split at the middle snake of the edit graph and both
+        halves are processed until they are completely matched, so only
+        O(N + M) memory is used and the run time is proportional to the
+        number of edits instead of the number of matching value pairs.
+
+        :param list a:
+        :param list b:
+        :param stats: An optional :class:`.DiffStats` to record the counters.
+        :param budget: An optional :class:`.DiffBudget`.
+        :return:
+        """
+        index_translation_table = [None] * len(a)
+        start_idx, suffix_length = \
+            cls.match_common_ends(a, b, index_translation_table, stats)
+        cls.match_myers(
+            a, start_idx, len(a) - suffix_length,
+            b, start_idx, len(b) - suffix_length,
+            index_translation_table, budget
+        )
+        return index_translation_table
+
+    @classmethod
+    def compute_patience_index_translations(cls, a, b, stats=None,
+                                            budget=None):
+        """Computes the index translation LUT with the patience algorithm.
+
+        The values that occur exactly once in both ranges are matched first,
+        the longest increasing sequence of them is used as anchors and the
+        ranges between the anchors are processed the same way. The ranges
+        without unique values are matched with the Myers algorithm. The
+        result is not always the longest common subsequence, but the
+        repeated boilerplate lines, i.e. the closing braces, are not used to
+        align the unrelated parts of the lists.
+
+        :param list a:
+        :param list b:
+        :param stats: An optional :class:`.DiffStats` to record the counters.
+        :param budget: An optional :class:`.DiffBudget`.
+        :return:
+        """
+        index_translation_table = [None] * len(a)
+        start_idx, suffix_length = \
+            cls.match_common_ends(a, b, index_translation_table, stats)
+
+        ranges = [(
+            start_idx, len(a) - suffix_length,
+            start_idx, len(b) - suffix_length
+        )]
+        while ranges:
+            a_start, a_end, b_start, b_end = cls.match_range_ends(
+                a, b, index_translation_table, *ranges.pop()
+            )
+            if a_start == a_end or b_start == b_end:
+                continue
+            if budget is not None \
+                    and not budget.spend(a_end - a_start + b_end - b_start):
+                continue
+
+            anchors = cls.unique_anchors(a, a_start, a_end, b, b_start, b_end)
+            if not anchors:
+                cls.match_myers(
+                    a, a_start, a_end, b, b_start, b_end,
+                    index_translation_table, budget
+                )
+                continue
+
+            for ai, bi in anchors:
+                index_translation_table[ai] = bi
+                ranges.append((a_start, ai, b_start, bi))
+                a_start = ai + 1
+                b_start = bi + 1
+            ranges.append((a_start, a_end, b_start, b_end))
+
+        return index_translation_table
+
+    @classmethod
+    def compute_histogram_index_translations(cls, a, b, stats=None,
+                                             budget=None, max_occurrences=64):
+        """Computes the index translation LUT with the histogram algorithm.
+
+        The ranges are split at the common runs of values that start with the
+        values occurring the least times in the A range, so the rare values
+        are used as anchors like in the patience algorithm, but values
+        occurring a few times are also used. All runs of the equally rare
+        values, which are increasing in both lists, split the range at once,
+        so a range is not scanned again for every anchor. The ranges where
+        every common value occurs more than max_occurrences times are matched
+        with the Myers algorithm.
+
+        :param list a:
+        :param list b:
+        :param stats: An optional :class:`.DiffStats` to record the counters.
+        :param budget: An optional :class:`.DiffBudget`.
+        :param int max_occurrences: The values occurring more times than this
+          in the A range are not used to split the range.
+        :return:
+        """
+        index_translation_table = [None] * len(a)
+        start_idx, suffix_length = \
+            cls.match_common_ends(a, b, index_translation_table, stats)
+
+        ranges = [(
+            start_idx, len(a) - suffix_length,
+            start_idx, len(b) - suffix_length
+        )]
+        while ranges:
+            a_start, a_end, b_start, b_end = cls.match_range_ends(
+                a, b, index_translation_table, *ranges.pop()
+            )
+            if a_start == a_end or b_start == b_end:
+                continue
+            if budget is not None \
+                    and not budget.spend(a_end - a_start + b_end - b_start):
+                continue
+
+            a_indices = {}
+            for ai in range(a_start, a_end):
+                a_indices.setdefault(a[ai], []).append(ai)
+
+            # The longest run of every B index with the least occurring
+            # values, in the order of the B list.
+            runs = []
+            best_count = max_occurrences + 1
+            bi = b_start
+            steps = 0
+            while bi < b_end:
+                steps += 1
+                if budget is not None \
+                        and not steps % budget.check_interval \
+                        and not budget.check():
+                    break
+                indices = a_indices.get(b[bi])
+                if indices is None or len(indices) > best_count:
+                    bi += 1
+                    continue
+                if len(indices) < best_count:
+                    runs = []
+                    best_count = len(indices)
+                best = None
+                next_bi = bi + 1
+                for ai in indices:
+                    # extend the run in both directions
+                    x, y = ai, bi
+                    while x > a_start and y > b_start \
+                            and a[x - 1] == b[y - 1]:
+                        x -= 1
+                        y -= 1
+                    u, v = ai + 1, bi + 1
+                    while u < a_end and v < b_end and a[u] == b[v]:
+                        u += 1
+                        v += 1
+                    if best is None or u - x > best[2] - best[0]:
+                        best = (x, y, u, v)
+                    next_bi = max(next_bi, v)
+                runs.append(best)
+                bi = next_bi
+
+            if not runs:
+                cls.match_myers(
+                    a, a_start, a_end, b, b_start, b_end,
+                    index_translation_table, budget
+                )
+                continue
+
+            for x, y, u, v in cls.increasing_runs(runs):
+                for i in range(u - x):
+                    index_translation_table[x + i] = y + i
+                ranges.append((a_start, x, b_start, y))
+                a_start = u
+                b_start = v
+            ranges.append((a_start, a_end, b_start, b_end))
+
+        return index_translation_table
+
+    @classmethod
+    def match_common_ends(cls, a, b, index_translation_table, stats=None):
+        """Matches the common prefix and suffix of the a and b lists in the
+        index translation table.
+
+        :param a:
+        :param b:
+        :param list index_translation_table:
+        :param stats: An optional :class:`.DiffStats` to record the lengths.
+        :return: A tuple of the prefix and suffix lengths.
+        """
+        start_idx = cls.common_prefix_length(a, b)
+        for i in range(start_idx):
+            index_translation_table[i] = i
+
+        suffix_length = cls.common_suffix_length(a, b, start_idx)
+        for i in range(1, suffix_length + 1):
+            index_translation_table[len(a) - i] = len(b) - i
+
+        if stats is not None:
+            stats.prefix_length = start_idx
+            stats.suffix_length = suffix_length
+        return start_idx, suffix_length
+
+    @classmethod
+    def match_range_ends(cls, a, b, index_translation_table, a_start, a_end,
+                         b_start, b_end):
+        """Matches the common prefix and suffix of the given ranges of the a
+        and b lists in the index translation table.
+
+        :return: The remaining (a_start, a_end, b_start, b_end) range.
+        """
+        while a_start < a_end and b_start < b_end \
+                and a[a_start] == b[b_start]:
+            index_translation_table[a_start] = b_start
+            a_start += 1
+            b_start += 1
+
+        while a_start < a_end and b_start < b_end \
+                and a[a_end - 1] == b[b_end - 1]:
+            a_end -= 1
+            b_end -= 1
+            index_translation_table[a_end] = b_end
+
+        return a_start, a_end, b_start, b_end
+
+    @classmethod
+    def match_myers(cls, a, a_start, a_end, b, b_start, b_end,
+                    index_translation_table, budget=None):
+        """Matches the given ranges of the a and b lists in the index
+        translation table with the Myers algorithm.
+
+        :param a:
+        :param int a_start:
+        :param int a_end:
+        :param b:
+        :param int b_start:
+        :param int b_end:
+        :param list index_translation_table:
+        :param budget: An optional :class:`.DiffBudget`.
+        :return:
+        """
+        # Use a stack instead of recursion, the ranges are processed
+        # independently anyway.
+        ranges = [(a_start, a_end, b_start, b_end)]
+        while ranges:
+            a_start, a_end, b_start, b_end = cls.match_range_ends(
+                a, b, index_translation_table, *ranges.pop()
+            )
+
+            # after trimming, a range with an edit distance of 0 or 1 has no
+            # values left on at least one side
+            if a_start == a_end or b_start == b_end:
+                continue
+
+            snake = cls.middle_snake(
+                a, a_start, a_end, b, b_start, b_end, budget
+            )
+            if snake is None:
+                # the budget is exhausted
+                continue
+            x, y, u, v = snake
+
+            for i in range(u - x):
+                index_translation_table[x + i] = y + i
+
+            ranges.append((a_start, x, b_start, y))
+            ranges.append((u, a_end, v, b_end))
+
+    @classmethod
+    def increasing_runs(cls, runs):
+        """Returns the longest sequence of the given runs, which is increasing
+        in both lists, without the runs overlapping the previous one.
+
+        :param list runs: The (a_start, b_start, a_end, b_end) tuples of the
+          runs in the order of the B list.
+        :return: A list of (a_start, b_start, a_end, b_end) tuples.
+        """
+        # Patience sorting of the A indices in the order of the B list,
+        # every pile keeps its top card and a link to the previous pile.
+        tops = []
+        links = []
+        for run in runs:
+            k = bisect.bisect_left(tops, run[0])
+            link = (run, links[k - 1] if k else None)
+            if k == len(tops):
+                tops.append(run[0])
+                links.append(link)
+            else:
+                tops[k] = run[0]
+                links[k] = link
+
+        sequence = []
+        link = links[-1] if links else None
+        while link:
+            sequence.append(link[0])
+            link = link[1]
+        sequence.reverse()
+
+        result = []
+        a_end = b_end = 0
+        for run in sequence:
+            # the runs extended backwards may overlap the previous run
+            if run[0] >= a_end and run[1] >= b_end:
+                result.append(run)
+                a_end, b_end = run[2], run[3]
+        return result
+
+    @classmethod
+    def unique_anchors(cls, a, a_start, a_end, b, b_start, b_end):
+        """Returns the longest sequence of the values that occur exactly once
+        in both of the given ranges, which is increasing in both lists.
+
+        :return: A list of (a_idx, b_idx) tuples.
+        """
+        # Maps the values to their index, or to None if they are repeated.
+        b_unique = {}
+        for bi in range(b_start, b_end):
+            value = b[bi]
+            b_unique[value] = None if value in b_unique else bi
+
+        a_unique = {}
+        for ai in range(a_start, a_end):
+            value = a[ai]
+            if b_unique.get(value) is not None:
+                a_unique[value] = None if value in a_unique else ai
+
+        # Patience sorting of the B indices in the order of the A list,
+        # every pile keeps its top card and a link to the previous pile.
+        tops = []
+        links = []
+        for ai in range(a_start, a_end):
+            value = a[ai]
+            if a_unique.get(value) != ai:
+                continue
+            bi = b_unique[value]
+            k = bisect.bisect_left(tops, bi)
+            link = (ai, bi, links[k - 1] if k else None)
+            if k == len(tops):
+                tops.append(bi)
+                links.append(link)
+            else:
+                tops[k] = bi
+                links[k] = link
+
+        anchors = []
+        link = links[-1] if links else None
+        while link:
+            anchors.append(link[:2])
+            link = link[2]
+        anchors.reverse()
+        return anchors
+
+    @classmethod
+    def common_prefix_length(cls, a, b):
+        """Returns the number of equal values at the beginning of the a and b
+        lists.
+
+        The lists are compared in blocks of growing size, which are compared
+        with NumPy if it is installed and the lists are integer arrays, so
+        only the block with the first difference is searched value by value.
+
+        :param a:
+        :param b:
+        :return: int
+        """
+        length = min(len(a), len(b))
+        start = 0
+        block = 64
+
+        if cls.use_numpy(a, b):
+            a = numpy.frombuffer(a, dtype=a.typecode)
+            b = numpy.frombuffer(b, dtype=b.typecode)
+            while start < length:
+                end = min(start + block, length)
+                mismatches = numpy.flatnonzero(a[start:end] != b[start:end])
+                if len(mismatches):
+                    return start + int(mismatches[0])
+                start = end
+                block *= 2
+            return length
+
+        while start < length:
+            end = min(start + block, length)
+            if a[start:end] != b[start:end]:
+                while a[start] == b[start]:
+                    start += 1
+                return start
+            start = end
+            block = min(block * 2, 65536)
+        return length
+
+    @classmethod
+    def common_suffix_length(cls, a, b, prefix_length=0):
+        """Returns the number of equal values at the end of the a and b lists.
+        See :meth:`.common_prefix_length`.
+
+        :param a:
+        :param b:
+        :param int prefix_length: The length of the common prefix, which will
+          not be overlapped by the suffix.
+        :return: int
+        """
+        a_length = len(a)
+        b_length = len(b)
+        length = min(a_length, b_length) - prefix_length
+        count = 0
+        block = 64
+
+        if cls.use_numpy(a, b):
+            a = numpy.frombuffer(a, dtype=a.typecode)
+            b = numpy.frombuffer(b, dtype=b.typecode)
+            while count < length:
+                end = min(count + block, length)
+                mismatches = numpy.flatnonzero(
+                    a[a_length - end:a_length - count] !=
+                    b[b_length - end:b_length - count]
+                )
+                if len(mismatches):
+                    return end - int(mismatches[-1]) - 1
+                count = end
+                block *= 2
+            return length
+
+        while count < length:
+            end = min(count + block, length)
+            if a[a_length - end:a_length - count] != \
+                    b[b_length - end:b_length - count]:
+                while a[a_length - count - 1] == b[b_length - count - 1]:
+                    count += 1
+                return count
+            count = end
+            block = min(block * 2, 65536)
+        return length
+
+    @classmethod
+    def use_numpy(cls, a, b):
+        """Can the a and b lists be compared with NumPy?
+        """
+        return numpy is not None \
+            and isinstance(a, array) and isinstance(b, array) \
+            and a.typecode == b.typecode
+
+    @classmethod
+    def intern(cls, a, b, key=None):
+        """Replaces every distinct value of the a and b lists with a dense
+        integer id, so the algorithms only compare integers and every value is
+        hashed once.
+
+        :param a:
+        :param b:
+        :param key: An optional function returning the value that is used for
+          the comparison, i.e. :func:`.ignore_case`.
+        :return: A tuple of two ``array('i')`` instances.
+        """
+        if key is None and isinstance(a, DiffableFile) \
+                and isinstance(b, DiffableFile) and a.encoding == b.encoding:
+            return cls.intern_raw_lines(a, b)
+
+        ids = {}
+        result = []
+        for values in (a, b):
+            if key is not None:
+                values = map(key, values)
+            result.append(
+                array('i', [ids.setdefault(v, len(ids)) for v in values])
+            )
+        return tuple(result)
+
+    @classmethod
+    def intern_raw_lines(cls, a, b):
+        """Interns the lines of two :class:`.DiffableFile` instances by their
+        raw bytes, so only the lines in the Hunks are ever decoded.
+
+        The lines of the common prefix and suffix of the files all get the
+        id 0 without being hashed, which is safe because every algorithm
+        matches the common ends first. The other lines are interned by their
+        hashes and only the position of the first line of every id is kept
+        to resolve the hash collisions, no line is copied. So the memory of
+        the interning depends on the number of the changed lines, not on the
+        size of the files.
+
+        :param a: :class:`.DiffableFile`
+        :param b: :class:`.DiffableFile`
+        :return: A tuple of two ``array('i')`` instances.
+        """
+        a_length = len(a)
+        b_length = len(b)
+        length = min(a_length, b_length)
+        prefix = 0
+        while prefix < length and a.raw_line(prefix) == b.raw_line(prefix):
+            prefix += 1
+        suffix = 0
+        while suffix < length - prefix and \
+                a.raw_line(a_length - 1 - suffix) == \
+                b.raw_line(b_length - 1 - suffix):
+            suffix += 1
+
+        files = (a, b)
+        # the id of the last line with a hash by hash, the previous lines
+        # with the same hash and another value are chained by their ids
+        ids = {}
+        collisions = {}
+        # the file and the line index of the first line of every id, the id
+        # 0 is the common prefix and suffix
+        first_files = array('b', [-1])
+        first_lines = array('q', [-1])
+        result = []
+        for file_index, values in enumerate(files):
+            line_ids = array('i', [0]) * len(values)
+            for i in range(prefix, len(values) - suffix):
+                line = values.raw_line(i)
+                line_hash = hash(line)
+                id_ = ids.get(line_hash)
+                while id_ is not None and files[first_files[id_]].raw_line(
+                        first_lines[id_]) != line:
+                    id_ = collisions.get(id_)
+                if id_ is None:
+                    id_ = len(first_lines)
+                    if line_hash in ids:
+                        collisions[id_] = ids[line_hash]
+                    ids[line_hash] = id_
+                    first_files.append(file_index)
+                    first_lines.append(i)
+                line_ids[i] = id_
+            result.append(line_ids)
+        return tuple(result)
+
+    @classmethod
+    def middle_snake(cls, a, a_start, a_end, b, b_start, b_end, budget=None):
+        """Finds the middle snake of the edit graph of the given ranges of the
+        a and b lists by running the greedy Myers algorithm forward from the
+        start and backward from the end until the two searches overlap.
+
+        :param list a:
+        :param int a_start:
+        :param int a_end:
+        :param list b:
+        :param int b_start:
+        :param int b_end:
+        :param budget: An optional :class:`.DiffBudget`, which is charged for
+          every searched diagonal.
+        :return: A tuple of (x, y, u, v) where a[x:u] and b[y:v] are the
+          matching values of the middle snake, or None if the budget is
+          exhausted.
+        """
+        if budget is not None and budget.exhausted:
+            return None
+
+        n = a_end - a_start
+        m = b_end - b_start
+        delta = n - m
+        odd = delta % 2 != 0
+        max_d = (n + m + 1) // 2
+
+        # The furthest reaching x values on each diagonal k, stored at index
+        # k + offset. The backward search stores the distance from the end.
+        offset = max_d + 1
+        forward = [0] * (2 * offset + 1)
+        backward = [0] * (2 * offset + 1)
+
+        for d in range(max_d + 1):
+            if budget is not None and not budget.spend(2 * d + 2):
+                return None
+            for k in range(-d, d + 1, 2):
+                if k == -d or (k != d and
+                               forward[offset + k - 1] <
+                               forward[offset + k + 1]):
+                    x = forward[offset + k + 1]
+                else:
+                    x = forward[offset + k - 1] + 1
+                y = x - k
+                start_x = x
+                while x < n and y < m \
+                        and a[a_start + x] == b[b_start + y]:
+                    x += 1
+                    y += 1
+                forward[offset + k] = x
+
+                # check if the path overlaps with the backward search of the
+                # previous round, which is on the diagonal delta - k
+                if odd and -d < delta - k < d \
+                        and x + backward[offset + delta - k] >= n:
+                    return (
+                        a_start + start_x, b_start + start_x - k,
+                        a_start + x, b_start + y
+                    )
+
+            for k in range(-d, d + 1, 2):
+                if k == -d or (k != d and
+                               backward[offset + k - 1] <
+                               backward[offset + k + 1]):
+                    x = backward[offset + k + 1]
+                else:
+                    x = backward[offset + k - 1] + 1
+                y = x - k
+                start_x = x
+                while x < n and y < m \
+                        and a[a_end - x - 1] == b[b_end - y - 1]:
+                    x += 1
+                    y += 1
+                backward[offset + k] = x
+
+                if not odd and -d <= delta - k <= d \
+                        and x + forward[offset + delta - k] >= n:
+                    return (
+                        a_end - x, b_end - y,
+                        a_end - start_x, b_end - start_x + k
+                    )
+
     @classmethod
     def reverse_hash(cls, values, start_idx, end_idx):
         """
@@ -332,64 +2189,54 @@ class Diff(object):
 
         return low
 
-    def delete_element(self, a_idx, b_idx, value):
-        """no docstring at the origin
-
-        :param a_idx:
-        :param b_idx:
-        :param value:
-        :return:
-        """
-        if len(self.hunks) == 0 or self.hunks[-1].a_idx + len(self.hunks[-1].delete_values) != a_idx:
-            hunk = Hunk(a_idx, b_idx)
-            self.hunks.append(hunk)
-        else:
-            hunk = self.hunks[-1]
-        hunk.delete_values.append(value)
-
-    def insert_element(self, a_idx, b_idx, value):
-        """no docstring at the origin
-        
-        :param a_idx:
-        :param b_idx:
-        :param value:
-        :return:
-        """
-        if len(self.hunks) == 0 or (self.hunks[-1].b_idx + len(self.hunks[-1].insert_values)) != b_idx:
-            hunk = Hunk(a_idx, b_idx)
-            self.hunks.append(hunk)
-        else:
-            hunk = self.hunks[-1]
-        hunk.insert_values.append(value)
-
 
 class Diffable(list):
     """no docstring at the origin
     """
 
-    def diff(self, b):
+    def diff(self, b, **kwargs):
         """no docstring at origin
 
         :param list b:
+        :param kwargs: Passed to :class:`.Diff`, i.e. ``algorithm``.
         :return:
         """
-        return Diff(self, b)
+        return Diff(self, b, **kwargs)
 
-    def patch(self, diff):
-        return diff.patch(self)
+    def patch(self, diff, inplace=False):
+        """no docstring at origin
+
+        :param diff: A :class:`.Diff` instance.
+        :param bool inplace: If True, this list is modified in place and
+          returned.
+        :return:
+        """
+        return diff.patch(self, inplace=inplace)
+
+    def unpatch(self, diff, inplace=False):
+        """Reverts the given diff, that is, returns the A list of the diff
+        when this is its B list.
+
+        :param diff: A :class:`.Diff` instance.
+        :param bool inplace: If True, this list is modified in place and
+          returned.
+        :return:
+        """
+        return diff.unpatch(self, inplace=inplace)
 
 
 class DiffableString(str):
     """no docstring at the origin
     """
 
-    def diff(self, b):
+    def diff(self, b, **kwargs):
         """no docstring at the origin
 
         :param str b:
+        :param kwargs: Passed to :class:`.Diff`, i.e. ``algorithm``.
         :return:
         """
-        return Diffable(self.split("\n")).diff(b.split("\n"))
+        return Diffable(self.split("\n")).diff(b.split("\n"), **kwargs)
 
     def patch(self, hunks):
         """no docstring at the origin
@@ -398,3 +2245,934 @@ class DiffableString(str):
         :return:
         """
         return '%s' % '\n'.join(Diffable(self.split('\n')).patch(hunks))
+
+    def unpatch(self, diff):
+        """Reverts the given diff, that is, returns the A string of the diff
+        when this is its B string.
+
+        :param diff:
+        :return:
+        """
+        return '\n'.join(diff.unpatch(self.split('\n')))
+
+
+class DiffableFile(object):
+    """A read only list of the lines of a file, which is memory mapped
+    instead of being read. The lines are split on "\\n" like in
+    :class:`.DiffableString`.
+
+    Only the offsets of the lines are stored in a compact integer array, the
+    lines are decoded when they are accessed. When two DiffableFiles are
+    compared, the raw bytes of the lines are hashed straight from the
+    buffers, so only the lines that end up in a Hunk are decoded, see
+    :meth:`.Diff.intern_raw_lines`. After :meth:`.close` the lines are still
+    available, they are read from the file, which is opened again for every
+    read.
+
+    :param str path: The path of the file.
+    :param str encoding: The encoding of the file.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.file = open(path, 'rb')
+        try:
+            if os.fstat(self.file.fileno()).st_size:
+                self.buffer = mmap.mmap(
+                    self.file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            else:
+                # empty files can not be mapped
+                self.buffer = b''
+        except Exception:
+            self.file.close()
+            raise
+        self.offsets = self.index_lines(self.buffer)
+
+    @classmethod
+    def index_lines(cls, buffer):
+        """Returns the start offsets of the lines in the given buffer. An
+        additional offset is appended as if the buffer ended with a newline,
+        so the line i is always buffer[offsets[i]:offsets[i + 1] - 1].
+
+        :param buffer:
+        :return: ``array('q')``
+        """
+        offsets = array('q', [0])
+        find = buffer.find
+        pos = find(b'\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = find(b'\n', pos + 1)
+        offsets.append(len(buffer) + 1)
+        return offsets
+
+    def __reduce__(self):
+        """Pickles the path and the encoding only, so the file is mapped again
+        in the process it is sent to, i.e. by :func:`.diff_many`.
+        """
+        return DiffableFile, (self.path, self.encoding)
+
+    def close(self):
+        """Closes the memory map and the file.
+        """
+        if self.buffer is not None and not isinstance(self.buffer, bytes):
+            self.buffer.close()
+        if self.file is not None:
+            self.file.close()
+        self.buffer = None
+        self.file = None
+
+    def read(self, start, end):
+        """Returns the bytes of the given range of the file from the memory
+        map, or from the file if it is closed.
+
+        :param int start:
+        :param int end:
+        :return: bytes
+        """
+        if self.buffer is not None:
+            return self.buffer[start:end]
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw_line(self, index):
+        """Returns the bytes of the line at the given index without the
+        newline.
+
+        :param int index:
+        :return: bytes
+        """
+        return self.read(self.offsets[index], self.offsets[index + 1] - 1)
+
+    def iter_raw_lines(self):
+        """Yields the bytes of all the lines.
+        """
+        buffer = self.buffer
+        offsets = self.offsets
+        if buffer is None:
+            with open(self.path, 'rb') as f:
+                for i in range(1, len(offsets)):
+                    yield f.read(offsets[i] - offsets[i - 1] - 1)
+                    f.read(1)
+            return
+
+        start = offsets[0]
+        for i in range(1, len(offsets)):
+            end = offsets[i]
+            yield buffer[start:end - 1]
+            start = end
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('DiffableFile index out of range')
+        return self.raw_line(index).decode(self.encoding, 'surrogateescape')
+
+    def __iter__(self):
+        for line in self.iter_raw_lines():
+            yield line.decode(self.encoding, 'surrogateescape')
+
+    def diff(self, b, **kwargs):
+        """Compares this file with the given file.
+
+        :param b: A :class:`.DiffableFile` or the path of a file, which is
+          closed when the Hunks are computed.
+        :param kwargs: Passed to :class:`.Diff`, i.e. ``algorithm``.
+        :return: :class:`.Diff`
+        """
+        if isinstance(b, DiffableFile):
+            return Diff(self, b, **kwargs)
+        with DiffableFile(b, self.encoding) as b:
+            diff = Diff(self, b, **kwargs)
+            diff.hunks
+        return diff
+
+    def patch(self, diff):
+        """Returns the content of this file patched with the given diff.
+
+        :param diff:
+        :return: str
+        """
+        return '\n'.join(diff.patch(self))
+
+    def unpatch(self, diff):
+        """Returns the content of the A file of the given diff, when this is
+        its B file.
+
+        :param diff:
+        :return: str
+        """
+        return '\n'.join(diff.unpatch(self))
+
+    def write_patched(self, diff, fileobj):
+        """Writes the content of this file patched with the given diff to the
+        given binary file object. The unchanged lines are copied straight
+        from the buffer without decoding them.
+
+        :param diff:
+        :param fileobj:
+        :return:
+        """
+        offsets = self.offsets
+        separator = b''
+        pos = 0
+        for hunk in diff.iter_hunks():
+            if hunk.a_idx > pos:
+                fileobj.write(separator)
+                fileobj.write(self.read(offsets[pos], offsets[hunk.a_idx] - 1))
+                separator = b'\n'
+            for value in hunk.insert_values:
+                fileobj.write(separator)
+                fileobj.write(value.encode(self.encoding, 'surrogateescape'))
+                separator = b'\n'
+            pos = hunk.a_idx + len(hunk.delete_values)
+
+        if pos < len(self):
+            fileobj.write(separator)
+            fileobj.write(self.read(offsets[pos], offsets[-1] - 1))
+
+
+def write_varint(buffer, value):
+    """Appends the given non negative integer to the buffer as an unsigned
+    LEB128 varint.
+
+    :param bytearray buffer:
+    :param int value:
+    :return:
+    """
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, pos):
+    """Reads an unsigned LEB128 varint.
+
+    :param data: A bytes like object.
+    :param int pos: The position of the varint.
+    :return: A tuple of the value and the position after the varint.
+    """
+    value = 0
+    shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise ValueError('Truncated delta')
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def apply_delta(base, delta):
+    """Reconstructs the B list of a Diff from its A list and its delta in a
+    single pass, see :meth:`.Diff.to_delta`.
+
+    :param base: The A list of the Diff, i.e. a :class:`.DiffableFile`.
+    :param bytes delta:
+    :return: list
+    """
+    data = memoryview(delta)
+    if len(data) < DELTA_HEADER.size:
+        raise ValueError('Truncated delta')
+    magic, version, value_type = DELTA_HEADER.unpack_from(data, 0)
+    if magic != DELTA_MAGIC or version != DELTA_VERSION:
+        raise ValueError('Not a delta of version %s' % DELTA_VERSION)
+    decode = value_type == b's'
+
+    base_length, pos = read_varint(data, DELTA_HEADER.size)
+    if base_length and base_length - 1 != len(base):
+        raise ValueError(
+            'The delta is for a base of %s values, not %s' % (
+                base_length - 1, len(base)
+            )
+        )
+
+    result = []
+    a_idx = 0
+    end = len(data)
+    while pos < end:
+        opcode = data[pos]
+        count, pos = read_varint(data, pos + 1)
+        if opcode == DELTA_COPY:
+            result.extend(base[a_idx:a_idx + count])
+            a_idx += count
+        elif opcode == DELTA_DELETE:
+            a_idx += count
+        elif opcode == DELTA_INSERT:
+            for _ in range(count):
+                length, pos = read_varint(data, pos)
+                if pos + length > end:
+                    raise ValueError('Truncated delta')
+                if decode:
+                    result.append(
+                        str(data[pos:pos + length], 'utf-8', 'surrogateescape')
+                    )
+                else:
+                    result.append(bytes(data[pos:pos + length]))
+                pos += length
+        else:
+            raise ValueError('Unknown delta opcode: %s' % opcode)
+    result.extend(base[a_idx:])
+    return result
+
+
+def diff_files(path_a, path_b, encoding='utf-8', **kwargs):
+    """Compares the given files line by line without reading them into memory,
+    see :class:`.DiffableFile`. The files are closed when the Hunks are
+    computed, the lines that are needed later, i.e. the context lines of the
+    unified format, are read from the files again.
+
+    :param str path_a:
+    :param str path_b:
+    :param str encoding: The encoding of the files.
+    :param kwargs: Passed to :class:`.Diff`, i.e. ``algorithm``.
+    :return: :class:`.Diff`
+    """
+    with DiffableFile(path_a, encoding) as a:
+        with DiffableFile(path_b, encoding) as b:
+            diff = Diff(a, b, **kwargs)
+            diff.hunks
+    return diff
+
+
+def diff_batch(batch, kwargs):
+    """Computes the Diffs of a batch of pairs in a worker process of
+    :func:`.diff_many`.
+
+    :param list batch: A list of (index, a, b) tuples.
+    :param dict kwargs: The :class:`.Diff` arguments.
+    :return: A list of (index, :class:`.Diff`) tuples.
+    """
+    return [(index, Diff(a, b, **kwargs)) for index, a, b in batch]
+
+
+def batch_pairs(pairs, chunksize=None, batch_length=10000):
+    """Groups the pairs into the batches that are sent to the worker
+    processes of :func:`.diff_many`.
+
+    :param list pairs: A list of (a, b) tuples.
+    :param int chunksize: The number of pairs in a batch. By default the
+      pairs are grouped until the total length of their lists reaches the
+      batch_length, so the small pairs are sent together and the large pairs
+      are sent alone.
+    :param int batch_length: See chunksize.
+    :return: A list of lists of (index, a, b) tuples.
+    """
+    batches = []
+    batch = []
+    length = 0
+    for index, (a, b) in enumerate(pairs):
+        batch.append((index, a, b))
+        length += len(a) + len(b)
+        if (chunksize and len(batch) >= chunksize) \
+                or (not chunksize and length >= batch_length):
+            batches.append(batch)
+            batch = []
+            length = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def diff_many(pairs, jobs=None, chunksize=None, **kwargs):
+    """Computes the Diffs of many pairs of lists in a process pool.
+
+    The lists and the arguments are pickled, so they should be picklable.
+    :class:`.DiffableFile` instances are sent by their paths. The Diffs are
+    sent back by their Hunks and are bound to the lists of the pairs again,
+    like the Diffs of :class:`.DiffCache`, so their index translation tables
+    are None.
+
+    :param pairs: The (a, b) tuples.
+    :param int jobs: The number of worker processes. Defaults to the number of
+      CPUs, if it is 1 the Diffs are computed in the current process.
+    :param int chunksize: The number of pairs sent to a worker at once, see
+      :func:`.batch_pairs`.
+    :param kwargs: Passed to :class:`.Diff`.
+    :return: Yields (index, :class:`.Diff`) tuples in the order the Diffs are
+      completed, the index is the index of the pair.
+    """
+    pairs = list(pairs)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        for index, (a, b) in enumerate(pairs):
+            yield index, Diff(a, b, **kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(diff_batch, batch, kwargs)
+            for batch in batch_pairs(pairs, chunksize)
+        ]
+        for future in as_completed(futures):
+            for index, diff in future.result():
+                a, b = pairs[index]
+                yield index, diff.bind(a, b)
+
+
+async def diff_many_async(pairs, jobs=None, chunksize=None, executor=None,
+                          **kwargs):
+    """The asyncio version of :func:`.diff_many`. The Diffs are computed in
+    an executor, so the event loop is not blocked while waiting for them::
+
+      async for index, diff in diff_many_async(pairs):
+          ...
+
+    :param pairs: The (a, b) tuples.
+    :param int jobs: The number of worker processes of the process pool. If
+      it is 1 the default executor of the event loop is used.
+    :param int chunksize: See :func:`.diff_many`.
+    :param executor: An optional executor to use instead of creating a
+      process pool, it is not shut down.
+    :param kwargs: Passed to :class:`.Diff`.
+    :return: Yields (index, :class:`.Diff`) tuples in the order the Diffs are
+      completed.
+    """
+    pairs = list(pairs)
+    jobs = jobs or os.cpu_count() or 1
+    own_executor = executor is None and jobs > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+
+    loop = asyncio.get_running_loop()
+    try:
+        futures = [
+            loop.run_in_executor(executor, diff_batch, batch, kwargs)
+            for batch in batch_pairs(pairs, chunksize)
+        ]
+        for future in asyncio.as_completed(futures):
+            for index, diff in await future:
+                a, b = pairs[index]
+                yield index, diff.bind(a, b)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+class MergeRegion(object):
+    """A region of a three-way merge, see :class:`.MergeResult`.
+
+    The kind of the region is one of:
+
+    * ``"unchanged"``: The values are the same in all the lists.
+    * ``"ours"``: Only changed in the ours list.
+    * ``"theirs"``: Only changed in the theirs list.
+    * ``"both"``: Changed the same way in both of the lists.
+    * ``"conflict"``: Changed differently in both of the lists.
+
+    :param str kind:
+    :param int base_idx: The index in the base list.
+    :param int ours_idx: The index in the ours list.
+    :param int theirs_idx: The index in the theirs list.
+    :param list base_values: The values of the region in the base list.
+    :param list ours_values: The values of the region in the ours list.
+    :param list theirs_values: The values of the region in the theirs list.
+    """
+
+    __slots__ = ('kind', 'base_idx', 'ours_idx', 'theirs_idx', 'base_values',
+                 'ours_values', 'theirs_values')
+
+    def __init__(self, kind, base_idx, ours_idx, theirs_idx, base_values,
+                 ours_values, theirs_values):
+        self.kind = kind
+        self.base_idx = base_idx
+        self.ours_idx = ours_idx
+        self.theirs_idx = theirs_idx
+        self.base_values = base_values
+        self.ours_values = ours_values
+        self.theirs_values = theirs_values
+
+    @property
+    def values(self):
+        """The merged values of the region, None for a conflict.
+        """
+        if self.kind == 'conflict':
+            return None
+        if self.kind == 'theirs':
+            return self.theirs_values
+        return self.ours_values
+
+    def __repr__(self):
+        return '<MergeRegion %s base=%s ours=%s theirs=%s>' % (
+            self.kind, self.base_idx, self.ours_idx, self.theirs_idx
+        )
+
+
+class MergeResult(object):
+    """The result of a three-way merge, see :func:`.merge3`.
+
+    The index translation tables of the two Diffs are walked together. The
+    base values matched in both of the Diffs are the sync points and every
+    range between two sync points is classified by checking if it is
+    completely matched in the Diffs, so the merge is linear in the size of
+    the lists.
+
+    :param base: The base list.
+    :param ours: The ours list.
+    :param theirs: The theirs list.
+    :param ours_diff: The :class:`.Diff` of the base and ours lists.
+    :param theirs_diff: The :class:`.Diff` of the base and theirs lists. The
+      index translation tables of the Diffs are rebuilt from their Hunks if
+      needed, so they should be bound to the lists.
+    """
+
+    def __init__(self, base, ours, theirs, ours_diff, theirs_diff):
+        for diff in (ours_diff, theirs_diff):
+            if diff.index_translation_table is None:
+                diff.rebuild_index_translation_table()
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+        self.key = ours_diff.key
+        self.regions = []
+        self.merge(
+            ours_diff.index_translation_table,
+            theirs_diff.index_translation_table
+        )
+
+    def merge(self, ours_table, theirs_table):
+        """Creates the regions of the merge.
+
+        :param list ours_table: The index translation table of the base and
+          ours lists.
+        :param list theirs_table: The index translation table of the base and
+          theirs lists.
+        :return:
+        """
+        base_length = len(self.base)
+        base_idx = ours_idx = theirs_idx = 0
+        sync_start = None
+        for i in range(base_length + 1):
+            if i < base_length:
+                o = ours_table[i]
+                t = theirs_table[i]
+                if o is None or t is None:
+                    continue
+            else:
+                # the end of the lists is the last sync point
+                o = len(self.ours)
+                t = len(self.theirs)
+
+            if base_idx < i or ours_idx < o or theirs_idx < t:
+                if sync_start is not None:
+                    self.add_unchanged(sync_start, base_idx, ours_idx,
+                                       theirs_idx)
+                    sync_start = None
+                self.add_changed(
+                    ours_table, theirs_table,
+                    base_idx, i, ours_idx, o, theirs_idx, t
+                )
+            if i < base_length and sync_start is None:
+                sync_start = (i, o, t)
+            base_idx, ours_idx, theirs_idx = i + 1, o + 1, t + 1
+
+        if sync_start is not None:
+            self.add_unchanged(sync_start, base_length, len(self.ours),
+                               len(self.theirs))
+
+    def add_unchanged(self, start, base_end, ours_end, theirs_end):
+        """Adds an unchanged region.
+        """
+        base_start, ours_start, theirs_start = start
+        self.regions.append(MergeRegion(
+            'unchanged', base_start, ours_start, theirs_start,
+            self.base[base_start:base_end],
+            self.ours[ours_start:ours_end],
+            self.theirs[theirs_start:theirs_end]
+        ))
+
+    def add_changed(self, ours_table, theirs_table, base_start, base_end,
+                    ours_start, ours_end, theirs_start, theirs_end):
+        """Classifies and adds the region between two sync points.
+        """
+        ours_values = self.ours[ours_start:ours_end]
+        theirs_values = self.theirs[theirs_start:theirs_end]
+        if self.is_unchanged(ours_table, base_start, base_end,
+                             ours_end - ours_start):
+            kind = 'theirs'
+        elif self.is_unchanged(theirs_table, base_start, base_end,
+                               theirs_end - theirs_start):
+            kind = 'ours'
+        elif self.compare_keys(ours_values) == \
+                self.compare_keys(theirs_values):
+            kind = 'both'
+        else:
+            kind = 'conflict'
+        self.regions.append(MergeRegion(
+            kind, base_start, ours_start, theirs_start,
+            self.base[base_start:base_end], ours_values, theirs_values
+        ))
+
+    @classmethod
+    def is_unchanged(cls, table, start, end, length):
+        """Is the base[start:end] range completely matched to a range of the
+        given length?
+        """
+        if end - start != length:
+            return False
+        for i in range(start, end):
+            if table[i] is None:
+                return False
+        return True
+
+    def compare_keys(self, values):
+        """Returns the values that are compared for the given values.
+        """
+        if self.key is None:
+            return list(values)
+        return [self.key(value) for value in values]
+
+    @property
+    def conflicts(self):
+        """The list of the conflicting regions.
+        """
+        return [region for region in self.regions
+                if region.kind == 'conflict']
+
+    @property
+    def has_conflicts(self):
+        """Has the merge any conflicts?
+        """
+        return any(region.kind == 'conflict' for region in self.regions)
+
+    def merged(self, ours_label='ours', theirs_label='theirs',
+               base_label=None):
+        """Returns the merged list. The conflicts are marked with the git
+        style ``<<<<<<<``, ``=======`` and ``>>>>>>>`` markers.
+
+        :param str ours_label: The label after the ``<<<<<<<`` marker.
+        :param str theirs_label: The label after the ``>>>>>>>`` marker.
+        :param str base_label: If given, the base values are also shown after
+          a ``|||||||`` marker with this label.
+        :return: list
+        """
+        result = []
+        for region in self.regions:
+            if region.kind != 'conflict':
+                result.extend(region.values)
+                continue
+            result.append('<<<<<<< %s' % ours_label)
+            result.extend(region.ours_values)
+            if base_label is not None:
+                result.append('||||||| %s' % base_label)
+                result.extend(region.base_values)
+            result.append('=======')
+            result.extend(region.theirs_values)
+            result.append('>>>>>>> %s' % theirs_label)
+        return result
+
+
+def merge3(base, ours, theirs, **kwargs):
+    """Merges the changes of the ours and theirs lists to the base list. The
+    base list is diffed with each of the lists once.
+
+    :param base: The base list.
+    :param ours: The ours list.
+    :param theirs: The theirs list.
+    :param kwargs: Passed to :class:`.Diff`, i.e. ``algorithm`` or ``key``.
+    :return: :class:`.MergeResult`
+    """
+    return MergeResult(
+        base, ours, theirs, Diff(base, ours, **kwargs),
+        Diff(base, theirs, **kwargs)
+    )
+
+
+class DiffCache(object):
+    """Caches the Diffs of list pairs by the content digests of the lists.
+
+    The Diffs are stored pickled, see :meth:`.Diff.__reduce__`, in a bounded
+    LRU in memory and optionally in a directory, so an unchanged pair of lists
+    is never compared again, even in another process.
+
+    The files in the directory start with the format version and an HMAC of
+    the pickled Diff, so only the files written with the same key are
+    unpickled and the others are removed. The key is read from the ``.key``
+    file of the directory, which is created with a random key if it doesn't
+    exist and must only be readable and writable by its owner. The least
+    recently used files are removed if the files take more than max_bytes.
+
+    :param int maxsize: The maximum number of Diffs kept in memory.
+    :param str directory: The optional directory to store the Diffs in.
+    :param int max_bytes: The maximum total size of the files in the
+      directory.
+    :param bytes secret: The key of the HMACs, instead of the key file.
+    """
+
+    # The version of the file format, which also changes if the pickled
+    # Diffs can't be restored by this version.
+    format_version = 1
+
+    key_file_name = '.key'
+
+    def __init__(self, maxsize=128, directory=None, max_bytes=256 << 20,
+                 secret=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.secret = secret
+        if directory:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, mode=0o700)
+            if secret is None:
+                self.secret = self.read_secret()
+        self.header = b'pytj-diff %d\n' % self.format_version
+
+    def read_secret(self):
+        """Returns the key of the HMACs from the key file of the directory,
+        which is created if it doesn't exist.
+
+        :raise ValueError: If the key file is not private to the current user.
+        :return: bytes
+        """
+        path = os.path.join(self.directory, self.key_file_name)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(os.urandom(32))
+
+        stat = os.stat(path)
+        if hasattr(os, 'getuid') and (
+                stat.st_uid != os.getuid() or stat.st_mode & 0o077):
+            raise ValueError(
+                'The key file %s of the DiffCache should only be accessible '
+                'by its owner' % path
+            )
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def sign(self, data):
+        """Returns the HMAC of the given pickled Diff.
+
+        :param bytes data:
+        :return: bytes
+        """
+        return hmac.new(self.secret, self.header + data, 'sha256').digest()
+
+    @classmethod
+    def digest(cls, values):
+        """Returns the content digest of the given list.
+
+        :param values: A list of values or a :class:`.DiffableFile`.
+        :return: str
+        """
+        hash_ = hashlib.sha1()
+        if isinstance(values, DiffableFile):
+            hash_.update(b'file:')
+            if values.buffer is not None:
+                hash_.update(values.buffer)
+            else:
+                with open(values.path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        hash_.update(chunk)
+            return hash_.hexdigest()
+
+        for value in values:
+            if isinstance(value, bytes):
+                data = b'b' + value
+            elif isinstance(value, str):
+                data = b's' + value.encode('utf-8', 'surrogateescape')
+            else:
+                data = b'r' + repr(value).encode('utf-8')
+            # prefix the values with their lengths to keep them separated
+            hash_.update(b'%d:' % len(data))
+            hash_.update(data)
+        return hash_.hexdigest()
+
+    @classmethod
+    def callable_name(cls, value):
+        """Returns the importable name of the given function, which
+        identifies it across the processes, or None if the name doesn't
+        identify it, i.e. for lambdas, nested functions and partials.
+
+        :param value:
+        :return: str or None
+        """
+        module = sys.modules.get(getattr(value, '__module__', None) or '')
+        qualname = getattr(value, '__qualname__', None)
+        if module is None or not qualname:
+            return None
+        resolved = module
+        for part in qualname.split('.'):
+            resolved = getattr(resolved, part, None)
+        if resolved is not value:
+            return None
+        return '%s.%s' % (module.__name__, qualname)
+
+    def cache_key(self, a, b, **kwargs):
+        """Returns the key of the Diff of the given lists with the given
+        options.
+
+        :param a:
+        :param b:
+        :param kwargs: The :class:`.Diff` arguments.
+        :return: str or None if an option is a function that can not be
+          identified by its name, see :meth:`.callable_name`, so the Diff
+          should not be cached.
+        """
+        options = []
+        for name in sorted(kwargs):
+            if name in ('stats', 'budget'):
+                # doesn't change the Diff, the approximate Diffs are not
+                # cached
+                continue
+            value = kwargs[name]
+            if callable(value):
+                value = self.callable_name(value)
+                if value is None:
+                    return None
+            options.append('%s=%r' % (name, value))
+
+        hash_ = hashlib.sha1()
+        hash_.update(self.digest(a).encode('ascii'))
+        hash_.update(self.digest(b).encode('ascii'))
+        hash_.update(','.join(options).encode('utf-8'))
+        return hash_.hexdigest()
+
+    def path(self, key):
+        """Returns the path of the file storing the Diff with the given key.
+
+        :param str key:
+        :return: str
+        """
+        return os.path.join(self.directory, '%s.pickle' % key)
+
+    def get(self, key):
+        """Returns the pickled Diff with the given key or None.
+
+        :param str key:
+        :return: bytes
+        """
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            return data
+
+        if self.directory:
+            path = self.path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # mark the file as recently used
+                os.utime(path)
+            except (IOError, OSError):
+                return None
+            # the files of another format version or with another key are
+            # never unpickled
+            start = len(self.header) + 32
+            signature = data[len(self.header):start]
+            if not data.startswith(self.header) or not hmac.compare_digest(
+                    signature, self.sign(data[start:])):
+                logger.warning('Removing the invalid DiffCache file %s', path)
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                return None
+            data = data[start:]
+            self.store(key, data)
+        return data
+
+    def store(self, key, data):
+        """Stores the pickled Diff in the memory LRU.
+
+        :param str key:
+        :param bytes data:
+        :return:
+        """
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def put(self, key, diff):
+        """Stores the given Diff in the memory LRU and in the directory.
+
+        :param str key:
+        :param diff: :class:`.Diff`
+        :return:
+        """
+        data = pickle.dumps(diff, pickle.HIGHEST_PROTOCOL)
+        self.store(key, data)
+        if self.directory:
+            write_atomically(
+                self.path(key), self.header + self.sign(data) + data
+            )
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used files from the directory until
+        they take at most max_bytes.
+        """
+        files = []
+        total = 0
+        for path in glob.glob(os.path.join(self.directory, '*.pickle')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            total -= size
+
+    def diff(self, a, b, **kwargs):
+        """Returns the Diff of the given lists, from the cache if possible.
+        The Diffs with a key function that can not be identified by its name
+        are never cached.
+
+        :param a:
+        :param b:
+        :param kwargs: Passed to :class:`.Diff`.
+        :return: :class:`.Diff`
+        """
+        key = self.cache_key(a, b, **kwargs)
+        if key is None:
+            self.misses += 1
+            return Diff(a, b, **kwargs)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return pickle.loads(data).bind(a, b)
+
+        self.misses += 1
+        diff = Diff(a, b, **kwargs)
+        if not diff.approximate:
+            self.put(key, diff)
+        return diff
+
+    def clear(self):
+        """Removes all the Diffs from the memory and the directory.
+        """
+        self.entries.clear()
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, '*.pickle')):
+                os.remove(path)
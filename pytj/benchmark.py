@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks for :mod:`pytj.algorithm_diff`.
+
+Run it with::
+
+  python -m pytj.benchmark --sizes 1000,10000 --algorithms lcs,patience
+
+Every workload is diffed with every algorithm and size. The throughput, the
+time of every phase and the peak memory measured with tracemalloc are
+reported and compared with the stored baseline file, the run fails if any
+case is slower or uses more memory than the baseline allows. Every run of
+a case is preceded by a run of a fixed calibration workload and the times
+are compared relative to it, so the baseline of one machine can be checked
+on another one and the changing speed of a busy machine is cancelled out.
+The allowed increase of a case is at least three times the spread of its
+runs. Use ``--save-baseline`` to store the results as the new baseline, only
+the relative times and the peak memory are stored.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from pytj.algorithm_diff import Diff
+from pytj.testing import ReferenceGenerator
+
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(ReferenceGenerator.test_suite_path),
+    'benchmark_baseline.json'
+)
+
+
+def apply_random_edits(rng, values, edit_ratio, new_value):
+    """Returns a copy of the given list with randomly inserted, deleted and
+    replaced values.
+
+    :param rng: A ``random.Random`` instance.
+    :param list values:
+    :param float edit_ratio: The ratio of the edited values.
+    :param new_value: A function returning a new value for the given index.
+    :return: list
+    """
+    result = list(values)
+    edit_count = max(1, int(len(values) * edit_ratio))
+    for i in sorted(rng.sample(range(len(values)), edit_count), reverse=True):
+        operation = rng.randrange(3)
+        if operation == 0:
+            result.insert(i, new_value(i))
+        elif operation == 1:
+            del result[i]
+        else:
+            result[i] = new_value(i)
+    return result
+
+
+def random_sparse_edits(size, seed=0):
+    """Distinct lines with 1% of them edited.
+    """
+    rng = random.Random(seed)
+    a = ['line %s %s' % (i, rng.random()) for i in range(size)]
+    return a, apply_random_edits(rng, a, 0.01, lambda i: 'new %s' % i)
+
+
+def heavy_duplication(size, seed=0):
+    """Lines of a few distinct values, like the closing braces and empty
+    cells of the reports, with 1% of them edited.
+    """
+    rng = random.Random(seed)
+    values = ['}', '', '""', ';', '  }', '{']
+    a = [rng.choice(values) for _ in range(size)]
+    return a, apply_random_edits(rng, a, 0.01, lambda i: rng.choice(values))
+
+
+def shared_prefix_suffix(size, seed=0):
+    """Identical lines except for a few lines in the middle.
+    """
+    a = ['line %s' % i for i in range(size)]
+    b = list(a)
+    middle = size // 2
+    b[middle:middle + 5] = ['changed %s' % i for i in range(3)]
+    return a, b
+
+
+def disjoint(size, seed=0):
+    """Lines without any common values.
+    """
+    return (
+        ['a %s' % i for i in range(size)],
+        ['b %s' % i for i in range(size)]
+    )
+
+
+def reference_files(size, seed=0):
+    """The lines of the reference files of the TestSuite, repeated or cut to
+    the given size, with 1% of them edited.
+    """
+    lines = []
+    pattern = os.path.join(
+        ReferenceGenerator.test_suite_path, '*', 'refs', '*'
+    )
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            lines.extend(f.read().split('\n'))
+    a = (lines * (size // len(lines) + 1))[:size]
+    rng = random.Random(seed)
+    return a, apply_random_edits(rng, a, 0.01, lambda i: 'new %s' % i)
+
+
+WORKLOADS = {
+    'sparse': random_sparse_edits,
+    'duplication': heavy_duplication,
+    'prefix_suffix': shared_prefix_suffix,
+    'disjoint': disjoint,
+    'refs': reference_files,
+}
+
+
+def calibrate(repeat=5, min_duration=0.1):
+    """Returns the time of a fixed workload, which doesn't use
+    :mod:`pytj.algorithm_diff`, to measure the speed of the machine. The
+    workload only looks integers up in a dictionary, so it doesn't depend on
+    the state of the memory allocator.
+
+    :param int repeat: The number of runs, the median run is returned.
+    :param float min_duration: The workload is repeated for at least this
+      many seconds in every run.
+    :return: The time of a single workload in seconds.
+    """
+    table = dict((i, i * 7 % 1000) for i in range(1000))
+    times = []
+    for _ in range(repeat):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            total = 0
+            for i in range(200000):
+                total += table[i % 1000]
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_duration:
+                break
+        times.append(elapsed / count)
+    return median(times)
+
+
+def median(values):
+    """Returns the median of the given numbers.
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+@contextlib.contextmanager
+def timer(timings, phase):
+    """Adds the wall clock time of the block to the given phase.
+    """
+    start = time.perf_counter()
+    yield
+    timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def run_case(a, b, algorithm):
+    """Runs all the phases of a diff once. The index translations are
+    computed from the interned lists, so the ``"diff"`` phase doesn't include
+    the ``"intern"`` phase.
+
+    :param list a:
+    :param list b:
+    :param str algorithm:
+    :return: A dictionary of phase names and times.
+    """
+    timings = {}
+    with timer(timings, 'intern'):
+        a_ids, b_ids = Diff.intern(a, b)
+    compute = getattr(Diff, Diff.algorithms[algorithm])
+    with timer(timings, 'diff'):
+        table = compute(a_ids, b_ids)
+    diff = Diff.from_hunks(None, a, b, algorithm=algorithm)
+    diff.index_translation_table = table
+    with timer(timings, 'hunks'):
+        diff.hunks
+    with timer(timings, 'patch'):
+        patched = diff.patch(a)
+    with timer(timings, 'edit_script'):
+        diff.edit_script()
+    assert patched == b, 'patch failed'
+    return timings
+
+
+def measure_peak_memory(a, b, algorithm):
+    """Returns the peak memory allocated while diffing and patching.
+    """
+    tracemalloc.start()
+    try:
+        diff = Diff(a, b, algorithm=algorithm)
+        diff.patch(a)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(workloads, sizes, algorithms, repeat=5, output=None,
+                   max_seconds=10.0, min_duration=0.05):
+    """Runs the benchmarks.
+
+    :param list workloads: The names of the workloads.
+    :param list sizes: The sizes of the A lists.
+    :param list algorithms: The names of the diff algorithms.
+    :param int repeat: The number of runs, every run is preceded by a run
+      of the calibration workload, see :func:`.calibrate`. The phase times
+      of the fastest run and the median of the relative times are reported.
+    :param output: A file to write the progress to.
+    :param float max_seconds: The larger sizes of a workload are skipped for
+      an algorithm, if a run of them is expected to take longer than this
+      when the time of the previous size is extrapolated cubically, which is
+      the worst case of the LCS algorithm with many duplicated values.
+    :param float min_duration: The minimum duration of a calibration run.
+    :return: A dictionary of case names and results, the ``"relative_time"``
+      of a result is its time divided by the time of the calibration
+      workload and its ``"spread"`` is the difference of the largest and the
+      smallest relative time of the runs divided by the median.
+    """
+    results = {}
+    for workload in workloads:
+        previous = {}
+        for size in sorted(sizes):
+            a, b = WORKLOADS[workload](size)
+            for algorithm in algorithms:
+                name = '%s/%s/%s' % (workload, size, algorithm)
+                if algorithm in previous:
+                    previous_size, previous_time = previous[algorithm]
+                    expected = previous_time * (size / previous_size) ** 3
+                    if expected > max_seconds:
+                        if output:
+                            output.write('%-32s skipped\n' % name)
+                        continue
+
+                runs = []
+                relative_times = []
+                for _ in range(repeat):
+                    calibration = calibrate(1, min_duration)
+                    timings = run_case(a, b, algorithm)
+                    runs.append(timings)
+                    relative_times.append(case_time(timings) / calibration)
+                best = min(runs, key=case_time)
+                previous[algorithm] = (size, best['diff'])
+                total = case_time(best)
+                relative_time = median(relative_times)
+                results[name] = {
+                    'phases': best,
+                    'time': total,
+                    'relative_time': relative_time,
+                    'spread': (
+                        max(relative_times) - min(relative_times)
+                    ) / relative_time if relative_time else 0.0,
+                    'throughput': (len(a) + len(b)) / total if total else 0,
+                    'peak_memory': measure_peak_memory(a, b, algorithm),
+                }
+                if output:
+                    output.write('%s\n' % format_result(name, results[name]))
+    return results
+
+
+def case_time(timings):
+    """Returns the time of the compared phases of a run of a case.
+    """
+    return timings['diff'] + timings['hunks'] + timings['patch']
+
+
+def format_result(name, result):
+    """Formats a single result as a line of text.
+    """
+    phases = ' '.join(
+        '%s=%.4fs' % (phase, result['phases'][phase])
+        for phase in ['intern', 'diff', 'hunks', 'patch', 'edit_script']
+    )
+    return '%-32s %12.0f values/s %8.3f (+-%3.0f%%) %10.1f KiB  %s' % (
+        name, result['throughput'], result['relative_time'],
+        result['spread'] * 50, result['peak_memory'] / 1024.0, phases
+    )
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25,
+                          min_relative_time=0.25):
+    """Compares the results with the baseline.
+
+    :param dict results:
+    :param dict baseline:
+    :param float tolerance: The allowed relative increase of the relative
+      time and the peak memory. The allowed increase of the relative time is
+      at least three times the larger spread of the result and the baseline.
+    :param float min_relative_time: The relative times of the cases, which
+      are smaller than this in the baseline, are not compared, they are
+      mostly noise.
+    :return: A list of regression messages.
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        for metric in ['relative_time', 'peak_memory']:
+            if metric not in baseline[name]:
+                continue
+            allowed = tolerance
+            if metric == 'relative_time':
+                if baseline[name][metric] < min_relative_time:
+                    continue
+                allowed = max(allowed, 3 * max(
+                    results[name].get('spread', 0.0),
+                    baseline[name].get('spread', 0.0)
+                ))
+            value = results[name][metric]
+            limit = baseline[name][metric] * (1 + allowed)
+            if value > limit:
+                regressions.append(
+                    '%s: %s is %.4g, the baseline is %.4g' % (
+                        name, metric, value, baseline[name][metric]
+                    )
+                )
+    return regressions
+
+
+def main(argv=None):
+    """The command line interface of the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--workloads', default=','.join(sorted(WORKLOADS)),
+        help='comma separated workload names'
+    )
+    parser.add_argument(
+        '--sizes', default='100,1000,10000',
+        help='comma separated sizes, i.e. 100,1000,10000,100000,1000000'
+    )
+    parser.add_argument(
+        '--algorithms', default='lcs,myers,patience,histogram',
+        help='comma separated diff algorithm names'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--max-seconds', type=float, default=10.0,
+        help='skip the sizes of a workload that are expected to take longer '
+             'than this for an algorithm'
+    )
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.workloads.split(','),
+        [int(size) for size in args.sizes.split(',')],
+        args.algorithms.split(','),
+        args.repeat,
+        sys.stdout,
+        args.max_seconds
+    )
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for name, result in results.items():
+            # the absolute times only apply to this machine
+            baseline[name] = dict(
+                (metric, result[metric])
+                for metric in ['relative_time', 'spread', 'peak_memory']
+            )
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print('Saved the baseline to %s' % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline at %s' % args.baseline)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION %s' % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
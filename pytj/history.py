@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+"""Delta compressed history of the generated reports
+"""
+
+import hashlib
+import json
+import os
+
+from pytj.algorithm_diff import Diff, DiffableFile, DiffCache, apply_delta
+from pytj.utils import write_atomically
+
+
+class HistoryStore(object):
+    """Stores the versions of the reports in a directory.
+
+    Every version is stored as a delta of the previous version, except for
+    every snapshot_interval'th version, which is stored as a delta of an
+    empty report, that is a full snapshot. So a version is reconstructed by
+    applying at most snapshot_interval deltas to the previous snapshot and
+    the store grows with the amount of the changes instead of the number of
+    the versions. The files of the deltas are listed in the ``index.json``
+    file of the directory.
+
+    :param str directory: The directory of the store, which is created if it
+      doesn't exist.
+    :param int snapshot_interval: The number of versions between two
+      snapshots.
+    :param str algorithm: The algorithm of the Diffs, see :class:`.Diff`.
+    """
+
+    index_file_name = 'index.json'
+
+    def __init__(self, directory, snapshot_interval=10, algorithm='myers'):
+        if snapshot_interval < 1:
+            raise ValueError('snapshot_interval should be at least 1')
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.algorithm = algorithm
+        self.index_path = os.path.join(directory, self.index_file_name)
+
+        # The last reconstructed version of every report by name, the new
+        # versions are diffed with it.
+        self.cache = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def names(self):
+        """Returns the sorted names of the stored reports.
+        """
+        return sorted(self.index)
+
+    def versions(self, name):
+        """Returns the entries of the versions of the given report, which are
+        dictionaries with the "file", "snapshot", "size", "lines" and "sha1"
+        keys.
+
+        :param str name:
+        :return: list
+        """
+        return self.index.get(name, [])
+
+    def file_prefix(self, name):
+        """Returns the prefix of the file names of the given report, the
+        report names may contain path separators.
+
+        :param str name:
+        :return: str
+        """
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]
+
+    def add(self, name, lines):
+        """Stores a new version of the given report.
+
+        :param str name: The name of the report.
+        :param lines: The lines of the report.
+        :return: The number of the new version, starting from 0.
+        """
+        lines = list(lines)
+        versions = self.index.setdefault(name, [])
+        version = len(versions)
+        snapshot = version % self.snapshot_interval == 0
+
+        base = [] if snapshot else self.get(name, version - 1)
+        delta = Diff(base, lines, algorithm=self.algorithm).to_delta()
+
+        file_name = '%s-%s.%s' % (
+            self.file_prefix(name), version,
+            'snapshot' if snapshot else 'delta'
+        )
+        write_atomically(os.path.join(self.directory, file_name), delta)
+        versions.append({
+            'file': file_name,
+            'snapshot': snapshot,
+            'size': len(delta),
+            'lines': len(lines),
+            'sha1': DiffCache.digest(lines),
+        })
+        self.save_index()
+        self.cache[name] = (version, lines)
+        return version
+
+    def add_file(self, name, path, encoding='utf-8'):
+        """Stores the given file as a new version of the given report.
+
+        :param str name: The name of the report.
+        :param str path: The path of the report file.
+        :param str encoding: The encoding of the file.
+        :return: The number of the new version.
+        """
+        with DiffableFile(path, encoding) as lines:
+            return self.add(name, lines)
+
+    def get(self, name, version=-1):
+        """Reconstructs the given version of the given report.
+
+        :param str name: The name of the report.
+        :param int version: The number of the version, negative numbers
+          count from the last version.
+        :return: The list of the lines.
+        """
+        versions = self.versions(name)
+        if not versions:
+            raise KeyError('No report named %s' % name)
+        if version < 0:
+            version += len(versions)
+        if not 0 <= version < len(versions):
+            raise IndexError(
+                'Version %s of %s does not exist' % (version, name)
+            )
+
+        cached = self.cache.get(name)
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+
+        # replay the deltas from the previous snapshot, or from the cached
+        # version if it is closer
+        start = version
+        while not versions[start]['snapshot']:
+            start -= 1
+        lines = []
+        if cached is not None and start <= cached[0] < version:
+            start = cached[0] + 1
+            lines = list(cached[1])
+
+        for i in range(start, version + 1):
+            with open(os.path.join(self.directory,
+                                   versions[i]['file']), 'rb') as f:
+                lines = apply_delta([] if versions[i]['snapshot'] else lines,
+                                    f.read())
+
+        if DiffCache.digest(lines) != versions[version]['sha1']:
+            raise ValueError(
+                'Version %s of %s is corrupted' % (version, name)
+            )
+        self.cache[name] = (version, lines)
+        return list(lines)
+
+    def size(self):
+        """Returns the total size of the deltas in bytes.
+        """
+        return sum(
+            entry['size']
+            for versions in self.index.values() for entry in versions
+        )
+
+    def save_index(self):
+        """Saves the index of the store.
+        """
+        write_atomically(
+            self.index_path, json.dumps(self.index, indent=1, sort_keys=True)
+        )
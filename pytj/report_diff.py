@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+"""Structured comparison of the generated reports
+"""
+
+import csv
+import html
+import math
+import os
+import re
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+from pytj.algorithm_diff import Diff
+
+
+def read_csv(path, separator=';', encoding='utf-8'):
+    """Reads a CSV report.
+
+    :param str path:
+    :param str separator: The cell separator of the report.
+    :param str encoding:
+    :return: A tuple of the header and the list of the rows, which are lists
+      of strings.
+    """
+    with open(path, newline='', encoding=encoding) as f:
+        rows = [row for row in csv.reader(f, delimiter=separator) if row]
+    if not rows:
+        return [], []
+    return rows[0], rows[1:]
+
+
+class CsvDiff(object):
+    """Compares two CSV reports row by row.
+
+    The rows are aligned by the value of their key column with a hash join,
+    so the comparison is linear and a re-sorted report doesn't make every row
+    look changed. If a key value is repeated, its occurrences are aligned in
+    order. The cells are compared by the names of their columns, the
+    repeated column names are aligned in order too. Numeric cells are equal
+    if they are within the tolerances, so a floating point drift of the
+    effort columns is not reported. The order of the common rows is only
+    compared with a :class:`.Diff` of their keys, which is reported as moved
+    rows.
+
+    :param list a_header: The header of the A report.
+    :param list a_rows: The rows of the A report.
+    :param list b_header: The header of the B report.
+    :param list b_rows: The rows of the B report.
+    :param key: The name or the index of the key column. Defaults to the
+      "BSI" column if there is one or to the first column.
+    :param float tolerance: The absolute tolerance of the numeric cells.
+    :param float rel_tolerance: The relative tolerance of the numeric cells.
+    """
+
+    def __init__(self, a_header, a_rows, b_header, b_rows, key=None,
+                 tolerance=0.0, rel_tolerance=0.0):
+        self.tolerance = tolerance
+        self.rel_tolerance = rel_tolerance
+
+        if key is None:
+            key = 'BSI' if 'BSI' in a_header else 0
+        if not isinstance(key, int):
+            if key not in a_header or key not in b_header:
+                raise ValueError('No key column named %s' % key)
+            a_key = a_header.index(key)
+            b_key = b_header.index(key)
+        else:
+            a_key = b_key = key
+
+        # the cells are compared by the names of their columns, the repeated
+        # names are aligned in order like the repeated keys
+        a_columns = self.row_keys([[name] for name in a_header], 0)
+        b_columns = self.row_keys([[name] for name in b_header], 0)
+        a_positions = dict((c, i) for i, c in enumerate(a_columns))
+        b_positions = dict((c, i) for i, c in enumerate(b_columns))
+        self.added_columns = [
+            self.key_label(c) for c in b_columns if c not in a_positions
+        ]
+        self.removed_columns = [
+            self.key_label(c) for c in a_columns if c not in b_positions
+        ]
+        columns = [
+            (self.key_label(c), a_positions[c], b_positions[c])
+            for c in a_columns if c in b_positions
+        ]
+
+        a_keys = self.row_keys(a_rows, a_key)
+        b_keys = self.row_keys(b_rows, b_key)
+        b_index = dict(zip(b_keys, b_rows))
+
+        # (key, [(column, a value, b value)]) tuples in the order of A
+        self.changed = []
+        self.removed = []
+        common = []
+        for row_key, a_row in zip(a_keys, a_rows):
+            b_row = b_index.pop(row_key, None)
+            if b_row is None:
+                self.removed.append(row_key)
+                continue
+            common.append(row_key)
+            cells = []
+            for name, a_idx, b_idx in columns:
+                a_value = a_row[a_idx] if a_idx < len(a_row) else ''
+                b_value = b_row[b_idx] if b_idx < len(b_row) else ''
+                if not self.cells_equal(a_value, b_value):
+                    cells.append((name, a_value, b_value))
+            if cells:
+                self.changed.append((row_key, cells))
+        self.added = [row_key for row_key in b_keys if row_key in b_index]
+
+        # the order of the common rows
+        b_common = [row_key for row_key in b_keys if row_key not in b_index]
+        self.moved = []
+        if common != b_common:
+            moved = set()
+            for hunk in Diff(common, b_common, algorithm='patience').hunks:
+                moved.update(hunk.delete_values)
+            self.moved = [row_key for row_key in common if row_key in moved]
+
+    @classmethod
+    def from_files(cls, path_a, path_b, separator=';', encoding='utf-8',
+                   **kwargs):
+        """Compares the given CSV files.
+
+        :param str path_a:
+        :param str path_b:
+        :param str separator: The cell separator of the reports.
+        :param str encoding:
+        :param kwargs: Passed to :class:`.CsvDiff`.
+        :return: :class:`.CsvDiff`
+        """
+        a_header, a_rows = read_csv(path_a, separator, encoding)
+        b_header, b_rows = read_csv(path_b, separator, encoding)
+        return cls(a_header, a_rows, b_header, b_rows, **kwargs)
+
+    @classmethod
+    def row_keys(cls, rows, key):
+        """Returns the keys of the rows. The keys are (value, occurrence)
+        tuples, so the repeated values are aligned in order.
+
+        :param list rows:
+        :param int key: The index of the key column.
+        :return: list
+        """
+        counts = {}
+        keys = []
+        for row in rows:
+            value = row[key] if key < len(row) else ''
+            count = counts.get(value, 0)
+            counts[value] = count + 1
+            keys.append((value, count))
+        return keys
+
+    def cells_equal(self, a_value, b_value):
+        """Are the given cells equal within the tolerances?
+
+        :param str a_value:
+        :param str b_value:
+        :return: bool
+        """
+        if a_value == b_value:
+            return True
+        if not self.tolerance and not self.rel_tolerance:
+            return False
+        try:
+            a_number = float(a_value)
+            b_number = float(b_value)
+        except ValueError:
+            return False
+        return math.isclose(
+            a_number, b_number, rel_tol=self.rel_tolerance,
+            abs_tol=self.tolerance
+        )
+
+    def is_equal(self, ignore_order=False):
+        """Are the reports equal?
+
+        :param bool ignore_order: If True the moved rows are not considered
+          as differences.
+        :return: bool
+        """
+        return not (
+            self.added_columns or self.removed_columns or self.added
+            or self.removed or self.changed
+            or (self.moved and not ignore_order)
+        )
+
+    @classmethod
+    def key_label(cls, row_key):
+        """Returns the label of the given row key.
+        """
+        value, count = row_key
+        if count:
+            return '%s (#%s)' % (value, count + 1)
+        return value
+
+    def iter_lines(self):
+        """Yields the lines of a text report of the differences.
+        """
+        for name in self.removed_columns:
+            yield 'Removed column %s\n' % name
+        for name in self.added_columns:
+            yield 'Added column %s\n' % name
+        for row_key in self.removed:
+            yield 'Removed row %s\n' % self.key_label(row_key)
+        for row_key in self.added:
+            yield 'Added row %s\n' % self.key_label(row_key)
+        for row_key, cells in self.changed:
+            for name, a_value, b_value in cells:
+                yield 'Changed row %s column %s: %r != %r\n' % (
+                    self.key_label(row_key), name, a_value, b_value
+                )
+        for row_key in self.moved:
+            yield 'Moved row %s\n' % self.key_label(row_key)
+
+    def to_s(self):
+        """Returns the text report of the differences.
+        """
+        return ''.join(self.iter_lines())
+
+
+class HtmlCanonicalizer(HTMLParser):
+    """Converts an HTML report to a list of canonical tokens.
+
+    A start tag becomes a single token with its attributes sorted by name,
+    an end tag becomes a token too and the text is split into its words, so
+    the whitespace and the line breaks of the report don't matter. The
+    comments are dropped, the character references are decoded and the text
+    tokens are escaped again, so they never look like tags. The void
+    elements, i.e. ``<br>`` and ``<br/>``, become the same start tag token
+    and their end tags are dropped, the other self-closing tags become a
+    start and an end tag token.
+
+    :param volatile_attributes: The names of the attributes to drop, i.e.
+      generated ids.
+    :param volatile_text: A regular expression, the matching parts of the
+      text are replaced with "*" before it is split, i.e. timestamps.
+    """
+
+    def __init__(self, volatile_attributes=(), volatile_text=None):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.volatile_attributes = frozenset(volatile_attributes)
+        self.volatile_text = re.compile(volatile_text) \
+            if isinstance(volatile_text, str) else volatile_text
+        self.tokens = []
+
+    # The elements which never have content or an end tag.
+    void_elements = frozenset([
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+        'meta', 'param', 'source', 'track', 'wbr'
+    ])
+
+    def tag_token(self, tag, attrs):
+        """Returns the canonical token of a start tag.
+        """
+        parts = [tag]
+        for name, value in sorted(attrs, key=lambda attr: attr[0]):
+            if name in self.volatile_attributes:
+                continue
+            if value is None:
+                parts.append(name)
+            else:
+                parts.append('%s="%s"' % (
+                    name, html.escape(' '.join(value.split()))
+                ))
+        return '<%s>' % ' '.join(parts)
+
+    def handle_starttag(self, tag, attrs):
+        self.tokens.append(self.tag_token(tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.void_elements:
+            self.tokens.append('</%s>' % tag)
+
+    def handle_data(self, data):
+        if self.volatile_text is not None:
+            data = self.volatile_text.sub('*', data)
+        self.tokens.extend(html.escape(word, False) for word in data.split())
+
+    def handle_decl(self, decl):
+        self.tokens.append('<!%s>' % ' '.join(decl.split()))
+
+    @classmethod
+    def tokenize_file(cls, path, encoding='utf-8', chunk_size=1 << 16,
+                      **kwargs):
+        """Streams the given file through a canonicalizer.
+
+        :param str path:
+        :param str encoding:
+        :param int chunk_size: The number of characters fed at once.
+        :param kwargs: Passed to :class:`.HtmlCanonicalizer`.
+        :return: The list of the tokens.
+        """
+        parser = cls(**kwargs)
+        with open(path, encoding=encoding) as f:
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                parser.feed(chunk)
+        parser.close()
+        return parser.tokens
+
+
+class HtmlDiff(object):
+    """Compares two HTML reports by their canonical tokens, see
+    :class:`.HtmlCanonicalizer`.
+
+    The tokens are diffed with a :class:`.Diff`, which interns them to
+    integer ids, so a reflowed or re-indented report is equal to the
+    original and a changed cell is reported as the changed words instead of
+    the changed lines.
+
+    :param list a_tokens: The tokens of the A report.
+    :param list b_tokens: The tokens of the B report.
+    :param str algorithm: The algorithm of the Diff.
+    """
+
+    # The tokens of the recently used reference files of this process by
+    # their absolute paths, with the options of the canonicalizer and the
+    # size and the modification time of the file.
+    cache = OrderedDict()
+    cache_size = 32
+
+    def __init__(self, a_tokens, b_tokens, algorithm='myers'):
+        self.a_tokens = a_tokens
+        self.b_tokens = b_tokens
+        self.diff = Diff(a_tokens, b_tokens, algorithm=algorithm)
+
+    @classmethod
+    def reference_tokens(cls, path, encoding='utf-8', volatile_attributes=(),
+                         volatile_text=None):
+        """Returns the tokens of the given reference file, which are only
+        computed again if the file or the options are changed. The tokens of
+        the last :attr:`.cache_size` files are kept.
+
+        :param str path:
+        :param str encoding:
+        :param volatile_attributes: See :class:`.HtmlCanonicalizer`.
+        :param volatile_text: See :class:`.HtmlCanonicalizer`.
+        :return: list
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        pattern = getattr(volatile_text, 'pattern', volatile_text)
+        key = (stat.st_size, stat.st_mtime_ns, encoding,
+               tuple(sorted(volatile_attributes)), pattern)
+        entry = cls.cache.pop(path, None)
+        if entry is None or entry[0] != key:
+            entry = (key, HtmlCanonicalizer.tokenize_file(
+                path, encoding, volatile_attributes=volatile_attributes,
+                volatile_text=volatile_text
+            ))
+        cls.cache[path] = entry
+        while len(cls.cache) > cls.cache_size:
+            cls.cache.popitem(last=False)
+        return entry[1]
+
+    @classmethod
+    def from_files(cls, ref_path, path, encoding='utf-8',
+                   volatile_attributes=(), volatile_text=None,
+                   algorithm='myers'):
+        """Compares the given HTML file with the given reference file, the
+        tokens of the reference are cached.
+
+        :param str ref_path:
+        :param str path:
+        :param str encoding:
+        :param volatile_attributes: See :class:`.HtmlCanonicalizer`.
+        :param volatile_text: See :class:`.HtmlCanonicalizer`.
+        :param str algorithm: The algorithm of the Diff.
+        :return: :class:`.HtmlDiff`
+        """
+        a_tokens = cls.reference_tokens(
+            ref_path, encoding, volatile_attributes, volatile_text
+        )
+        b_tokens = HtmlCanonicalizer.tokenize_file(
+            path, encoding, volatile_attributes=volatile_attributes,
+            volatile_text=volatile_text
+        )
+        return cls(a_tokens, b_tokens, algorithm)
+
+    def is_equal(self):
+        """Are the canonical forms of the reports equal?
+        """
+        return not self.diff.hunks
+
+    def iter_lines(self):
+        """Yields the lines of a text report of the changed tokens.
+        """
+        for hunk in self.diff.iter_hunks():
+            yield '@@ -%s,%s +%s,%s @@\n' % (
+                hunk.a_idx + 1, len(hunk.delete_values),
+                hunk.b_idx + 1, len(hunk.insert_values)
+            )
+            for token in hunk.delete_values:
+                yield '-%s\n' % token
+            for token in hunk.insert_values:
+                yield '+%s\n' % token
+
+    def to_s(self):
+        """Returns the text report of the changed tokens.
+        """
+        return ''.join(self.iter_lines())
@@ -20,6 +20,27 @@
 
 import os
 import glob
+import hashlib
+import json
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+from pytj.algorithm_diff import diff_files
+from pytj.report_diff import CsvDiff, HtmlDiff
+from pytj.utils import write_atomically
+
+
+# The comments specifying the expected messages of a test file.
+MARK_REGEX = re.compile('^# MARK: ([a-z]+) ([0-9]+) ([a-z0-9_]*)')
+
+# The include statements of the project and include files.
+INCLUDE_REGEX = re.compile(
+    r'^\s*include\s+(?:"([^"]*)"|\'([^\']*)\')', re.MULTILINE
+)
 
 
 class MessageChecker(object):
@@ -29,9 +50,46 @@ class MessageChecker(object):
     mapped from: TaskJuggler/test/MessageChecker.rb
     """
 
+    # The expected messages of all the test files, which is shared by all
+    # the tests.
+    catalog = None
+
     @classmethod
-    def check_messages(cls, tj, file_path):
-        ref_messages = cls.collect_messages(file_path)
+    def check_messages(cls, tj, file_path, jobs=None):
+        """Checks that the messages of the TaskJuggler run are the expected
+        messages of the test file, in the same order.
+
+        :param tj: The TaskJuggler instance that processed the file.
+        :param file_path: The path of the test file.
+        :param int jobs: The number of worker processes of the first scan of
+          the shared :class:`.MessageCatalog`. Defaults to the number of
+          CPUs.
+        :return:
+        """
+        if cls.catalog is None:
+            cls.catalog = MessageCatalog(jobs=jobs or os.cpu_count() or 1)
+        ref_messages = cls.catalog.messages(file_path)
+
+        for message in tj.message_handler.messages:
+            if not ref_messages:
+                raise AssertionError(
+                    'Unexpected %s: %s' % (message.type, message)
+                )
+            ref = ref_messages.pop()
+            got = (
+                str(message.type), message.source_file_info.line_no,
+                message.id
+            )
+            if got != ref:
+                raise AssertionError(
+                    'Error in %s: Got %s, expected %s' % (
+                        file_path, message, ref
+                    )
+                )
+        if ref_messages:
+            raise AssertionError('Missing messages: %s' % '\n'.join(
+                str(ref) for ref in reversed(ref_messages)
+            ))
 
     @classmethod
     def collect_messages(cls, file_path):
@@ -43,27 +101,500 @@ class MessageChecker(object):
         generated messages after the test has been run.
 
         :param file_path:
-        :return:
+        :return: A list of (type, line number, message id) tuples in reverse
+          order, so the next expected message can be popped from its end.
         """
-        import re
-        regex = re.compile('^# MARK: ([a-z]+) ([0-9]+) ([a-z0-9_]*)')
-
         ref_messages = []
         with open(file_path, 'r') as f:
-            for line in f.readlines():
-                match = regex.match(line)
+            for line in f:
+                match = MARK_REGEX.match(line)
                 if match:
                     groups = match.groups()
-                    ref_messages.append([
-                        groups[0], int(groups[1]), groups[2]
-                    ])
-        return ref_messages.reverse()
+                    ref_messages.append(
+                        (groups[0], int(groups[1]), groups[2])
+                    )
+        ref_messages.reverse()
+        return ref_messages
+
+
+class MessageCatalog(object):
+    """The expected messages of all the test files of a directory, see
+    :meth:`.MessageChecker.collect_messages`.
+
+    The directory is scanned the first time the messages of a file are
+    needed, in a process pool if jobs is greater than 1. The entries are
+    stored by the absolute paths of the files together with their sizes and
+    modification times, so a file is only read again if it is changed.
+
+    :param str root: The scanned directory, defaults to the TestSuite.
+    :param int jobs: The number of worker processes of the scan.
+    """
+
+    def __init__(self, root=None, jobs=1):
+        self.root = root or ReferenceGenerator.test_suite_path
+        self.jobs = jobs
+        # (size, mtime, messages) tuples by path
+        self.entries = {}
+        self.scanned = False
+
+    @classmethod
+    def stat_key(cls, path):
+        """Returns the size and the modification time of the given file.
+        """
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def scan(self):
+        """Collects the messages of the new and changed test files of the
+        directory and removes the deleted ones.
+        """
+        keys = {}
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            for file_name in file_names:
+                if file_name.endswith('.tjp'):
+                    path = os.path.abspath(os.path.join(dir_path, file_name))
+                    keys[path] = self.stat_key(path)
+
+        for path in set(self.entries) - set(keys):
+            del self.entries[path]
+        paths = sorted(
+            path for path, key in keys.items()
+            if self.entries.get(path, (None, None))[:2] != key
+        )
+
+        if self.jobs > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                messages = list(executor.map(
+                    MessageChecker.collect_messages, paths,
+                    chunksize=max(1, len(paths) // (self.jobs * 4))
+                ))
+        else:
+            messages = [MessageChecker.collect_messages(p) for p in paths]
+
+        for path, file_messages in zip(paths, messages):
+            self.entries[path] = keys[path] + (file_messages,)
+        self.scanned = True
+
+    def messages(self, file_path):
+        """Returns the expected messages of the given test file.
+
+        :param str file_path:
+        :return: A new list of (type, line number, message id) tuples in
+          reverse order.
+        """
+        if not self.scanned:
+            self.scan()
+
+        path = os.path.abspath(file_path)
+        key = self.stat_key(path)
+        entry = self.entries.get(path)
+        if entry is None or entry[:2] != key:
+            entry = key + (MessageChecker.collect_messages(path),)
+            self.entries[path] = entry
+        return list(entry[2])
+
+
+class ProjectResult(object):
+    """The result of processing a single project in a :class:`.ProjectRunner`.
+
+    :param str tjp_file: The path of the project file.
+    :param bool passed: Did the project pass?
+    :param float wall_time: The wall clock time spent on the project in
+      seconds.
+    :param str message: The failure message.
+    """
+
+    def __init__(self, tjp_file, passed, wall_time, message=''):
+        self.tjp_file = tjp_file
+        self.passed = passed
+        self.wall_time = wall_time
+        self.message = message
+
+    def __repr__(self):
+        return "<ProjectResult %s %s %.3fs>" % (
+            self.tjp_file, 'passed' if self.passed else 'failed',
+            self.wall_time
+        )
+
+
+def run_project(task, tjp_file):
+    """Runs the given task for the given project file, measures its wall
+    clock time and catches its errors. The task returns a failure message or
+    None on success.
+
+    :param task: A picklable function accepting the project file path.
+    :param str tjp_file: The path of the project file.
+    :return: :class:`.ProjectResult`
+    """
+    start = time.time()
+    try:
+        message = task(tjp_file)
+    except Exception as e:
+        message = '%s: %s' % (e.__class__.__name__, e)
+    return ProjectResult(
+        tjp_file, not message, time.time() - start, message or ''
+    )
+
+
+class RunSummary(object):
+    """The merged results of a :class:`.ProjectRunner` run.
+
+    :param list results: A list of :class:`.ProjectResult` instances.
+    :param float wall_time: The wall clock time of the whole run.
+    """
+
+    def __init__(self, results, wall_time):
+        self.results = results
+        self.wall_time = wall_time
+
+    @property
+    def passed(self):
+        """The list of passed results.
+        """
+        return [r for r in self.results if r.passed]
+
+    @property
+    def failed(self):
+        """The list of failed results.
+        """
+        return [r for r in self.results if not r.passed]
+
+    def slowest(self, count=10):
+        """Returns the given number of results that took the longest time.
+
+        :param int count:
+        :return:
+        """
+        return sorted(
+            self.results, key=lambda r: r.wall_time, reverse=True
+        )[:count]
+
+    def report(self, count=10):
+        """Returns a text report with the slowest projects, the failures and
+        the pass/fail summary.
+
+        :param int count: The number of slowest projects to list.
+        :return: str
+        """
+        lines = ['Slowest projects:']
+        for result in self.slowest(count):
+            lines.append('  %8.3fs %s' % (result.wall_time, result.tjp_file))
+        for result in self.failed:
+            lines.append('FAILED %s' % result.tjp_file)
+            lines.append(result.message.rstrip('\n'))
+        lines.append(
+            '%s passed, %s failed in %.3fs (%.3fs of project time)' % (
+                len(self.passed), len(self.failed), self.wall_time,
+                sum(r.wall_time for r in self.results)
+            )
+        )
+        return '\n'.join(lines)
+
+
+class ProjectRunner(object):
+    """Runs a task for many project files in a process pool.
+
+    :param int jobs: The number of worker processes. Defaults to the number of
+      CPUs, if it is 1 the projects are processed in the current process.
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or os.cpu_count() or 1
+
+    def run(self, tjp_files, task, callback=None):
+        """Runs the task for all the given project files.
+
+        :param list tjp_files: The paths of the project files.
+        :param task: A picklable function accepting the project file path and
+          returning a failure message or None on success.
+        :param callback: An optional function called with every
+          :class:`.ProjectResult` as soon as it is available.
+        :return: :class:`.RunSummary`
+        """
+        start = time.time()
+        results = []
+        if self.jobs == 1:
+            for tjp_file in tjp_files:
+                results.append(run_project(task, tjp_file))
+                if callback:
+                    callback(results[-1])
+        else:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                futures = [
+                    executor.submit(run_project, task, tjp_file)
+                    for tjp_file in tjp_files
+                ]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    if callback:
+                        callback(results[-1])
+        return RunSummary(results, time.time() - start)
+
+
+class ReferenceManifest(object):
+    """The sizes and digests of the reference files in a refs directory.
+
+    The manifest is stored as JSON in the refs directory. The entries also
+    store the modification times of the references, so only the references
+    that are changed since the last update are hashed again. A reference
+    with another modification time, i.e. in a fresh checkout, is hashed
+    again and its entry is refreshed, which is saved with
+    :meth:`.save_refreshed`, so it is only hashed once.
+
+    :param str refs_dir: The path of the refs directory.
+    """
+
+    file_name = '.manifest.json'
+
+    def __init__(self, refs_dir):
+        self.refs_dir = refs_dir
+        self.path = os.path.join(refs_dir, self.file_name)
+        self.entries = self.read()
+        # the names of the entries refreshed since the manifest is saved
+        self.refreshed = set()
+
+    def read(self):
+        """Reads the stored entries.
+
+        :return: dict
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    @classmethod
+    def file_digest(cls, path):
+        """Returns the SHA-1 digest of the given file.
+
+        :param str path:
+        :return: str
+        """
+        hash_ = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hash_.update(chunk)
+        return hash_.hexdigest()
+
+    def entry(self, name):
+        """Returns the up to date entry of the given reference file, which is
+        a dictionary with the "size", "mtime" and "sha1" keys.
+
+        :param str name: The name of the reference file.
+        :return: dict or None if the reference does not exist.
+        """
+        path = os.path.join(self.refs_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.entries.pop(name, None)
+            return None
+
+        entry = self.entries.get(name)
+        if entry is None or entry['size'] != stat.st_size \
+                or entry['mtime'] != stat.st_mtime_ns:
+            entry = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'sha1': self.file_digest(path),
+            }
+            self.entries[name] = entry
+            self.refreshed.add(name)
+        return entry
+
+    def update(self):
+        """Updates the entries of all the reference files and saves the
+        manifest.
+        """
+        names = [
+            name for name in os.listdir(self.refs_dir)
+            if name != self.file_name
+            and os.path.isfile(os.path.join(self.refs_dir, name))
+        ]
+        for name in set(self.entries) - set(names):
+            del self.entries[name]
+        for name in names:
+            self.entry(name)
+        self.write(self.entries)
+
+    def save_refreshed(self):
+        """Saves the entries refreshed by :meth:`.entry`. They are merged
+        into the stored manifest, which may be saved by another process in
+        the meantime, i.e. comparing the reports of another project.
+        """
+        if not self.refreshed:
+            return
+        entries = self.read()
+        for name in self.refreshed:
+            if name in self.entries:
+                entries[name] = self.entries[name]
+        self.write(entries)
+
+    def write(self, entries):
+        """Writes the given entries to the manifest file.
+
+        :param dict entries:
+        :return:
+        """
+        write_atomically(
+            self.path, json.dumps(entries, indent=1, sort_keys=True)
+        )
+        self.refreshed = set()
+
+    def matches(self, name, path):
+        """Has the given file the same size and digest as the given reference?
+
+        :param str name: The name of the reference file.
+        :param str path: The path of the file to check.
+        :return: bool
+        """
+        entry = self.entry(name)
+        if entry is None or os.path.getsize(path) != entry['size']:
+            return False
+        return self.file_digest(path) == entry['sha1']
+
+
+class IncludeGraph(object):
+    """The dependency graph of the project files of a TestSuite directory and
+    the files they include.
+
+    The directory is scanned once, every .tjp and .tji file in it and its sub
+    directories is read once to compute its SHA-1 digest and to parse its
+    include statements. The digest of a project combines the digests of the
+    project file and all the files it includes directly or through other
+    include files. The digests of the projects of the last run are stored as
+    JSON in the directory, so only the projects with a changed digest need to
+    be processed again.
+
+    :param str directory: The path of the directory.
+    """
+
+    file_name = '.sources.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, self.file_name)
+        # the SHA-1 digests and the included paths of the files by path
+        self.digests = {}
+        self.includes = {}
+        self.projects = []
+        self.state = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.state = json.load(f)
+        self.scan()
+
+    def scan(self):
+        """Reads all the project and include files of the directory.
+        """
+        for dir_path, dir_names, file_names in os.walk(self.directory):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if not file_name.endswith(('.tjp', '.tji')):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                self.read(path)
+                if file_name.endswith('.tjp') and dir_path == self.directory:
+                    self.projects.append(path)
+
+    def read(self, path):
+        """Computes the digest and parses the include statements of the
+        given file. A missing file has no digest and includes nothing.
+
+        :param str path:
+        :return:
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.digests[path] = None
+            self.includes[path] = []
+            return
+        self.digests[path] = hashlib.sha1(data).hexdigest()
+        base_dir = os.path.dirname(path)
+        self.includes[path] = [
+            os.path.normpath(os.path.join(base_dir, match[0] or match[1]))
+            for match in INCLUDE_REGEX.findall(
+                data.decode('utf-8', 'replace')
+            )
+        ]
+
+    def dependencies(self, path):
+        """Returns the given file and all the files it includes directly or
+        indirectly. Recursive includes are followed only once.
+
+        :param str path:
+        :return: A sorted list of paths.
+        """
+        seen = set()
+        stack = [os.path.normpath(path)]
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            if path not in self.includes:
+                # an include file outside of the directory
+                self.read(path)
+            stack.extend(self.includes[path])
+        return sorted(seen)
+
+    def project_digest(self, tjp_file):
+        """Returns the digest of the given project file and its includes.
+
+        :param str tjp_file:
+        :return: str
+        """
+        hash_ = hashlib.sha1()
+        for path in self.dependencies(tjp_file):
+            hash_.update(('%s %s\n' % (
+                os.path.relpath(path, self.directory), self.digests[path]
+            )).encode('utf-8'))
+        return hash_.hexdigest()
+
+    def changed_projects(self):
+        """Returns the project files which or whose includes are changed
+        since the last :meth:`.save`.
+
+        :return: A sorted list of paths.
+        """
+        return [
+            tjp_file for tjp_file in self.projects
+            if self.state.get(os.path.basename(tjp_file))
+            != self.project_digest(tjp_file)
+        ]
+
+    def save(self, tjp_files):
+        """Stores the digests of the given project files, the entries of the
+        deleted projects are removed.
+
+        :param list tjp_files: The paths of the successfully processed
+          project files.
+        :return:
+        """
+        names = set(os.path.basename(p) for p in self.projects)
+        for name in set(self.state) - names:
+            del self.state[name]
+        for tjp_file in tjp_files:
+            self.state[os.path.basename(tjp_file)] = \
+                self.project_digest(tjp_file)
+
+        write_atomically(
+            self.path, json.dumps(self.state, indent=1, sort_keys=True)
+        )
 
 
 class ReferenceGenerator(object):
     """mapped from: TaskJuggler/test/ReferenceGenerator.rb
     """
 
+    # The path of the TestSuite directory of the tests.
+    test_suite_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'tests', 'TestSuite'
+    )
+
     def __init__(self):
         AppConfig = dict()
         AppConfig['appName'] = 'taskjuggler3'
@@ -76,17 +607,33 @@ class ReferenceGenerator(object):
         cls.process_directory('ReportGenerator/Correct')
 
     @classmethod
-    def process_project(cls, tjp_file, output_dir):
+    def process_project(cls, tjp_file, output_dir, update_manifest=True):
         """No docstring at the origin
 
         :param tjp_file:
         :param output_dir:
+        :param bool update_manifest: Update the :class:`.ReferenceManifest`
+          of the output directory. Projects processed in parallel should not
+          update the manifest, it is updated after all of them are done.
         :return:
         """
-        cls.delete_old_reports(tjp_file[0, -5])
+        cls.delete_old_reports(tjp_file[:-4])
 
         print("Generating references for %s" % tjp_file)
+        cls.generate_reports(tjp_file, output_dir)
+
+        if update_manifest:
+            ReferenceManifest(output_dir).update()
+
+    @classmethod
+    def generate_reports(cls, tjp_file, output_dir):
+        """Generates the reports of the given project into the given
+        directory.
 
+        :param tjp_file:
+        :param output_dir:
+        :return:
+        """
         tj = TaskJuggler()
         tj.parse([tjp_file])
         tj.schedule()
@@ -98,29 +645,163 @@ class ReferenceGenerator(object):
             )
 
     @classmethod
-    def process_directory(cls, directory):
-        """No docstring at the origin
+    def generate_project(cls, tjp_file):
+        """Regenerates the references of the given project into the refs
+        directory next to it. It is used as a :class:`.ProjectRunner` task.
+
+        :param tjp_file:
+        :return:
+        """
+        output_dir = os.path.join(os.path.dirname(tjp_file), 'refs')
+        cls.process_project(tjp_file, output_dir, update_manifest=False)
+
+    @classmethod
+    def compare_project(cls, tjp_file, csv_tolerance=None,
+                        html_volatile_attributes=None):
+        """Generates the reports of the given project into a temporary
+        directory and compares them with the references in the refs directory
+        next to it. It is used as a :class:`.ProjectRunner` task.
+
+        :param tjp_file:
+        :param float csv_tolerance: See :meth:`.compare_reports`.
+        :param html_volatile_attributes: See :meth:`.compare_reports`.
+        :return: The failure message or None if all the reports match.
+        """
+        refs_dir = os.path.join(os.path.dirname(tjp_file), 'refs')
+        output_dir = tempfile.mkdtemp()
+        try:
+            cls.generate_reports(tjp_file, output_dir)
+            return cls.compare_reports(
+                output_dir, refs_dir, csv_tolerance=csv_tolerance,
+                html_volatile_attributes=html_volatile_attributes
+            )
+        finally:
+            shutil.rmtree(output_dir)
+
+    @classmethod
+    def compare_reports(cls, output_dir, refs_dir, csv_tolerance=None,
+                        html_volatile_attributes=None):
+        """Compares the generated reports in the output directory with the
+        references with the same name in the refs directory.
+
+        The reports are compared with the digests of the references in the
+        :class:`.ReferenceManifest` first, they are only compared line by
+        line if the digests differ. The refreshed entries of the manifest are
+        saved.
+
+        :param output_dir:
+        :param refs_dir:
+        :param float csv_tolerance: If given, the CSV reports are compared
+          row by row with this numeric tolerance, see :class:`.CsvDiff`.
+        :param html_volatile_attributes: If given, the HTML reports are
+          compared by their canonical tokens without these attributes, see
+          :class:`.HtmlDiff`.
+        :return: The failure message or None if all the reports match.
+        """
+        manifest = ReferenceManifest(refs_dir)
+        messages = []
+        for name in sorted(os.listdir(output_dir)):
+            report = os.path.join(output_dir, name)
+            ref = os.path.join(refs_dir, name)
+            if not os.path.exists(ref):
+                messages.append("Missing reference %s\n" % ref)
+                continue
+            if manifest.matches(name, report):
+                continue
+            if csv_tolerance is not None and name.endswith('.csv'):
+                csv_diff = CsvDiff.from_files(
+                    ref, report, tolerance=csv_tolerance
+                )
+                if not csv_diff.is_equal():
+                    messages.append('%s differs from %s\n%s' % (
+                        report, ref, csv_diff.to_s()
+                    ))
+                continue
+            if html_volatile_attributes is not None \
+                    and name.endswith('.html'):
+                html_diff = HtmlDiff.from_files(
+                    ref, report, volatile_attributes=html_volatile_attributes
+                )
+                if not html_diff.is_equal():
+                    messages.append('%s differs from %s\n%s' % (
+                        report, ref, html_diff.to_s()
+                    ))
+                continue
+            diff = diff_files(ref, report, algorithm='myers')
+            if diff.hunks:
+                messages.append(''.join(diff.iter_lines(
+                    'unified', a_label=ref, b_label=report
+                )))
+        manifest.save_refreshed()
+        return ''.join(messages) or None
+
+    @classmethod
+    def project_files(cls, directory):
+        """Returns the project files in the given TestSuite directory.
 
         :param directory:
         :return:
         """
+        project_dir = os.path.join(cls.test_suite_path, directory)
+        return sorted(glob.glob(os.path.join(project_dir, '*.tjp')))
+
+    @classmethod
+    def process_directory(cls, directory, jobs=1, force=False):
+        """Regenerates the references of the projects in the given TestSuite
+        directory, which or whose include files are changed since the last
+        run, see :class:`.IncludeGraph`.
+
+        :param directory:
+        :param int jobs: The number of worker processes.
+        :param bool force: Regenerate the references of all the projects.
+        :return: :class:`.RunSummary`
+        """
         print("Generating references in %s" % directory)
-        path = os.path.dirname(__file__)
-        project_dir = os.path.join(path, "TestSuite/%s/" % directory)
-        output_dir = os.path.join(path, "TestSuite/%s/refs/" % directory)
+        graph = IncludeGraph(os.path.join(cls.test_suite_path, directory))
+        tjp_files = graph.projects if force else graph.changed_projects()
+        summary = ProjectRunner(jobs).run(tjp_files, cls.generate_project)
+        graph.save([result.tjp_file for result in summary.passed])
+        ReferenceManifest(
+            os.path.join(cls.test_suite_path, directory, 'refs')
+        ).update()
+        print(summary.report())
+        return summary
+
+    @classmethod
+    def compare_directory(cls, directory, jobs=1, csv_tolerance=None,
+                          html_volatile_attributes=None):
+        """Compares the reports of all the projects in the given TestSuite
+        directory with their references.
 
-        for f in glob.glob('%s/*.tjp' % project_dir):
-            cls.process_project(f, output_dir)
+        :param directory:
+        :param int jobs: The number of worker processes.
+        :param float csv_tolerance: See :meth:`.compare_reports`.
+        :param html_volatile_attributes: See :meth:`.compare_reports`.
+        :return: :class:`.RunSummary`
+        """
+        print("Comparing references in %s" % directory)
+        summary = ProjectRunner(jobs).run(
+            cls.project_files(directory), partial(
+                cls.compare_project, csv_tolerance=csv_tolerance,
+                html_volatile_attributes=html_volatile_attributes
+            )
+        )
+        print(summary.report())
+        return summary
 
     @classmethod
     def delete_old_reports(cls, basename):
-        """No docstring at the origin
+        """Removes the old "<basename>-<number>...csv" and ".html" reports of
+        a project with a single listing of its directory.
 
-        :param basename:
+        :param basename: The path of the project file without the extension.
         :return:
         """
-        for ext in ['.csv', '.html']:
-            for f in glob.glob('%s-[0-9]*.%s' % (basename, ext)):
+        directory, name = os.path.split(basename)
+        pattern = re.compile(r'%s-[0-9].*\.(csv|html)$' % re.escape(name))
+        for file_name in sorted(os.listdir(directory or os.curdir)):
+            if pattern.match(file_name):
+                f = os.path.join(directory, file_name)
                 print("Removing old report %s" % f)
                 os.remove(f)
 
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+"""Structural diff of the project and report trees
+"""
+
+import hashlib
+import re
+
+from pytj.algorithm_diff import Diff
+
+
+# The property definitions of a .tjp file, which are the nodes of its tree,
+# i.e. 'task plan "Plan A" {'. The id is optional.
+PROPERTY_REGEX = re.compile(
+    r'^\s*(task|resource|account|shift)\s+([A-Za-z_][\w.]*)?\s*("[^"]*")?'
+)
+STRING_REGEX = re.compile(r'"[^"]*"|\'[^\']*\'|#.*$|//.*$')
+
+
+class TreeNode(object):
+    """A node of a tree compared by :class:`.TreeDiff`.
+
+    :param id: The stable id of the node, i.e. a task id or a name, which
+      identifies the node among its siblings and if it is unique in the
+      tree also across the tree. If it is None the node is identified by its
+      digest.
+    :param label: The own content of the node without its children.
+    :param list children: The child nodes.
+    """
+
+    __slots__ = ('id', 'label', 'children', 'parent', '_digest')
+
+    def __init__(self, id, label, children=None):
+        self.id = id
+        self.label = label
+        self.children = []
+        self.parent = None
+        self._digest = None
+        for child in children or []:
+            self.append(child)
+
+    def append(self, child):
+        """Appends a child node.
+
+        :param child: :class:`.TreeNode`
+        :return: The child.
+        """
+        child.parent = self
+        self.children.append(child)
+        self._digest = None
+        return child
+
+    @property
+    def digest(self):
+        """The SHA-1 digest of the id, the label and the digests of the
+        children, so two subtrees with the same digest are equal. It is
+        computed once, bottom up.
+        """
+        if self._digest is None:
+            # compute the digests of the descendants first without recursion
+            stack = [self]
+            order = []
+            while stack:
+                node = stack.pop()
+                if node._digest is None:
+                    order.append(node)
+                    stack.extend(node.children)
+            for node in reversed(order):
+                hash_ = hashlib.sha1()
+                hash_.update(repr((node.id, node.label)).encode('utf-8'))
+                for child in node.children:
+                    hash_.update(child._digest)
+                node._digest = hash_.digest()
+        return self._digest
+
+    @property
+    def key(self):
+        """The key of the node among its siblings.
+        """
+        if self.id is None:
+            return ('digest', self.digest)
+        return ('id', self.id)
+
+    def iter_nodes(self):
+        """Yields the node and all its descendants in depth first order.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    @property
+    def path(self):
+        """The ids of the ancestors and the node, starting from the root
+        below the top most node.
+        """
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.id)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def __repr__(self):
+        return '<TreeNode %s>' % (self.id,)
+
+    @classmethod
+    def from_row(cls, row, name_column, id_column=None, skip=()):
+        """Creates a node of a row of a report. The id of the node is the
+        last part of the dotted id in the id column or else the name without
+        its indentation, so the node keeps its id if it is moved to another
+        parent. The label is the row without the name, the id and the skipped
+        columns, which depend on the place of the node, and without the
+        indentation of the values.
+
+        :param list row:
+        :param int name_column: The index of the name column.
+        :param int id_column: The index of the id column or None.
+        :param skip: The indices of the other columns that are left out of
+          the label.
+        :return: :class:`.TreeNode`
+        """
+        if id_column is not None:
+            id_ = row[id_column].rpartition('.')[2]
+        else:
+            id_ = row[name_column].strip()
+        skip = set(skip) | set([name_column, id_column])
+        label = tuple(
+            value.strip() for i, value in enumerate(row) if i not in skip
+        )
+        return cls(id_, label)
+
+    @classmethod
+    def from_bsi_rows(cls, rows, bsi_column=0, name_column=1,
+                      id_column=None):
+        """Creates a tree of the rows of a report, which are nested by their
+        dotted BSI numbers, i.e. the "1.2" row is a child of the "1" row. The
+        BSI numbers are only used to nest the rows, the nodes are identified
+        as described in :meth:`.from_row`, as a moved row gets a new BSI
+        number.
+
+        :param list rows: The rows without the header.
+        :param int bsi_column: The index of the BSI column.
+        :param int name_column: The index of the name column.
+        :param int id_column: The index of the id column or None.
+        :return: The root :class:`.TreeNode`, which has no label.
+        """
+        root = cls(None, None)
+        nodes = {}
+        for row in rows:
+            bsi = row[bsi_column]
+            node = cls.from_row(row, name_column, id_column, [bsi_column])
+            parent = nodes.get(bsi.rpartition('.')[0], root)
+            parent.append(node)
+            nodes[bsi] = node
+        return root
+
+    @classmethod
+    def from_indented_rows(cls, rows, name_column=0, id_column=None):
+        """Creates a tree of the rows of a report without a BSI column,
+        which are nested by the indentation of their names, i.e. the
+        "  Plan A" row is a child of the previous row with a less indented
+        name. The nodes are identified as described in :meth:`.from_row`.
+
+        :param list rows: The rows without the header.
+        :param int name_column: The index of the name column.
+        :param int id_column: The index of the id column or None.
+        :return: The root :class:`.TreeNode`, which has no label.
+        """
+        root = cls(None, None)
+        # the open nodes and the indentation of their names
+        stack = [(root, -1)]
+        for row in rows:
+            name = row[name_column]
+            indentation = len(name) - len(name.lstrip(' '))
+            while indentation <= stack[-1][1]:
+                stack.pop()
+            node = cls.from_row(row, name_column, id_column)
+            stack[-1][0].append(node)
+            stack.append((node, indentation))
+        return root
+
+    @classmethod
+    def from_tjp(cls, text):
+        """Creates a tree of the task, resource, account and shift
+        definitions of a .tjp file. The id of a node is the keyword and the
+        id of the property or its name if it has no id. The label of a node
+        is the list of its own lines.
+
+        :param str text:
+        :return: The root :class:`.TreeNode`, which has the lines outside of
+          the properties as its label.
+        """
+        root = cls(None, [])
+        # the open nodes and the brace depth they are opened at
+        stack = [(root, 0)]
+        depth = 0
+        for line in text.split('\n'):
+            node = stack[-1][0]
+            match = PROPERTY_REGEX.match(line)
+            opened = None
+            if match:
+                keyword, id_, name = match.groups()
+                opened = cls('%s %s' % (keyword, id_ or name), [line])
+                node.append(opened)
+            else:
+                node.label.append(line)
+
+            code = STRING_REGEX.sub('', line)
+            depth += code.count('{') - code.count('}')
+            if opened is not None and depth > stack[-1][1]:
+                stack.append((opened, depth))
+            while len(stack) > 1 and depth < stack[-1][1]:
+                stack.pop()
+
+        for node in root.iter_nodes():
+            node.label = tuple(node.label)
+        return root
+
+
+class TreeChange(object):
+    """A change found by a :class:`.TreeDiff`.
+
+    The kind of the change is one of:
+
+    * ``"change"``: The label of the node is changed.
+    * ``"insert"``: The node is inserted with its subtree.
+    * ``"delete"``: The node is deleted with its subtree.
+    * ``"move"``: The node is moved to another parent or reordered among its
+      siblings, the moved node is compared too.
+
+    :param str kind:
+    :param a_node: The :class:`.TreeNode` in the A tree or None.
+    :param b_node: The :class:`.TreeNode` in the B tree or None.
+    """
+
+    __slots__ = ('kind', 'a_node', 'b_node')
+
+    def __init__(self, kind, a_node, b_node):
+        self.kind = kind
+        self.a_node = a_node
+        self.b_node = b_node
+
+    def __repr__(self):
+        node = self.a_node if self.a_node is not None else self.b_node
+        return '<TreeChange %s %s>' % (self.kind, '/'.join(
+            str(id_) for id_ in node.path
+        ))
+
+
+class TreeDiff(object):
+    """Compares two trees top down.
+
+    The subtrees with equal digests are skipped without visiting their
+    nodes. The children of the other nodes are aligned with a
+    :class:`.Diff` of their keys, so the sequence diff only runs on the
+    children of the changed nodes. The nodes which are deleted from one
+    place and inserted to another with the same id, which is unique in both
+    of the trees, are reported as moves instead.
+
+    :param a: The root :class:`.TreeNode` of the A tree.
+    :param b: The root :class:`.TreeNode` of the B tree.
+    :param str algorithm: The algorithm of the Diffs of the children.
+    """
+
+    def __init__(self, a, b, algorithm='patience'):
+        self.a = a
+        self.b = b
+        self.algorithm = algorithm
+        self.changes = []
+        self.compare()
+
+    @classmethod
+    def unique_ids(cls, root):
+        """Returns the nodes with ids that are unique in the tree by their
+        ids.
+
+        :param root: :class:`.TreeNode`
+        :return: dict
+        """
+        nodes = {}
+        repeated = set()
+        for node in root.iter_nodes():
+            if node.id is None or node is root:
+                continue
+            if node.id in nodes:
+                repeated.add(node.id)
+            nodes[node.id] = node
+        for id_ in repeated:
+            del nodes[id_]
+        return nodes
+
+    def compare(self):
+        """Compares the trees and fills the list of the changes.
+        """
+        deleted = []
+        inserted = []
+        pairs = [(self.a, self.b)]
+        while pairs:
+            self.compare_nodes(pairs, deleted, inserted, *pairs.pop())
+
+        if not deleted or not inserted:
+            for node in deleted:
+                self.changes.append(TreeChange('delete', node, None))
+            for node in inserted:
+                self.changes.append(TreeChange('insert', None, node))
+            return
+
+        # match the deleted and inserted nodes with unique ids as moves, the
+        # descendants of the deleted and inserted subtrees are checked too
+        a_ids = self.unique_ids(self.a)
+        b_ids = self.unique_ids(self.b)
+        moved_a = set()
+        moved_b = set()
+        while deleted or inserted:
+            a_nodes = {}
+            for node in deleted:
+                for descendant in node.iter_nodes():
+                    if a_ids.get(descendant.id) is descendant \
+                            and descendant not in moved_a:
+                        a_nodes[descendant.id] = descendant
+            moves = []
+            for node in inserted:
+                stack = [node]
+                while stack:
+                    descendant = stack.pop()
+                    a_node = a_nodes.get(descendant.id)
+                    if a_node is not None \
+                            and b_ids.get(descendant.id) is descendant \
+                            and descendant not in moved_b:
+                        # the children are compared with the moved node
+                        moves.append((a_node, descendant))
+                        continue
+                    stack.extend(reversed(descendant.children))
+
+            for a_node, b_node in moves:
+                moved_a.add(a_node)
+                moved_b.add(b_node)
+            for node in deleted:
+                if node not in moved_a:
+                    self.changes.append(TreeChange('delete', node, None))
+            for node in inserted:
+                if node not in moved_b:
+                    self.changes.append(TreeChange('insert', None, node))
+
+            deleted = []
+            inserted = []
+            for a_node, b_node in moves:
+                self.changes.append(TreeChange('move', a_node, b_node))
+                pairs = [(a_node, b_node)]
+                while pairs:
+                    self.compare_nodes(pairs, deleted, inserted, *pairs.pop())
+            deleted = [node for node in deleted if node not in moved_a]
+            inserted = [node for node in inserted if node not in moved_b]
+
+    def compare_nodes(self, pairs, deleted, inserted, a_node, b_node):
+        """Compares a pair of matching nodes.
+
+        :param list pairs: The pairs of the child nodes to compare are
+          appended to this list.
+        :param list deleted: The deleted child nodes are appended to this
+          list.
+        :param list inserted: The inserted child nodes are appended to this
+          list.
+        :param a_node: :class:`.TreeNode`
+        :param b_node: :class:`.TreeNode`
+        :return:
+        """
+        if a_node.digest == b_node.digest:
+            return
+        if a_node.label != b_node.label:
+            self.changes.append(TreeChange('change', a_node, b_node))
+
+        a_children = a_node.children
+        b_children = b_node.children
+        diff = Diff(
+            [child.key for child in a_children],
+            [child.key for child in b_children],
+            algorithm=self.algorithm
+        )
+        for ai, bi in enumerate(diff.index_translation_table):
+            if bi is not None:
+                pairs.append((a_children[ai], b_children[bi]))
+        for hunk in diff.iter_hunks():
+            deleted.extend(
+                a_children[hunk.a_idx:hunk.a_idx + len(hunk.delete_values)]
+            )
+            inserted.extend(
+                b_children[hunk.b_idx:hunk.b_idx + len(hunk.insert_values)]
+            )
+
+    def by_kind(self, kind):
+        """Returns the changes of the given kind.
+
+        :param str kind:
+        :return: list
+        """
+        return [change for change in self.changes if change.kind == kind]
+
+    def iter_lines(self):
+        """Yields the lines of a text report of the changes.
+        """
+        for change in self.changes:
+            if change.kind == 'move':
+                yield 'move %s -> %s\n' % (
+                    '/'.join(str(i) for i in change.a_node.path),
+                    '/'.join(str(i) for i in change.b_node.path)
+                )
+            else:
+                node = change.b_node if change.a_node is None \
+                    else change.a_node
+                yield '%s %s\n' % (
+                    change.kind, '/'.join(str(i) for i in node.path)
+                )
+
+    def to_s(self):
+        """Returns the text report of the changes.
+        """
+        return ''.join(self.iter_lines())
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+"""Helpers shared by the modules of pyTJ
+"""
+
+import os
+
+
+def write_atomically(path, data):
+    """Writes the data to a temporary file next to the given path first and
+    renames it to the path, so a reader never sees a partially written file.
+
+    :param str path:
+    :param data: The bytes or the text, which is encoded as UTF-8, to write.
+    :return:
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -26,27 +26,29 @@ PACKAGES = find_packages()
 META_PATH = os.path.join("pytj", "__init__.py")
 KEYWORDS = ['task', 'juggler', 'project', 'management']
 CLASSIFIERS = ["Programming Language :: Python",
-               "Programming Language :: Python :: 2",
-               "Programming Language :: Python :: 2.6",
-               "Programming Language :: Python :: 2.7",
                "Programming Language :: Python :: 3",
-               "Programming Language :: Python :: 3.0",
-               "Programming Language :: Python :: 3.1",
-               "Programming Language :: Python :: 3.2",
-               "Programming Language :: Python :: 3.3",
-               "Programming Language :: Python :: 3.4",
-               "Programming Language :: Python :: 3.5",
-               "Programming Language :: Python :: 3.6",
+               "Programming Language :: Python :: 3 :: Only",
+               "Programming Language :: Python :: 3.7",
+               "Programming Language :: Python :: 3.8",
+               "Programming Language :: Python :: 3.9",
+               "Programming Language :: Python :: 3.10",
+               "Programming Language :: Python :: 3.11",
                "License :: OSI Approved :: MIT License",
                "Operating System :: OS Independent",
                "Development Status :: 1 - Planning",
                "Intended Audience :: End Users/Desktop",
                "Topic :: Utilities",
                "Topic :: Office/Business :: Scheduling", ]
+# asyncio.get_running_loop() of diff_many_async() needs Python 3.7
+PYTHON_REQUIRES = '>=3.7'
 INSTALL_REQUIRES = [
     'pytz', 'tzlocal',
 ]
 TEST_REQUIRES = ['pytest', 'pytest-xdist', 'pytest-cov', 'coverage']
+# NumPy speeds up the common prefix and suffix search of pytj.algorithm_diff
+EXTRAS_REQUIRE = {
+    'numpy': ['numpy'],
+}
 DATA_FILES = [(
     '',
     ['COPYING', 'COPYING.LESSER', 'INSTALL', 'MANIFEST.in', 'README.rst']),
@@ -100,6 +102,8 @@ if __name__ == '__main__':
         data_files=DATA_FILES,
         zip_safe=True,
         test_suite='pytj',
+        python_requires=PYTHON_REQUIRES,
         install_requires=INSTALL_REQUIRES,
+        extras_require=EXTRAS_REQUIRE,
         tests_require=TEST_REQUIRES
     )
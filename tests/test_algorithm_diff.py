@@ -16,8 +16,23 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
 
+import difflib
+import glob
+import io
+import os
+import pickle
+import time
+from array import array
+
 import pytest
-from pytj.algorithm_diff import Diffable, DiffableString
+from pytj import algorithm_diff
+from pytj.algorithm_diff import (CompactHunk, Diff, DiffBudget, DiffCache,
+                                 DiffCancelled, Diffable, DiffableFile,
+                                 DiffableString, DiffStats, MergeResult,
+                                 SequenceView, apply_delta, batch_pairs,
+                                 diff_files, diff_many, diff_many_async,
+                                 ignore_case, ignore_whitespace, merge3,
+                                 tokenize)
 
 
 class TestData(object):
@@ -304,3 +319,1267 @@ def test_string_diff_some_insertions_some_changes_some_deletions_2():
     res = diff.to_s()
     assert res == set_.b_a, "B->A text diff %s failed" % set_.name
     assert set_.b.patch(diff) == set_.a, "B->A text patch %s failed" % set_.name
+
+
+def test_diff_unknown_algorithm():
+    """testing if a ValueError will be raised for an unknown algorithm
+    """
+    with pytest.raises(ValueError) as cm:
+        Diffable([1, 2, 3]).diff([1, 3], algorithm='unknown')
+
+    assert str(cm.value) == \
+        'Unknown diff algorithm: unknown, should be one of histogram, lcs, ' \
+        'myers, patience'
+
+
+def test_myers_edit_script_and_patch_delete_2_and_insert_1_elements_at_2_different_locations():
+    set_ = TestData(
+        "delete 2 and insert 1 elements at 2 different locations",
+        [1, 2, 3, 5, 6, 7],
+        [1, 3, 4, 5, 7],
+        ['2d1', '3i4', '5d1'],
+        ['2i2', '3d1', '5i6']
+    )
+
+    diff = set_.a.diff(set_.b, algorithm='myers')
+    res = diff.edit_script()
+    assert res == set_.a_b
+    assert set_.a.patch(diff) == set_.b
+
+    diff = set_.b.diff(set_.a, algorithm='myers')
+    res = diff.edit_script()
+    assert res == set_.b_a
+    assert set_.b.patch(diff) == set_.a
+
+
+def test_myers_many_similar_values_some_changes():
+    """testing if the myers algorithm finds a diff with the same number of
+    changes as the default algorithm
+    """
+    set_ = TestData(
+        "many similar values, some changes",
+        [1, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1],
+        [1, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 0, 1],
+        None,
+        None
+    )
+
+    lcs_diff = set_.a.diff(set_.b)
+    diff = set_.a.diff(set_.b, algorithm='myers')
+    assert set_.a.patch(diff) == set_.b
+    assert sum(len(h.delete_values) for h in diff.hunks) == \
+        sum(len(h.delete_values) for h in lcs_diff.hunks)
+    assert sum(len(h.insert_values) for h in diff.hunks) == \
+        sum(len(h.insert_values) for h in lcs_diff.hunks)
+
+    diff = set_.b.diff(set_.a, algorithm='myers')
+    assert set_.b.patch(diff) == set_.a
+
+
+def test_myers_string_diff_some_insertions_some_changes_some_deletions_2():
+    set_ = TestData(
+        "Some insertions, some changes, some deletions",
+        "foo\nbar\n",
+        "foo\nbaz\n",
+        "2c2\n< bar\n---\n> baz\n",
+        "2c2\n< baz\n---\n> bar\n"
+    )
+
+    diff = set_.a.diff(set_.b, algorithm='myers')
+    assert diff.to_s() == set_.a_b
+    assert set_.a.patch(diff) == set_.b
+
+    diff = set_.b.diff(set_.a, algorithm='myers')
+    assert diff.to_s() == set_.b_a
+    assert set_.b.patch(diff) == set_.a
+
+
+def test_myers_repeated_values():
+    """testing if the myers algorithm handles long lists with many repeated
+    values
+    """
+    a = Diffable(['}', ''] * 5000)
+    b = Diffable(['}', ''] * 2500 + ['new'] + ['}', ''] * 2500)
+    diff = a.diff(b, algorithm='myers')
+    assert diff.edit_script() == ['5001inew']
+    assert a.patch(diff) == b
+
+
+@pytest.mark.parametrize('algorithm', ['patience', 'histogram'])
+def test_anchored_algorithms_patch(algorithm):
+    """testing if the patience and histogram algorithms create diffs that
+    patch and unpatch random lists
+    """
+    import random
+    rng = random.Random(1)
+    for _ in range(200):
+        a = Diffable(rng.choice('abcd}') for _ in range(rng.randrange(30)))
+        b = Diffable(rng.choice('abcd}') for _ in range(rng.randrange(30)))
+        diff = a.diff(b, algorithm=algorithm)
+        assert a.patch(diff) == b
+        assert b.unpatch(diff) == a
+        matched = [bi for bi in diff.index_translation_table
+                   if bi is not None]
+        assert matched == sorted(set(matched))
+
+
+def test_patience_anchors_on_unique_lines():
+    """testing if the patience algorithm doesn't align the unrelated
+    functions at their closing braces
+    """
+    a = Diffable(['def f():', 'x', '}', 'def g():', 'y', '}'])
+    b = Diffable(['def g():', 'y', '}', 'def h():', 'z', '}'])
+    diff = a.diff(b, algorithm='patience')
+    assert diff.index_translation_table == [None, None, None, 0, 1, 5]
+    assert [hunk.delete_values for hunk in diff.hunks] == \
+        [['def f():', 'x', '}'], []]
+    assert [hunk.insert_values for hunk in diff.hunks] == \
+        [[], ['}', 'def h():', 'z']]
+    assert a.patch(diff) == b
+
+
+def test_histogram_repeated_values():
+    """testing if the histogram algorithm handles long lists with many
+    repeated values
+    """
+    a = Diffable(['}', ''] * 5000)
+    b = Diffable(['}', ''] * 2500 + ['new'] + ['}', ''] * 2500)
+    diff = a.diff(b, algorithm='histogram')
+    assert diff.edit_script() == ['5001inew']
+    assert a.patch(diff) == b
+
+
+def test_histogram_alternating_inserts_scale_linearly():
+    """testing if the work and the time of the histogram algorithm grow
+    linearly when every other value is inserted
+    """
+    def measure(n):
+        a = ['line %s' % i for i in range(n)]
+        b = [v for i in range(n) for v in ('line %s' % i, 'new %s' % i)]
+        budget = DiffBudget()
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            diff = Diff(a, b, algorithm='histogram', budget=budget)
+            assert len(diff.hunks) == n
+            times.append(time.perf_counter() - start)
+        return budget.cost, min(times)
+
+    small_cost, small_time = measure(1000)
+    large_cost, large_time = measure(4000)
+    # a quadratic algorithm would grow 16 times
+    assert large_cost < 5 * small_cost
+    assert large_time < 10 * small_time + 0.05
+
+def test_string_diff_with_patience():
+    """testing if DiffableString.diff accepts the algorithm
+    """
+    a = DiffableString('abcabba')
+    b = DiffableString('cbabac')
+    diff = a.diff(b, algorithm='patience')
+    assert diff.algorithm == 'patience'
+    assert a.patch(diff) == b
+
+
+def test_iter_hunks_yields_the_same_hunks():
+    """testing if iter_hunks() yields the same hunks without creating the
+    hunks list
+    """
+    a = Diffable([1, 2, 3, 5, 6, 7])
+    b = Diffable([1, 3, 4, 5, 7])
+    diff = a.diff(b)
+    hunks = list(diff.iter_hunks())
+    assert diff._hunks is None
+    assert [h.to_s() for h in hunks] == [h.to_s() for h in diff.hunks]
+    assert [h.to_s() for h in diff.iter_hunks()] == \
+        [h.to_s() for h in diff.hunks]
+
+
+def test_write_to_normal_format():
+    """testing if write_to() writes the standard UNIX diff output
+    """
+    a = DiffableString("0\n1\n2\n4\n5\n6\n7\n")
+    b = DiffableString("0\n2\nA\nB\n6\n5\n7\n \n")
+    diff = a.diff(b)
+    f = io.StringIO()
+    diff.write_to(f)
+    assert f.getvalue() == diff.to_s()
+
+
+def test_write_to_unified_format():
+    """testing if write_to() writes the unified diff output
+    """
+    a = ['line %s' % i for i in range(20)]
+    b = list(a)
+    b[2] = 'changed'
+    del b[9]
+    b.insert(17, 'new')
+
+    diff = Diffable(a).diff(b)
+    f = io.StringIO()
+    diff.write_to(f, format='unified', context=2)
+    expected = ''.join(
+        '%s\n' % line
+        for line in difflib.unified_diff(a, b, 'a', 'b', n=2, lineterm='')
+    )
+    assert f.getvalue() == expected
+
+
+def test_write_to_context_format():
+    """testing if write_to() writes the context diff output
+    """
+    a = ['line %s' % i for i in range(20)]
+    b = list(a)
+    b[2] = 'changed'
+    del b[9]
+    b.insert(17, 'new')
+
+    diff = Diffable(a).diff(b)
+    f = io.StringIO()
+    diff.write_to(f, format='context', a_label='old', b_label='new')
+    expected = ''.join(
+        '%s\n' % line
+        for line in difflib.context_diff(a, b, 'old', 'new', lineterm='')
+    )
+    assert f.getvalue() == expected
+
+
+def test_write_to_identical_inputs():
+    """testing if write_to() writes nothing for identical inputs
+    """
+    diff = Diffable([1, 2, 3]).diff([1, 2, 3])
+    f = io.StringIO()
+    diff.write_to(f, format='unified')
+    assert f.getvalue() == ''
+
+
+def test_write_to_unknown_format():
+    """testing if a ValueError will be raised for an unknown format
+    """
+    diff = Diffable([1, 2, 3]).diff([1, 3])
+    with pytest.raises(ValueError) as cm:
+        diff.write_to(io.StringIO(), format='ed')
+
+    assert str(cm.value) == \
+        'Unknown diff format: ed, should be one of normal, unified, context'
+
+
+def test_patch_inplace():
+    """testing if patch() modifies the list in place when inplace is True
+    """
+    a = Diffable([1, 2, 3, 5, 6, 7])
+    b = Diffable([1, 3, 4, 5, 7])
+    diff = a.diff(b)
+    res = a.patch(diff, inplace=True)
+    assert res is a
+    assert a == b
+
+
+def test_patch_inplace_growing_list():
+    """testing if patch() modifies a list that gets longer in place
+    """
+    a = Diffable([1, 2, 3, 4, 5, 6, 7, 8])
+    b = Diffable([0, 1, 9, 9, 3, 4, 5, 10, 11, 12, 6, 7])
+    diff = a.diff(b)
+    assert a.patch(diff, inplace=True) is a
+    assert a == b
+
+
+def test_unpatch():
+    """testing if unpatch() creates the A list from the B list
+    """
+    set_ = TestData(
+        "many similar values, some changes",
+        [1, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1],
+        [1, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 0, 1],
+        None,
+        None
+    )
+    diff = set_.a.diff(set_.b)
+    assert set_.b.unpatch(diff) == set_.a
+    assert set_.b.unpatch(diff, inplace=True) is set_.b
+    assert set_.b == set_.a
+
+
+def test_string_unpatch():
+    """testing if unpatch() creates the A string from the B string
+    """
+    a = DiffableString("0\n1\n2\n4\n5\n6\n7\n")
+    b = DiffableString("0\n2\nA\nB\n6\n5\n7\n \n")
+    diff = a.diff(b)
+    assert b.unpatch(diff) == a
+
+
+def test_compact_diff_hunks_view_into_the_lists():
+    """testing if the compact mode hunks read the values from the lists
+    """
+    a = Diffable([1, 2, 3, 5, 6, 7])
+    b = Diffable([1, 3, 4, 5, 7])
+    diff = a.diff(b, compact=True)
+    assert all(isinstance(h, CompactHunk) for h in diff.hunks)
+    assert not hasattr(diff.hunks[0], '__dict__')
+    assert diff.edit_script() == ['2d1', '3i4', '5d1']
+    assert diff.hunks[1].insert_values == [4]
+    assert diff.hunks[1].insert_values.values is b
+    assert a.patch(diff) == b
+    assert b.unpatch(diff) == a
+
+
+def test_compact_string_diff():
+    """testing if the compact mode gives the same output for strings
+    """
+    a = DiffableString("0\n1\n2\n4\n5\n6\n7\n")
+    b = DiffableString("0\n2\nA\nB\n6\n5\n7\n \n")
+    diff = a.diff(b, compact=True)
+    assert diff.to_s() == a.diff(b).to_s()
+    assert a.patch(diff) == b
+
+
+def test_sequence_view():
+    """testing the SequenceView class
+    """
+    values = list(range(10))
+    view = SequenceView(values, 2, 6)
+    assert len(view) == 4
+    assert list(view) == [2, 3, 4, 5]
+    assert view[0] == 2
+    assert view[-1] == 5
+    assert view[1:3] == [3, 4]
+    assert view[::2] == [2, 4]
+    with pytest.raises(IndexError):
+        view[4]
+
+
+def test_pickle_diff():
+    """testing if a pickled diff only includes the hunks
+    """
+    a = ['line %s' % i for i in range(1000)]
+    b = list(a)
+    b[500] = 'changed'
+
+    for compact in [False, True]:
+        diff = Diffable(a).diff(b, compact=compact)
+        data = pickle.dumps(diff)
+        assert len(data) < 500
+
+        restored = pickle.loads(data)
+        assert restored.compact is compact
+        assert restored.to_s() == diff.to_s()
+        assert restored.edit_script() == ['501d1', '501ichanged']
+        assert restored.patch(a) == b
+        assert restored.unpatch(b) == a
+
+
+def test_pickle_diff_key():
+    """testing if the key function is pickled with the Diff and a warning is
+    issued if it can not be pickled
+    """
+    a = ['A', 'b', 'c']
+    b = ['a', 'B', 'x']
+    restored = pickle.loads(pickle.dumps(Diff(a, b, key=ignore_case)))
+    assert restored.key is ignore_case
+
+    with pytest.warns(UserWarning):
+        data = pickle.dumps(Diff(a, b, key=lambda value: value.lower()))
+    assert pickle.loads(data).key is None
+
+
+def test_intern():
+    """testing if intern() replaces the values with dense integer ids
+    """
+    a_ids, b_ids = Diff.intern(['a', 'b', 'a'], ['b', 'c'])
+    assert a_ids == array('i', [0, 1, 0])
+    assert b_ids == array('i', [1, 2])
+
+
+def test_common_prefix_and_suffix_length():
+    """testing the common_prefix_length() and common_suffix_length() methods
+    with lists and integer arrays
+    """
+    a = list(range(1000))
+    b = list(range(700)) + [-1] + list(range(701, 1000))
+    for x, y in [(a, b), (array('i', a), array('i', b))]:
+        assert Diff.common_prefix_length(x, y) == 700
+        assert Diff.common_suffix_length(x, y, 700) == 299
+        assert Diff.common_prefix_length(x, x) == 1000
+        assert Diff.common_suffix_length(x, x, 1000) == 0
+        assert Diff.common_suffix_length(x[:10], x) == 0
+
+
+
+@pytest.mark.parametrize('with_numpy', [False, True])
+def test_common_prefix_and_suffix_length_of_arrays(with_numpy, monkeypatch):
+    """testing if the common_prefix_length() and common_suffix_length()
+    methods find the differences at the block boundaries of the integer
+    arrays with and without NumPy
+    """
+    if with_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(algorithm_diff, 'numpy', None)
+    a = array('i', range(1000))
+    for i in [0, 63, 64, 65, 191, 192, 999]:
+        b = array('i', a)
+        b[i] = -1
+        assert Diff.use_numpy(a, b) is with_numpy
+        assert Diff.common_prefix_length(a, b) == i
+        assert Diff.common_suffix_length(a, b) == 999 - i
+        assert Diff.common_suffix_length(a, b, i) == 999 - i
+
+def test_diff_with_ignore_case_key():
+    """testing if the key function is used for comparing the values
+    """
+    a = DiffableString("foo\nBar\nbaz\n")
+    b = DiffableString("FOO\nbar\nqux\n")
+    diff = a.diff(b, key=ignore_case)
+    assert diff.to_s() == "3c3\n< baz\n---\n> qux\n"
+
+
+def test_diff_with_ignore_whitespace_key():
+    """testing if the ignore_whitespace key ignores the white spaces
+    """
+    a = Diffable(['a b', 'c', 'd'])
+    b = Diffable(['ab ', ' c', 'e'])
+    diff = a.diff(b, key=ignore_whitespace, algorithm='myers')
+    assert diff.edit_script() == ['3d1', '3ie']
+
+
+def test_diff_files(tmp_path):
+    """testing if diff_files() compares the lines of the given files
+    """
+    a = "0\n1\n2\n4\n5\n6\n7\n"
+    b = "0\n2\nA\nB\n6\n5\n7\n \n"
+    path_a = tmp_path / 'a.txt'
+    path_b = tmp_path / 'b.txt'
+    path_a.write_text(a)
+    path_b.write_text(b)
+
+    diff = diff_files(str(path_a), str(path_b))
+    assert diff.to_s() == DiffableString(a).diff(b).to_s()
+    assert diff.a.patch(diff) == b
+    assert diff.b.unpatch(diff) == a
+
+    f = io.BytesIO()
+    diff.a.write_patched(diff, f)
+    assert f.getvalue() == b.encode('utf-8')
+
+    # the files are closed and read again when the lines are needed
+    for f in [diff.a, diff.b]:
+        assert (f.file, f.buffer) == (None, None)
+    assert ''.join(diff.iter_lines('unified')) == ''.join(
+        DiffableString(a).diff(b).iter_lines('unified')
+    )
+    diff = DiffableFile(str(path_a)).diff(str(path_b))
+    assert (diff.b.file, diff.b.buffer) == (None, None)
+    diff.a.close()
+    assert DiffCache.digest(diff.a) == DiffCache.digest(
+        DiffableFile(str(path_a))
+    )
+
+
+def test_diff_files_memory(tmp_path):
+    """testing if the memory of diff_files() doesn't depend on the length of
+    the lines of the files
+    """
+    import tracemalloc
+    lines = ['"Task %s";"%s"' % (i, 'x' * 200) for i in range(20000)]
+    path_a = tmp_path / 'a.txt'
+    path_b = tmp_path / 'b.txt'
+    path_a.write_text('\n'.join(lines))
+    lines[10000:10001] = ['changed', '"Task 1";"%s"' % ('x' * 200)]
+    path_b.write_text('\n'.join(lines))
+
+    tracemalloc.start()
+    try:
+        diff = diff_files(str(path_a), str(path_b), algorithm='myers')
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert [(h.a_idx, h.insert_values) for h in diff.hunks] == [
+        (10000, ['changed', '"Task 1";"%s"' % ('x' * 200)])
+    ]
+    # 20000 lines of 216 bytes
+    assert peak < 2 * 1024 * 1024
+
+
+def test_intern_raw_lines_collisions(tmp_path, monkeypatch):
+    """testing if the lines with the same hash are told apart
+    """
+    path_a = tmp_path / 'a.txt'
+    path_b = tmp_path / 'b.txt'
+    path_a.write_text('s\nx\ny\nx\ne')
+    path_b.write_text('s\ny\nz\nx\nf')
+    monkeypatch.setitem(Diff.intern_raw_lines.__func__.__globals__,
+                        'hash', lambda value: 0)
+    with DiffableFile(str(path_a)) as a, DiffableFile(str(path_b)) as b:
+        a_ids, b_ids = Diff.intern(a, b)
+    assert list(a_ids) == [0, 1, 2, 1, 3]
+    assert list(b_ids) == [0, 2, 4, 1, 5]
+
+
+def test_diffable_file_lines(tmp_path):
+    """testing if DiffableFile splits the lines like DiffableString
+    """
+    path = tmp_path / 'a.txt'
+    path.write_bytes(u'a\nü\n\nb'.encode('utf-8'))
+    with DiffableFile(str(path)) as f:
+        assert len(f) == 4
+        assert list(f) == [u'a', u'ü', u'', u'b']
+        assert f[1] == u'ü'
+        assert f[-1] == u'b'
+        assert f[1:3] == [u'ü', u'']
+        assert f.raw_line(1) == u'ü'.encode('utf-8')
+
+    path.write_bytes(b'')
+    with DiffableFile(str(path)) as f:
+        assert list(f) == [u'']
+
+
+def test_diff_cache_returns_the_stored_diff():
+    """testing if DiffCache returns the stored diff for unchanged inputs
+    """
+    cache = DiffCache(maxsize=2)
+    a = ['line %s' % i for i in range(100)]
+    b = list(a)
+    b[50] = 'changed'
+
+    diff = cache.diff(a, b)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cached = cache.diff(list(a), list(b))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cached is not diff
+    assert cached.to_s() == diff.to_s()
+    assert ''.join(cached.iter_lines('unified')) == \
+        ''.join(diff.iter_lines('unified'))
+
+    # the options are a part of the key
+    cache.diff(a, b, algorithm='myers')
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_diff_cache_lru():
+    """testing if DiffCache keeps the most recently used diffs only
+    """
+    cache = DiffCache(maxsize=2)
+    cache.diff([1], [2])
+    cache.diff([1], [3])
+    cache.diff([1], [2])
+    cache.diff([1], [4])
+    assert len(cache.entries) == 2
+    cache.diff([1], [2])
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.diff([1], [3])
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_diff_cache_directory(tmp_path):
+    """testing if DiffCache stores the diffs in the directory
+    """
+    directory = str(tmp_path / 'cache')
+    cache = DiffCache(directory=directory)
+    diff = cache.diff(['a', 'b', 'c'], ['a', 'c', 'd'], compact=True)
+    assert len(glob.glob(os.path.join(directory, '*.pickle'))) == 1
+
+    cache = DiffCache(directory=directory)
+    cached = cache.diff(['a', 'b', 'c'], ['a', 'c', 'd'], compact=True)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cached.edit_script() == diff.edit_script() == ['2d1', '3id']
+
+    cache.clear()
+    assert os.listdir(directory) == ['.key']
+
+
+def test_diff_cache_directory_rejects_foreign_files(tmp_path):
+    """testing if DiffCache removes the files written with another key or
+    format version instead of unpickling them
+    """
+    directory = str(tmp_path / 'cache')
+    a, b = ['a', 'b', 'c'], ['a', 'c', 'd']
+    DiffCache(directory=directory).diff(a, b)
+    path = glob.glob(os.path.join(directory, '*.pickle'))[0]
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    other = DiffCache(directory=directory, secret=b'another key')
+    other.diff(a, b)
+    assert (other.hits, other.misses) == (0, 1)
+    cache = DiffCache(directory=directory)
+    cache.diff(a, b)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # a file of an older format version
+    cache = DiffCache(directory=directory)
+    with open(path, 'wb') as f:
+        f.write(data.replace(b'pytj-diff 1', b'pytj-diff 0'))
+    assert cache.get(os.path.basename(path)[:-7]) is None
+    assert not os.path.exists(path)
+
+    os.chmod(os.path.join(directory, '.key'), 0o644)
+    if hasattr(os, 'getuid'):
+        with pytest.raises(ValueError):
+            DiffCache(directory=directory)
+
+
+def test_diff_cache_directory_is_bounded(tmp_path):
+    """testing if DiffCache removes the least recently used files when they
+    take more than max_bytes
+    """
+    directory = str(tmp_path / 'cache')
+    cache = DiffCache(directory=directory, max_bytes=1)
+    cache.diff(['a'], ['b'])
+    cache.diff(['c'], ['d'])
+    assert len(glob.glob(os.path.join(directory, '*.pickle'))) == 0
+
+    cache = DiffCache(directory=directory)
+    cache.diff(['a'], ['b'])
+    size = os.path.getsize(glob.glob(os.path.join(directory, '*.pickle'))[0])
+    cache = DiffCache(directory=directory, max_bytes=2 * size)
+    key = cache.cache_key(['a'], ['b'])
+    os.utime(cache.path(key), ns=(0, 0))
+    cache.diff(['c'], ['d'])
+    cache.diff(['e'], ['f'])
+    assert sorted(
+        os.path.basename(path)
+        for path in glob.glob(os.path.join(directory, '*.pickle'))
+    ) == sorted(
+        '%s.pickle' % cache.cache_key(x, y)
+        for x, y in [(['c'], ['d']), (['e'], ['f'])]
+    )
+
+
+def test_diff_cache_digest():
+    """testing if the digest separates the values
+    """
+    assert DiffCache.digest(['ab', 'c']) != DiffCache.digest(['a', 'bc'])
+    assert DiffCache.digest(['1']) != DiffCache.digest([1])
+    assert DiffCache.digest([b'a']) != DiffCache.digest(['a'])
+
+
+def test_diff_cache_key_functions():
+    """testing if the Diffs with key functions that can not be identified by
+    their names are not cached
+    """
+    import functools
+    a = ['A', 'b']
+    b = ['a', 'b']
+    cache = DiffCache()
+    assert len(cache.diff(a, b, key=lambda v: v.lower()).hunks) == 0
+    assert len(cache.diff(a, b, key=lambda v: v).hunks) == 1
+    assert len(cache.diff(a, b, key=functools.partial(str.lower)).hunks) \
+        == 0
+    assert len(cache.entries) == 0
+    assert cache.cache_key(a, b, key=lambda v: v) is None
+
+    assert len(cache.diff(a, b, key=ignore_case).hunks) == 0
+    assert len(cache.diff(a, b, key=ignore_case).hunks) == 0
+    assert (len(cache.entries), cache.hits) == (1, 1)
+    assert DiffCache.callable_name(ignore_case) == \
+        'pytj.algorithm_diff.ignore_case'
+
+
+def test_diff_without_stats(capsys):
+    """testing if a Diff doesn't collect statistics or print anything by
+    default
+    """
+    diff = Diff(list('abcxyz'), list('abqxz'))
+    assert diff.stats is None
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('algorithm', ['lcs', 'myers'])
+def test_diff_stats(algorithm):
+    """testing if the DiffStats records the trimmed lengths, the LCS length
+    and the timings of the phases
+    """
+    a = list('abcxyzdef')
+    b = list('abcyqzxdef')
+    diff = Diff(a, b, algorithm=algorithm, stats=True)
+    stats = diff.stats
+    assert isinstance(stats, DiffStats)
+    assert stats.a_length == 9
+    assert stats.b_length == 10
+    assert stats.prefix_length == 3
+    assert stats.suffix_length == 3
+    assert stats.lcs_length == 8
+    assert sorted(stats.timings) == ['index_translations', 'intern']
+    diff.hunks
+    assert sorted(stats.timings) == ['hunks', 'index_translations', 'intern']
+    if algorithm == 'lcs':
+        # x, y and z are compared in the middle
+        assert stats.distinct_keys == 4
+        assert stats.match_pairs == 3
+        assert stats.peak_thresholds == 2
+        assert stats.peak_links == 2
+    else:
+        assert stats.distinct_keys is None
+
+
+def test_diff_stats_callback_and_logging(caplog):
+    """testing if the DiffStats is passed to the callback and logged
+    """
+    reported = []
+    stats = DiffStats(callback=reported.append)
+    with caplog.at_level('DEBUG', logger='pytj.algorithm_diff'):
+        diff = Diff(list('abc'), list('abd'), stats=stats)
+    assert diff.stats is stats
+    assert reported == [stats]
+    assert "'lcs_length': 2" in caplog.text
+    assert stats.as_dict()['lcs_length'] == 2
+
+
+def test_diff_cache_ignores_stats():
+    """testing if the stats argument doesn't change the cache key
+    """
+    cache = DiffCache()
+    assert cache.cache_key('ab', 'ac', stats=True) == \
+        cache.cache_key('ab', 'ac')
+
+
+@pytest.mark.parametrize('algorithm', ['lcs', 'myers', 'patience',
+                                       'histogram'])
+def test_diff_budget_exhausted(algorithm):
+    """testing if a Diff falls back to a valid approximate diff when its
+    budget runs out
+    """
+    a = Diffable('x%s' % (i % 7) for i in range(200))
+    b = Diffable('x%s' % (i % 5) for i in range(200))
+    b[0] = 'new'
+    b[-1] = 'new'
+    diff = a.diff(b, algorithm=algorithm, budget=DiffBudget(max_cost=10))
+    assert diff.approximate is True
+    assert a.patch(diff) == b
+    assert b.unpatch(diff) == a
+
+    exact = a.diff(b, algorithm=algorithm)
+    assert exact.approximate is False
+    assert len(diff.edit_script()) >= 1
+    assert diff.index_translation_table.count(None) >= \
+        exact.index_translation_table.count(None)
+
+
+def test_diff_budget_not_exhausted():
+    """testing if a Diff within its budget is exact
+    """
+    a = Diffable(list('abcabba'))
+    b = Diffable(list('cbabac'))
+    budget = DiffBudget(max_cost=1000, timeout=60)
+    diff = a.diff(b, algorithm='myers', budget=budget)
+    assert diff.approximate is False
+    assert 0 < budget.cost <= 1000
+    assert diff.edit_script() == a.diff(b, algorithm='myers').edit_script()
+
+
+def test_diff_budget_timeout():
+    """testing if a Diff falls back to an approximate diff after the timeout
+    """
+    a = Diffable('a %s' % i for i in range(500))
+    b = Diffable('b %s' % i for i in range(500))
+    b[250] = a[250]
+    diff = a.diff(b, algorithm='myers', budget=DiffBudget(timeout=0))
+    assert diff.approximate is True
+    assert a.patch(diff) == b
+
+
+def test_diff_budget_cancel():
+    """testing if a Diff is cancelled from another thread
+    """
+    import threading
+    cancel = threading.Event()
+    a = Diffable('a %s' % i for i in range(5000))
+    b = Diffable('b %s' % i for i in range(5000))
+    b[2500] = a[2500]
+    timer = threading.Timer(0.05, cancel.set)
+    timer.start()
+    try:
+        with pytest.raises(DiffCancelled):
+            a.diff(b, algorithm='myers', budget=DiffBudget(cancel=cancel))
+    finally:
+        timer.cancel()
+
+
+
+@pytest.mark.parametrize('algorithm', ['lcs', 'myers', 'patience',
+                                       'histogram'])
+def test_diff_budget_checked_without_cost(algorithm):
+    """testing if the cancellation and the timeout are checked even if the
+    algorithm adds no cost, i.e. for the LCS of disjoint lists
+    """
+    import threading
+    cancel = threading.Event()
+    cancel.set()
+    a = ['a %s' % i for i in range(100)]
+    b = ['b %s' % i for i in range(100)]
+    with pytest.raises(DiffCancelled):
+        Diff(a, b, algorithm=algorithm, budget=DiffBudget(cancel=cancel))
+
+    diff = Diff(a, b, algorithm=algorithm, budget=DiffBudget(timeout=0))
+    assert diff.approximate is True
+    assert diff.patch(a) == b
+
+def test_approximate_diff_pickle_and_cache():
+    """testing if the approximate flag is pickled and the approximate Diffs
+    are not cached
+    """
+    a = ['x%s' % (i % 7) for i in range(100)]
+    b = ['x%s' % (i % 5) for i in range(100)]
+    diff = Diff(a, b, budget=DiffBudget(max_cost=1))
+    assert pickle.loads(pickle.dumps(diff)).approximate is True
+
+    cache = DiffCache()
+    cache.diff(a, b, budget=DiffBudget(max_cost=1))
+    assert len(cache.entries) == 0
+    cache.diff(a, b, budget=DiffBudget())
+    assert len(cache.entries) == 1
+
+
+def test_tokenize():
+    """testing if tokenize splits the text into tokens which join to the
+    text again
+    """
+    text = 'Task "a b";12.5,  next\n'
+    assert tokenize(text) == \
+        ['Task', ' ', '"', 'a', ' ', 'b', '"', ';', '12', '.', '5', ',',
+         '  ', 'next', '\n']
+    assert tokenize(text, 'char') == list(text)
+    with pytest.raises(ValueError):
+        tokenize(text, 'sentence')
+
+
+def test_hunk_refine():
+    """testing if a Hunk is refined to the changed cells of a CSV row and the
+    result is cached on the Hunk
+    """
+    header = '"Name";"Start";"End"\n'
+    a = DiffableString(header + '"Task 1";"2017-01-01";"2017-02-01"')
+    b = DiffableString(header + '"Task 1";"2017-01-01";"2017-03-01"')
+    diff = a.diff(b)
+    hunk, = diff.hunks
+    assert hunk.refined is None
+
+    refined = hunk.refine()
+    assert refined is hunk.refine()
+    assert [(h.delete_values, h.insert_values) for h in refined.hunks] == \
+        [(['02'], ['03'])]
+    assert ''.join(refined.patch(refined.a)) == b.split('\n')[1]
+
+    refined = hunk.refine('char')
+    assert [(h.delete_values, h.insert_values) for h in refined.hunks] == \
+        [(['2'], ['3'])]
+    assert hunk.refine('char') is refined
+
+
+def test_iter_refined_hunks():
+    """testing if iter_refined_hunks only refines the Hunks which replace
+    values
+    """
+    a = Diffable(['a b', 'same', 'deleted'])
+    b = Diffable(['a c', 'same'])
+    diff = a.diff(b, compact=True)
+    refined = list(diff.iter_refined_hunks())
+    assert len(refined) == 1
+    hunk, hunk_diff = refined[0]
+    assert [(h.delete_values, h.insert_values) for h in hunk_diff.hunks] == \
+        [(['b'], ['c'])]
+    assert [h.refined for h in diff.hunks] == [hunk.refined, None]
+
+
+def test_merge3_without_conflicts():
+    """testing if merge3 merges the changes of different regions
+    """
+    base = ['project', 'task a', 'task b', 'task c', 'end']
+    ours = ['project', 'task A', 'task b', 'task c', 'end']
+    theirs = ['project', 'task a', 'task b', 'task c', 'task d', 'end']
+    result = merge3(base, ours, theirs)
+    assert not result.has_conflicts
+    assert result.merged() == \
+        ['project', 'task A', 'task b', 'task c', 'task d', 'end']
+    assert [region.kind for region in result.regions] == \
+        ['unchanged', 'ours', 'unchanged', 'theirs', 'unchanged']
+
+
+def test_merge3_same_change_and_deletions():
+    """testing if merge3 takes the same change once and merges deletions
+    """
+    base = ['a', 'b', 'c', 'd', 'e', 'f']
+    ours = ['a', 'B', 'c', 'e', 'f']
+    theirs = ['a', 'B', 'c', 'd', 'e']
+    result = merge3(base, ours, theirs)
+    assert [region.kind for region in result.regions] == \
+        ['unchanged', 'both', 'unchanged', 'ours', 'unchanged', 'theirs']
+    assert result.merged() == ['a', 'B', 'c', 'e']
+
+    # adjacent changes conflict
+    assert merge3(base, ['a', 'b', 'c', 'e', 'f'],
+                  ['a', 'b', 'c', 'd', 'f']).has_conflicts
+
+
+def test_merge3_conflict():
+    """testing if merge3 marks the conflicting changes
+    """
+    base = ['a', 'b', 'c']
+    ours = ['a', 'x', 'c']
+    theirs = ['a', 'y', 'c']
+    result = merge3(base, ours, theirs)
+    assert result.has_conflicts
+    conflict, = result.conflicts
+    assert (conflict.base_idx, conflict.base_values) == (1, ['b'])
+    assert conflict.ours_values == ['x']
+    assert conflict.theirs_values == ['y']
+    assert result.merged(base_label='base') == [
+        'a', '<<<<<<< ours', 'x', '||||||| base', 'b', '=======', 'y',
+        '>>>>>>> theirs', 'c'
+    ]
+
+
+def test_merge3_with_key():
+    """testing if merge3 compares the changes with the key of the Diffs
+    """
+    base = ['a', 'b']
+    ours = ['a', 'c ']
+    theirs = ['a', ' c']
+    assert merge3(base, ours, theirs).has_conflicts
+    result = merge3(base, ours, theirs, key=ignore_whitespace)
+    assert not result.has_conflicts
+    assert result.merged() == ['a', 'c ']
+
+
+@pytest.mark.parametrize('algorithm', ['lcs', 'myers'])
+def test_merge3_random(algorithm):
+    """testing if merge3 returns the other list when only one of them is
+    changed and the regions cover all the lists
+    """
+    import random
+    rng = random.Random(2)
+    for _ in range(100):
+        base = [rng.choice('abcde') for _ in range(rng.randrange(20))]
+        other = [rng.choice('abcde') for _ in range(rng.randrange(20))]
+        assert merge3(base, base, other, algorithm=algorithm).merged() == \
+            other
+        assert merge3(base, other, base, algorithm=algorithm).merged() == \
+            other
+        result = merge3(base, other, list(reversed(base)),
+                        algorithm=algorithm)
+        for name in ['base', 'ours', 'theirs']:
+            values = []
+            for region in result.regions:
+                values.extend(getattr(region, '%s_values' % name))
+            assert values == getattr(result, name)
+
+
+def test_delta_round_trip():
+    """testing if apply_delta restores the B list exactly, even if the
+    values contain commas, newlines or non ASCII characters
+    """
+    import random
+    rng = random.Random(3)
+    values = ['a,b', '', 'x\ny', '\u011fü', '\udcff', 'task;1']
+    for _ in range(100):
+        a = [rng.choice(values) for _ in range(rng.randrange(15))]
+        b = [rng.choice(values) for _ in range(rng.randrange(15))]
+        for compact in [False, True]:
+            delta = Diff(a, b, compact=compact).to_delta()
+            assert apply_delta(a, delta) == b
+
+
+def test_delta_of_bytes_and_files(tmp_path):
+    """testing if the deltas of bytes and of files are applied
+    """
+    a = [b'a', b'\xff', b'c']
+    b = [b'a', b'b,', b'c', b'\x00']
+    assert apply_delta(a, Diff(a, b).to_delta()) == b
+
+    path_a = tmp_path / 'a.csv'
+    path_b = tmp_path / 'b.csv'
+    path_a.write_text('"a";1\n"b";2\n"c";3\n')
+    path_b.write_text('"a";1\n"b";4\n"c";3\n')
+    delta = diff_files(str(path_a), str(path_b)).to_delta()
+    with DiffableFile(str(path_a)) as base:
+        assert apply_delta(base, delta) == \
+            ['"a";1', '"b";4', '"c";3', '']
+
+
+def test_delta_is_compact():
+    """testing if the delta only stores the changed values
+    """
+    a = ['line %s' % i for i in range(1000)]
+    b = list(a)
+    b[500] = 'changed'
+    delta = Diff(a, b).to_delta()
+    assert len(delta) < 30
+
+
+def test_delta_errors():
+    """testing if invalid deltas are rejected
+    """
+    diff = Diff(['a', 'b'], ['a', 'c'])
+    delta = diff.to_delta()
+    with pytest.raises(ValueError):
+        apply_delta(['a'], delta)
+    with pytest.raises(ValueError):
+        apply_delta(['a', 'b'], b'XXXX' + delta[4:])
+    with pytest.raises(ValueError):
+        apply_delta(['a', 'b'], delta[:-1])
+    with pytest.raises(TypeError):
+        Diff([1], [2]).to_delta()
+    with pytest.raises(TypeError):
+        Diff(['a'], ['b', b'c']).to_delta()
+
+    # the length of the base is not known after unpickling
+    restored = pickle.loads(pickle.dumps(diff))
+    assert apply_delta(['a', 'b'], restored.to_delta()) == ['a', 'c']
+
+
+def make_pairs(count):
+    """Returns pairs of lists with a few changes.
+    """
+    pairs = []
+    for i in range(count):
+        a = ['line %s' % j for j in range(i * 10)]
+        b = list(a)
+        b[i:i + 1] = ['NEW %s' % i, 'line x']
+        pairs.append((a, b))
+    return pairs
+
+
+def test_batch_pairs():
+    """testing if the small pairs are batched together
+    """
+    pairs = [(['a'] * 10, ['b'] * 10)] * 5 + [(['a'] * 100, ['b'] * 100)]
+    batches = batch_pairs(pairs, batch_length=50)
+    assert [[index for index, a, b in batch] for batch in batches] == \
+        [[0, 1, 2], [3, 4, 5]]
+    batches = batch_pairs(pairs, chunksize=4)
+    assert [len(batch) for batch in batches] == [4, 2]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_diff_many(jobs):
+    """testing if diff_many returns the Diff of every pair bound to the lists
+    of the pair
+    """
+    pairs = make_pairs(20)
+    results = dict(diff_many(pairs, jobs=jobs, chunksize=3, key=ignore_case))
+    assert sorted(results) == list(range(20))
+    for index, (a, b) in enumerate(pairs):
+        diff = results[index]
+        assert diff.a is a and diff.b is b
+        assert diff.patch(a) == b
+        assert diff.to_s() == Diff(a, b, key=ignore_case).to_s()
+
+
+def test_diff_many_files(tmp_path):
+    """testing if DiffableFiles are sent to the worker processes by their
+    paths
+    """
+    path_a = tmp_path / 'a.csv'
+    path_b = tmp_path / 'b.csv'
+    path_a.write_text('a\nb\nc\n')
+    path_b.write_text('a\nc\nd\n')
+    a = DiffableFile(str(path_a))
+    b = DiffableFile(str(path_b))
+    restored = pickle.loads(pickle.dumps(a))
+    assert list(restored) == list(a)
+    restored.close()
+
+    (index, diff), = diff_many([(a, b)], jobs=2)
+    assert diff.patch(list(a)) == list(b)
+    a.close()
+    b.close()
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_diff_many_async(jobs):
+    """testing if diff_many_async yields the Diffs of all the pairs
+    """
+    import asyncio
+    pairs = make_pairs(10)
+
+    async def collect():
+        return [result async for result in diff_many_async(pairs, jobs=jobs)]
+
+    results = dict(asyncio.run(collect()))
+    assert sorted(results) == list(range(10))
+    for index, (a, b) in enumerate(pairs):
+        assert results[index].patch(a) == b
+
+
+def check_hunks(diff):
+    """Checks if the Hunks of the Diff patch its A list to its B list and are
+    separated by at least one matching value.
+    """
+    assert diff.patch(list(diff.a)) == list(diff.b)
+    assert diff.unpatch(list(diff.b)) == list(diff.a)
+    hunks = diff.hunks
+    for previous, hunk in zip(hunks, hunks[1:]):
+        assert hunk.a_idx > previous.a_idx + len(previous.delete_values)
+        assert hunk.b_idx > previous.b_idx + len(previous.insert_values)
+    assert all(hunk.delete or hunk.insert for hunk in hunks)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_diff_update(compact):
+    """testing if Diff.update keeps the Diff valid after random edits of the
+    B list
+    """
+    import random
+    rng = random.Random(4)
+    for _ in range(50):
+        a = [rng.choice('abcdef') for _ in range(rng.randrange(40))]
+        b = [rng.choice('abcdef') for _ in range(rng.randrange(40))]
+        diff = Diff(a, list(b), compact=compact)
+        for _ in range(10):
+            start = rng.randrange(len(diff.b) + 1)
+            stop = rng.randrange(start, len(diff.b) + 1)
+            values = [rng.choice('abcdefg') for _ in range(rng.randrange(4))]
+            expected = diff.b[:start] + values + diff.b[stop:]
+            assert diff.update(start, stop, values) is diff
+            assert diff.b == expected
+            check_hunks(diff)
+
+            # the table is repaired in place
+            table = list(diff.index_translation_table)
+            assert table == diff.rebuild_index_translation_table()
+            assert all(a[i] == diff.b[j]
+                       for i, j in enumerate(table) if j is not None)
+
+
+def test_diff_update_is_local():
+    """testing if Diff.update only diffs the window of the edit
+    """
+    a = ['line %s' % i for i in range(10000)]
+    b = list(a)
+    b[100] = 'changed'
+    b[9000:9001] = []
+    diff = Diff(a, b, algorithm='myers')
+    hunks = diff.hunks
+    table = diff.index_translation_table
+    diff.update(5000, 5001, ['edited', 'inserted'])
+    assert diff.index_translation_table is table
+    assert table[4999:5002] == [4999, None, 5002]
+    assert diff.hunks[0] is hunks[0]
+    assert diff.hunks[2] is hunks[1]
+    assert (diff.hunks[2].a_idx, diff.hunks[2].b_idx) == (9000, 9001)
+    assert [(h.a_idx, h.delete_values, h.insert_values)
+            for h in diff.hunks[1:2]] == [(5000, ['line 5000'],
+                                           ['edited', 'inserted'])]
+    assert diff.to_s() == Diff(a, diff.b, algorithm='myers').to_s()
+
+
+def test_diff_update_errors():
+    """testing if Diff.update checks the range and the lists
+    """
+    diff = Diff(['a'], ['b'])
+    with pytest.raises(IndexError):
+        diff.update(1, 2, [])
+    restored = pickle.loads(pickle.dumps(diff))
+    with pytest.raises(ValueError):
+        restored.update(0, 1, [])
+    for b in [('b',), 'b']:
+        with pytest.raises(TypeError) as error:
+            Diff(['a'], b).update(0, 1, [])
+        assert 'should be a list' in str(error.value)
+
+
+def test_diff_update_restored_compact(tmp_path):
+    """testing if Diff.update works on restored compact Diffs bound to new
+    lists
+    """
+    a = ['a', 'b', 'c', 'd', 'e']
+    b = ['a', 'x', 'c', 'd', 'y']
+    restored = pickle.loads(pickle.dumps(Diff(a, b, compact=True)))
+    diff = restored.bind(list(a), list(b))
+    diff.update(0, 0, ['Q'])
+    check_hunks(diff)
+    assert diff.b == ['Q'] + b
+    cache = DiffCache(directory=str(tmp_path))
+    cache.diff(a, b, compact=True)
+    diff = cache.diff(a, list(b), compact=True)
+    diff.update(0, 0, ['Q'])
+    check_hunks(diff)
+
+
+def test_merge3_with_restored_diffs():
+    """testing if MergeResult rebuilds the index translation tables of bound
+    Diffs
+    """
+    base = ['a', 'b', 'c']
+    ours = ['a', 'x', 'b', 'c']
+    theirs = ['a', 'b', 'c', 'y']
+    ours_diff = pickle.loads(pickle.dumps(Diff(base, ours))).bind(base, ours)
+    theirs_diff = pickle.loads(pickle.dumps(Diff(base, theirs))).bind(
+        base, theirs
+    )
+    result = MergeResult(base, ours, theirs, ours_diff, theirs_diff)
+    assert result.merged() == ['a', 'x', 'b', 'c', 'y']
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_diff_invert(compact):
+    """testing if Diff.invert returns the Diff of the B and A lists
+    """
+    import random
+    rng = random.Random(5)
+    for _ in range(50):
+        a = [rng.choice('abcdef') for _ in range(rng.randrange(30))]
+        b = [rng.choice('abcdef') for _ in range(rng.randrange(30))]
+        diff = Diff(a, b, compact=compact)
+        inverted = diff.invert()
+        assert (inverted.a, inverted.b) == (b, a)
+        check_hunks(inverted)
+        assert inverted.invert().to_s() == diff.to_s()
+        assert len(inverted.rebuild_index_translation_table()) == len(b)
+
+
+@pytest.mark.parametrize('algorithm', ['lcs', 'myers'])
+def test_diff_compose(algorithm):
+    """testing if Diff.compose combines the Diffs of a chain of versions
+    """
+    import random
+    rng = random.Random(6)
+    for _ in range(100):
+        versions = [[rng.choice('abcdef') for _ in range(rng.randrange(30))]]
+        for _ in range(4):
+            values = list(versions[-1])
+            for _ in range(rng.randrange(4)):
+                start = rng.randrange(len(values) + 1)
+                stop = min(len(values), start + rng.randrange(3))
+                values[start:stop] = [
+                    rng.choice('abcdefg') for _ in range(rng.randrange(3))
+                ]
+            versions.append(values)
+        diffs = [Diff(a, b, algorithm=algorithm)
+                 for a, b in zip(versions, versions[1:])]
+        composed = diffs[0]
+        for diff in diffs[1:]:
+            composed = composed.compose(diff)
+            check_hunks(composed)
+        assert (composed.a, composed.b) == (versions[0], versions[-1])
+        assert composed.invert().patch(versions[-1]) == versions[0]
+
+
+def test_diff_compose_restored():
+    """testing if Diff.compose works with the Hunks only and cancels the
+    reverted changes
+    """
+    a = ['line %s' % i for i in range(10000)]
+    b = list(a)
+    b[100] = 'changed'
+    b[5000:5000] = ['inserted']
+    c = list(b)
+    c[100] = 'line 100'
+    c[8000] = 'changed'
+    ab = pickle.loads(pickle.dumps(Diff(a, b, algorithm='myers')))
+    bc = pickle.loads(pickle.dumps(Diff(b, c, algorithm='myers')))
+    composed = ab.compose(bc)
+    assert composed.a is None
+    assert [(h.a_idx, h.b_idx, h.delete_values, h.insert_values)
+            for h in composed.hunks] == [
+        (5000, 5000, [], ['inserted']),
+        (7999, 8000, ['line 7999'], ['changed']),
+    ]
+    assert composed.patch(a) == c
+    assert ab.compose(ab.invert()).hunks == []
+
+    with pytest.raises(ValueError):
+        Diff(a, b).compose(Diff(a[1:], c))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+import time
+
+from pytj.benchmark import (WORKLOADS, calibrate, compare_with_baseline,
+                            median, run_benchmarks)
+
+
+def test_workloads_are_deterministic():
+    """testing if the workloads return the same lists for the same size
+    """
+    for workload in WORKLOADS.values():
+        assert workload(50) == workload(50)
+
+
+def test_run_benchmarks():
+    """testing if run_benchmarks returns a result for every case
+    """
+    results = run_benchmarks(['sparse', 'disjoint'], [50], ['lcs', 'myers'],
+                             repeat=3, min_duration=0.001)
+    assert sorted(results) == [
+        'disjoint/50/lcs', 'disjoint/50/myers',
+        'sparse/50/lcs', 'sparse/50/myers'
+    ]
+    for result in results.values():
+        assert result['time'] >= 0
+        assert result['relative_time'] >= 0
+        assert result['spread'] >= 0
+        assert result['peak_memory'] > 0
+        assert set(result['phases']) == \
+            set(['intern', 'diff', 'hunks', 'patch', 'edit_script'])
+
+
+def test_calibrate():
+    """testing if calibrate returns the time of a single workload, which is
+    repeated for at least the given duration
+    """
+    start = time.perf_counter()
+    assert calibrate(repeat=3, min_duration=0.01) > 0
+    assert time.perf_counter() - start >= 0.03
+
+
+def test_median():
+    """testing if median returns the middle value
+    """
+    assert median([3, 1, 2]) == 2
+    assert median([4, 1, 3, 2]) == 2.5
+
+
+def test_compare_with_baseline():
+    """testing if compare_with_baseline reports the regressions only
+    """
+    baseline = {
+        'a': {'relative_time': 1.0, 'spread': 0.0, 'peak_memory': 100},
+        'b': {'relative_time': 1.0, 'spread': 0.0, 'peak_memory': 100},
+        'd': {'relative_time': 1.0, 'spread': 0.0, 'peak_memory': 100},
+        'e': {'relative_time': 1.0, 'spread': 0.2, 'peak_memory': 100},
+    }
+    # the absolute time of "a" is slower, but not relative to the machine
+    results = {
+        'a': {'relative_time': 1.2, 'time': 9.0, 'peak_memory': 100},
+        'b': {'relative_time': 1.0, 'time': 1.0, 'peak_memory': 200},
+        'c': {'relative_time': 9.0, 'time': 9.0, 'peak_memory': 900},
+        'd': {'relative_time': 1.5, 'time': 1.0, 'peak_memory': 100},
+        'e': {'relative_time': 1.5, 'time': 1.0, 'peak_memory': 100},
+    }
+    regressions = compare_with_baseline(results, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('b: peak_memory')
+    assert regressions[1].startswith('d: relative_time')
+
+    # the noisy runs allow a larger increase
+    results['e']['spread'] = 0.3
+    results['e']['relative_time'] = 1.8
+    assert compare_with_baseline(results, baseline) == regressions
+
+    # the times of the fast cases are not compared
+    assert compare_with_baseline(
+        results, baseline, min_relative_time=2.0
+    ) == regressions[:1]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+
+import pytest
+from pytj.history import HistoryStore
+
+
+def make_versions(count):
+    """Returns the given number of versions of a report, every version
+    changes a single line of the previous one.
+    """
+    lines = ['"Task %s";"2017-01-01";"%s"' % (i, i) for i in range(200)]
+    versions = []
+    for i in range(count):
+        lines = list(lines)
+        lines[(i * 7) % len(lines)] = '"Task";"changed";"%s"' % i
+        versions.append(lines)
+    return versions
+
+
+def test_history_store_get_every_version(tmp_path):
+    """testing if every stored version is reconstructed
+    """
+    store = HistoryStore(str(tmp_path), snapshot_interval=4)
+    versions = make_versions(10)
+    for i, lines in enumerate(versions):
+        assert store.add('reports/Resources.csv', lines) == i
+
+    assert store.names() == ['reports/Resources.csv']
+    snapshots = [entry['snapshot']
+                 for entry in store.versions('reports/Resources.csv')]
+    assert snapshots == [True, False, False, False] * 2 + [True, False]
+
+    # a new store reads the index and has no cached versions
+    store = HistoryStore(str(tmp_path), snapshot_interval=4)
+    for i in [7, 0, 9, 3, 8, -1]:
+        assert store.get('reports/Resources.csv', i) == versions[i]
+
+
+def test_history_store_grows_with_the_changes(tmp_path):
+    """testing if the deltas are much smaller than the snapshots
+    """
+    store = HistoryStore(str(tmp_path), snapshot_interval=10)
+    for lines in make_versions(10):
+        store.add('report', lines)
+    entries = store.versions('report')
+    assert all(entry['size'] * 50 < entries[0]['size']
+               for entry in entries[1:])
+    assert store.size() == sum(
+        os.path.getsize(os.path.join(str(tmp_path), entry['file']))
+        for entry in entries
+    )
+
+
+def test_history_store_add_file(tmp_path):
+    """testing if the files are stored as the list of their lines
+    """
+    path = tmp_path / 'report.csv'
+    path.write_text('a;1\nb;2\n')
+    store = HistoryStore(str(tmp_path / 'store'))
+    store.add_file('report.csv', str(path))
+    path.write_text('a;1\nb;3\n')
+    store.add_file('report.csv', str(path))
+    assert store.get('report.csv', 0) == ['a;1', 'b;2', '']
+    assert store.get('report.csv') == ['a;1', 'b;3', '']
+
+
+def test_history_store_errors(tmp_path):
+    """testing if the missing and corrupted versions are reported
+    """
+    store = HistoryStore(str(tmp_path))
+    with pytest.raises(KeyError):
+        store.get('report')
+    store.add('report', ['a', 'b'])
+    store.add('report', ['a', 'c'])
+    with pytest.raises(IndexError):
+        store.get('report', 2)
+
+    store = HistoryStore(str(tmp_path))
+    store.index['report'][1]['sha1'] = 'x'
+    with pytest.raises(ValueError):
+        store.get('report', 1)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+from collections import OrderedDict
+
+import pytest
+from pytj.report_diff import (CsvDiff, HtmlCanonicalizer, HtmlDiff,
+                              read_csv)
+from pytj.testing import ReferenceGenerator
+
+
+HEADER = ['BSI', 'Name', 'Effort']
+
+
+def test_read_csv():
+    """testing if read_csv parses the quoted and the numeric cells
+    """
+    path = os.path.join(
+        ReferenceGenerator.test_suite_path, 'CSV-Reports', 'refs',
+        'taskreport.csv'
+    )
+    header, rows = read_csv(path)
+    assert header[:6] == \
+        ['BSI', 'Name', 'Start', 'End', 'Duration', 'Effort']
+    assert rows[1][:2] == ['1.1', '  Plan A']
+    assert all(len(row) == len(header) for row in rows)
+    assert CsvDiff(header, rows, header, rows).is_equal()
+
+
+def test_csv_diff_ignores_the_row_order_and_small_drifts():
+    """testing if the rows are aligned by their keys and the numeric cells
+    are compared with the tolerance
+    """
+    a = [['1', 'Jill', '42.5'], ['2', 'Jack', '17.0'], ['3', 'Joe', '']]
+    b = [['3', 'Joe', ''], ['1', 'Jill', '42.500001'], ['2', 'Jack', '17.0']]
+    diff = CsvDiff(HEADER, a, HEADER, b, tolerance=1e-3)
+    assert diff.changed == []
+    assert diff.moved == [('3', 0)]
+    assert not diff.is_equal()
+    assert diff.is_equal(ignore_order=True)
+    assert diff.to_s() == 'Moved row 3\n'
+
+    diff = CsvDiff(HEADER, a, HEADER, b)
+    assert diff.changed == [(('1', 0), [('Effort', '42.5', '42.500001')])]
+
+
+def test_csv_diff_added_removed_and_changed():
+    """testing if the added, removed and changed rows and columns are
+    reported
+    """
+    a = [['1', 'Jill', '42.5'], ['1.1', 'Task', 'x'], ['2', 'Jack', '17']]
+    b_header = ['Name', 'BSI', 'Effort', 'Duration']
+    b = [['Jill', '1', '40', '3'], ['Jack', '2', '17', '1'],
+         ['Joe', '3', '1', '1']]
+    diff = CsvDiff(HEADER, a, b_header, b, tolerance=0.1)
+    assert diff.added_columns == ['Duration']
+    assert diff.removed_columns == []
+    assert diff.removed == [('1.1', 0)]
+    assert diff.added == [('3', 0)]
+    assert diff.moved == []
+    assert diff.to_s() == (
+        'Added column Duration\n'
+        'Removed row 1.1\n'
+        'Added row 3\n'
+        "Changed row 1 column Effort: '42.5' != '40'\n"
+    )
+
+
+def test_csv_diff_repeated_keys():
+    """testing if the repeated key values are aligned in order
+    """
+    header = ['Name', 'Effort']
+    a = [['Jill', '1'], ['Jill', '2']]
+    b = [['Jill', '1'], ['Jill', '3']]
+    diff = CsvDiff(header, a, header, b)
+    assert diff.changed == [(('Jill', 1), [('Effort', '2', '3')])]
+    assert diff.to_s() == "Changed row Jill (#2) column Effort: '2' != '3'\n"
+
+
+def test_csv_diff_repeated_columns(tmp_path):
+    """testing if the repeated column names are aligned in order, so a change
+    of a later copy is reported
+    """
+    ref = tmp_path / 'ref.csv'
+    report = tmp_path / 'report.csv'
+    ref.write_text('"Id";"Id";"Id"\n"t1";"a";"b"\n"t2";"c";"d"\n')
+    report.write_text('"Id";"Id";"Id"\n"t1";"a";"x"\n"t2";"c";"d"\n')
+    diff = CsvDiff.from_files(str(ref), str(report))
+    assert not diff.is_equal()
+    assert diff.to_s() == \
+        "Changed row t1 column Id (#3): 'b' != 'x'\n"
+
+    header = ['BSI', 'Date', 'Date']
+    diff = CsvDiff(header, [['1', 'x', 'y']], header[:2], [['1', 'x']])
+    assert diff.removed_columns == ['Date (#2)']
+    assert diff.changed == []
+
+
+def test_csv_diff_unknown_key():
+    """testing if a ValueError is raised for an unknown key column
+    """
+    with pytest.raises(ValueError):
+        CsvDiff(HEADER, [], HEADER, [], key='Id')
+
+
+def test_html_canonicalizer():
+    """testing if the HTML reports are converted to canonical tokens
+    """
+    parser = HtmlCanonicalizer(
+        volatile_attributes=['id'], volatile_text=r'\d\d:\d\d'
+    )
+    parser.feed('<!DOCTYPE  html>\n<!-- generated -->\n<td  id="x12" '
+                'style="a:1;"  class=\'c\'>Fix &amp;\n  ship <b>now</b>'
+                '<br/></td><p>&lt;b&gt; at 12:30</p>')
+    parser.close()
+    assert parser.tokens == [
+        '<!DOCTYPE html>', '<td class="c" style="a:1;">', 'Fix', '&amp;',
+        'ship', '<b>', 'now', '</b>', '<br>', '</td>', '<p>', '&lt;b&gt;',
+        'at', '*', '</p>'
+    ]
+
+
+def test_html_canonicalizer_self_closing_tags():
+    """testing if the void elements are equal with and without the slash and
+    the other self-closing tags are equal to a start and an end tag
+    """
+    def tokenize(text):
+        parser = HtmlCanonicalizer()
+        parser.feed(text)
+        parser.close()
+        return parser.tokens
+
+    assert tokenize('a<br>b<hr class="x">') == \
+        tokenize('a<br/>b<hr class="x" />') == \
+        tokenize('a<br></br>b<hr class="x"></hr>') == \
+        ['a', '<br>', 'b', '<hr class="x">']
+    assert tokenize('<div/><span />') == tokenize('<div></div><span></span>')
+
+
+def test_html_diff_ignores_the_reflow(tmp_path):
+    """testing if HtmlDiff reports only the changed tokens and caches the
+    tokens of the reference
+    """
+    ref = tmp_path / 'ref.html'
+    report = tmp_path / 'report.html'
+    ref.write_text('<table id="t1">\n<tr><td>Task A</td><td>5d</td></tr>\n'
+                   '</table>\n')
+    report.write_text('<table id="t2"><tr>\n  <td>Task A</td>\n'
+                      '  <td>5d</td>\n</tr></table>')
+    HtmlDiff.cache.clear()
+    diff = HtmlDiff.from_files(str(ref), str(report),
+                               volatile_attributes=['id'])
+    assert diff.is_equal()
+    assert diff.to_s() == ''
+    tokens = HtmlDiff.cache[str(ref)][1]
+    assert not HtmlDiff.from_files(str(ref), str(report)).is_equal()
+    assert HtmlDiff.cache[str(ref)][1] is not tokens
+
+    report.write_text('<table><tr><td>Task A</td><td>6d</td></tr></table>')
+    diff = HtmlDiff.from_files(str(ref), str(report),
+                               volatile_attributes=['id'])
+    assert diff.a_tokens == tokens
+    assert HtmlDiff.reference_tokens(
+        str(ref), volatile_attributes=['id']
+    ) is diff.a_tokens
+    assert not diff.is_equal()
+    assert diff.to_s() == '@@ -8,1 +8,1 @@\n-5d\n+6d\n'
+
+
+def test_html_diff_cache_is_bounded(tmp_path, monkeypatch):
+    """testing if HtmlDiff keeps the tokens of the recently used reference
+    files only
+    """
+    monkeypatch.setattr(HtmlDiff, 'cache', OrderedDict())
+    monkeypatch.setattr(HtmlDiff, 'cache_size', 2)
+    paths = []
+    for name in 'abc':
+        path = tmp_path / ('%s.html' % name)
+        path.write_text('<p>%s</p>' % name)
+        paths.append(str(path))
+    tokens = HtmlDiff.reference_tokens(paths[0])
+    HtmlDiff.reference_tokens(paths[1])
+    assert HtmlDiff.reference_tokens(paths[0]) is tokens
+    HtmlDiff.reference_tokens(paths[2])
+    assert list(HtmlDiff.cache) == [paths[0], paths[2]]
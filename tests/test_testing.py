@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+
+import os
+
+import pytest
+
+from pytj import testing
+from pytj.testing import (IncludeGraph, MessageCatalog, MessageChecker,
+                          ProjectResult, ProjectRunner, ReferenceGenerator,
+                          ReferenceManifest, RunSummary)
+
+
+def check_project(tjp_file):
+    """A ProjectRunner task for the tests
+    """
+    if 'error' in tjp_file:
+        raise RuntimeError('broken project')
+    if 'bad' in tjp_file:
+        return 'bad project'
+
+
+def test_project_runner_in_a_process_pool():
+    """testing if ProjectRunner runs the task for all the projects in a
+    process pool and merges the results
+    """
+    tjp_files = ['good1.tjp', 'bad.tjp', 'good2.tjp', 'error.tjp']
+    results = []
+    summary = ProjectRunner(jobs=2).run(
+        tjp_files, check_project, callback=results.append
+    )
+
+    assert len(results) == 4
+    assert sorted(r.tjp_file for r in summary.passed) == \
+        ['good1.tjp', 'good2.tjp']
+    failed = dict((r.tjp_file, r.message) for r in summary.failed)
+    assert failed == {
+        'bad.tjp': 'bad project',
+        'error.tjp': 'RuntimeError: broken project'
+    }
+    assert all(r.wall_time >= 0 for r in summary.results)
+
+
+def test_project_runner_in_the_current_process():
+    """testing if ProjectRunner runs the task in the current process for a
+    single job
+    """
+    summary = ProjectRunner(jobs=1).run(['good.tjp', 'bad.tjp'], check_project)
+    assert [r.passed for r in summary.results] == [True, False]
+
+
+def test_run_summary_report():
+    """testing the RunSummary report
+    """
+    summary = RunSummary([
+        ProjectResult('a.tjp', True, 0.5),
+        ProjectResult('b.tjp', False, 2.0, 'b failed'),
+        ProjectResult('c.tjp', True, 1.0),
+    ], 2.5)
+    assert [r.tjp_file for r in summary.slowest(2)] == ['b.tjp', 'c.tjp']
+    assert summary.report(2) == (
+        'Slowest projects:\n'
+        '     2.000s b.tjp\n'
+        '     1.000s c.tjp\n'
+        'FAILED b.tjp\n'
+        'b failed\n'
+        '2 passed, 1 failed in 2.500s (3.500s of project time)'
+    )
+
+
+def test_compare_reports(tmp_path):
+    """testing if compare_reports() reports the differences and the missing
+    references
+    """
+    output_dir = tmp_path / 'output'
+    refs_dir = tmp_path / 'refs'
+    output_dir.mkdir()
+    refs_dir.mkdir()
+    (output_dir / 'same.csv').write_text('a;b\n1;2\n')
+    (refs_dir / 'same.csv').write_text('a;b\n1;2\n')
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) is None
+
+    (output_dir / 'changed.csv').write_text('a;b\n1;3\n')
+    (refs_dir / 'changed.csv').write_text('a;b\n1;2\n')
+    (output_dir / 'new.csv').write_text('a;b\n')
+    ref = os.path.join(str(refs_dir), 'changed.csv')
+    report = os.path.join(str(output_dir), 'changed.csv')
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) == (
+        '--- %s\n+++ %s\n@@ -1,3 +1,3 @@\n a;b\n-1;2\n+1;3\n \n'
+        'Missing reference %s\n' % (
+            ref, report, os.path.join(str(refs_dir), 'new.csv')
+        )
+    )
+
+
+def test_project_files():
+    """testing if project_files() lists the projects of a TestSuite directory
+    """
+    tjp_files = ReferenceGenerator.project_files('CSV-Reports')
+    assert len(tjp_files) == 18
+    assert os.path.basename(tjp_files[0]) == 'Leave.tjp'
+
+
+def test_reference_manifest(tmp_path):
+    """testing if ReferenceManifest stores the sizes and digests of the
+    references
+    """
+    refs_dir = tmp_path / 'refs'
+    refs_dir.mkdir()
+    (refs_dir / 'a.csv').write_text('a;b\n1;2\n')
+    (refs_dir / 'b.csv').write_text('c\n')
+
+    manifest = ReferenceManifest(str(refs_dir))
+    manifest.update()
+    assert sorted(os.listdir(str(refs_dir))) == \
+        ['.manifest.json', 'a.csv', 'b.csv']
+
+    manifest = ReferenceManifest(str(refs_dir))
+    assert manifest.entries['a.csv']['size'] == 8
+    assert manifest.entries['a.csv']['sha1'] == \
+        ReferenceManifest.file_digest(str(refs_dir / 'a.csv'))
+
+    (refs_dir / 'b.csv').unlink()
+    manifest.update()
+    assert sorted(manifest.entries) == ['a.csv']
+
+
+def test_reference_manifest_matches(tmp_path):
+    """testing if ReferenceManifest.matches() compares the digests
+    """
+    refs_dir = tmp_path / 'refs'
+    refs_dir.mkdir()
+    (refs_dir / 'a.csv').write_text('a;b\n1;2\n')
+    ReferenceManifest(str(refs_dir)).update()
+
+    report = tmp_path / 'a.csv'
+    report.write_text('a;b\n1;2\n')
+    manifest = ReferenceManifest(str(refs_dir))
+    assert manifest.matches('a.csv', str(report))
+    assert not manifest.matches('missing.csv', str(report))
+
+    report.write_text('a;b\n1;3\n')
+    assert not manifest.matches('a.csv', str(report))
+
+    # a changed reference is hashed again
+    (refs_dir / 'a.csv').write_text('a;b\n1;3\n1;4\n')
+    report.write_text('a;b\n1;3\n1;4\n')
+    assert manifest.matches('a.csv', str(report))
+
+
+
+def test_compare_reports_saves_the_refreshed_manifest(tmp_path,
+                                                      monkeypatch):
+    """testing if compare_reports() saves the manifest entries of the
+    references with another modification time, so they are hashed once
+    """
+    output_dir = tmp_path / 'output'
+    refs_dir = tmp_path / 'refs'
+    output_dir.mkdir()
+    refs_dir.mkdir()
+    for directory in [output_dir, refs_dir]:
+        (directory / 'a.csv').write_text('a;b\n1;2\n')
+        (directory / 'b.csv').write_text('c\n')
+    ReferenceManifest(str(refs_dir)).update()
+    # a fresh checkout
+    os.utime(str(refs_dir / 'a.csv'), ns=(0, 0))
+    os.utime(str(refs_dir / 'b.csv'), ns=(0, 0))
+
+    hashed = []
+    file_digest = ReferenceManifest.file_digest
+
+    def counting_file_digest(path):
+        hashed.append(os.path.relpath(path, str(tmp_path)))
+        return file_digest(path)
+
+    monkeypatch.setattr(
+        ReferenceManifest, 'file_digest', staticmethod(counting_file_digest)
+    )
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) is None
+    assert sorted(hashed) == [
+        os.path.join('output', 'a.csv'), os.path.join('output', 'b.csv'),
+        os.path.join('refs', 'a.csv'), os.path.join('refs', 'b.csv'),
+    ]
+    assert ReferenceManifest(str(refs_dir)).entries['a.csv']['mtime'] == 0
+
+    del hashed[:]
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) is None
+    assert sorted(hashed) == [
+        os.path.join('output', 'a.csv'), os.path.join('output', 'b.csv')
+    ]
+
+def test_compare_reports_skips_the_diff_of_matching_digests(tmp_path,
+                                                            monkeypatch):
+    """testing if compare_reports() only diffs the reports with different
+    digests
+    """
+    output_dir = tmp_path / 'output'
+    refs_dir = tmp_path / 'refs'
+    output_dir.mkdir()
+    refs_dir.mkdir()
+    (output_dir / 'same.csv').write_text('a;b\n1;2\n')
+    (refs_dir / 'same.csv').write_text('a;b\n1;2\n')
+    ReferenceManifest(str(refs_dir)).update()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('diff_files should not be called')
+
+    monkeypatch.setattr(testing, 'diff_files', fail)
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) is None
+
+
+def test_collect_messages(tmp_path):
+    """testing if collect_messages returns the MARK comments in reverse
+    order
+    """
+    path = tmp_path / 'test.tjp'
+    path.write_text(
+        'project "test" 2017-01-01 +1m\n'
+        '# MARK: warning 3 no_report_defined\n'
+        '# MARK: error 8 task_depend_multi\t\n'
+    )
+    assert MessageChecker.collect_messages(str(path)) == [
+        ('error', 8, 'task_depend_multi'),
+        ('warning', 3, 'no_report_defined'),
+    ]
+
+
+class FakeMessage(object):
+    """A message of a TaskJuggler run for the check_messages() tests.
+    """
+
+    def __init__(self, type, line_no, id):
+        self.type = type
+        self.line_no = line_no
+        self.id = id
+        # the message is its own source file info
+        self.source_file_info = self
+
+
+class FakeTaskJuggler(object):
+    """A TaskJuggler run with the given messages.
+    """
+
+    def __init__(self, messages):
+        self.message_handler = self
+        self.messages = [FakeMessage(*message) for message in messages]
+
+
+def test_check_messages(tmp_path, monkeypatch):
+    """testing if check_messages compares the messages of the run with the
+    MARK comments of the file in order
+    """
+    path = tmp_path / 'test.tjp'
+    path.write_text(
+        '# MARK: warning 3 no_report_defined\n'
+        '# MARK: error 8 task_depend_multi\n'
+    )
+    monkeypatch.setattr(MessageChecker, 'catalog', None)
+    MessageChecker.check_messages(FakeTaskJuggler([
+        ('warning', 3, 'no_report_defined'),
+        ('error', 8, 'task_depend_multi'),
+    ]), str(path), jobs=2)
+    assert MessageChecker.catalog.jobs == 2
+
+    for messages in [
+        [('warning', 3, 'no_report_defined')],
+        [('warning', 3, 'no_report_defined'), ('error', 9,
+                                               'task_depend_multi')],
+        [('warning', 3, 'no_report_defined'),
+         ('error', 8, 'task_depend_multi'), ('error', 9, 'extra')],
+    ]:
+        with pytest.raises(AssertionError):
+            MessageChecker.check_messages(
+                FakeTaskJuggler(messages), str(path)
+            )
+
+
+def test_message_catalog(tmp_path):
+    """testing if MessageCatalog scans the directory once and reads the
+    changed files again
+    """
+    (tmp_path / 'sub').mkdir()
+    first = tmp_path / 'first.tjp'
+    second = tmp_path / 'sub' / 'second.tjp'
+    first.write_text('# MARK: error 1 first\n')
+    second.write_text('no marks\n')
+    (tmp_path / 'ignored.tji').write_text('# MARK: error 1 ignored\n')
+
+    catalog = MessageCatalog(str(tmp_path))
+    assert catalog.messages(str(first)) == [('error', 1, 'first')]
+    assert catalog.scanned
+    assert sorted(catalog.entries) == [str(first), str(second)]
+    assert catalog.messages(str(second)) == []
+
+    second.write_text('# MARK: warning 2 changed_and_longer\n')
+    assert catalog.messages(str(second)) == \
+        [('warning', 2, 'changed_and_longer')]
+
+    second.unlink()
+    catalog.scan()
+    assert sorted(catalog.entries) == [str(first)]
+
+
+def test_message_catalog_of_the_test_suite():
+    """testing if the TestSuite is scanned in a process pool with the same
+    result
+    """
+    catalog = MessageCatalog(jobs=2)
+    catalog.scan()
+    path = os.path.join(
+        ReferenceGenerator.test_suite_path, 'Scheduler', 'Errors',
+        'task_depend_multi.tjp'
+    )
+    assert catalog.messages(path) == MessageChecker.collect_messages(path)
+    assert catalog.messages(path)[-1][2] == 'task_depend_multi'
+    assert sum(1 for entry in catalog.entries.values() if entry[2]) == 168
+
+
+def test_compare_reports_csv_mode(tmp_path):
+    """testing if compare_reports() compares the CSV reports row by row with
+    the given tolerance
+    """
+    output_dir = tmp_path / 'output'
+    refs_dir = tmp_path / 'refs'
+    output_dir.mkdir()
+    refs_dir.mkdir()
+    (refs_dir / 'report.csv').write_text('"BSI";"Effort"\n1;2.0\n2;3.0\n')
+    (output_dir / 'report.csv').write_text(
+        '"BSI";"Effort"\n1;2.00001\n2;3.0\n'
+    )
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir), csv_tolerance=1e-3
+    ) is None
+
+    (output_dir / 'report.csv').write_text('"BSI";"Effort"\n2;3.0\n1;2.0\n')
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir), csv_tolerance=1e-3
+    ) == '%s differs from %s\nMoved row 1\n' % (
+        os.path.join(str(output_dir), 'report.csv'),
+        os.path.join(str(refs_dir), 'report.csv')
+    )
+
+
+def test_include_graph(tmp_path):
+    """testing if IncludeGraph finds the projects whose own source or
+    transitive includes are changed since the last save
+    """
+    (tmp_path / 'include').mkdir()
+    (tmp_path / 'a.tjp').write_text('include "checks.tji"\n')
+    (tmp_path / 'b.tjp').write_text("  include 'include/outer.tji' { }\n")
+    (tmp_path / 'c.tjp').write_text('project\n')
+    (tmp_path / 'checks.tji').write_text('# checks\n')
+    (tmp_path / 'include' / 'outer.tji').write_text(
+        'include "inner.tji"\ninclude "../include/outer.tji"\n'
+    )
+    inner = tmp_path / 'include' / 'inner.tji'
+    inner.write_text('# inner\n')
+
+    graph = IncludeGraph(str(tmp_path))
+    names = [os.path.basename(p) for p in graph.projects]
+    assert names == ['a.tjp', 'b.tjp', 'c.tjp']
+    assert graph.dependencies(str(tmp_path / 'b.tjp')) == [
+        str(tmp_path / 'b.tjp'),
+        str(tmp_path / 'include' / 'inner.tji'),
+        str(tmp_path / 'include' / 'outer.tji'),
+    ]
+    assert graph.changed_projects() == graph.projects
+    graph.save(graph.projects[:2])
+
+    graph = IncludeGraph(str(tmp_path))
+    assert graph.changed_projects() == [str(tmp_path / 'c.tjp')]
+    graph.save(graph.projects)
+
+    inner.write_text('# changed\n')
+    graph = IncludeGraph(str(tmp_path))
+    assert graph.changed_projects() == [str(tmp_path / 'b.tjp')]
+    graph.save(graph.projects)
+
+    (tmp_path / 'c.tjp').unlink()
+    (tmp_path / 'checks.tji').unlink()
+    graph = IncludeGraph(str(tmp_path))
+    assert graph.changed_projects() == [str(tmp_path / 'a.tjp')]
+    graph.save([])
+    assert sorted(graph.state) == ['a.tjp', 'b.tjp']
+
+
+def test_delete_old_reports(tmp_path):
+    """testing if delete_old_reports() removes only the numbered reports of
+    the given project
+    """
+    for name in ['Project-1.csv', 'Project-2-Tasks.html', 'Project.csv',
+                 'Project-a.csv', 'Project-1.tji', 'Other-1.csv']:
+        (tmp_path / name).write_text('')
+    ReferenceGenerator.delete_old_reports(str(tmp_path / 'Project'))
+    assert sorted(os.listdir(str(tmp_path))) == [
+        'Other-1.csv', 'Project-1.tji', 'Project-a.csv', 'Project.csv'
+    ]
+
+
+def test_compare_reports_html_mode(tmp_path):
+    """testing if compare_reports() compares the HTML reports by their
+    canonical tokens without the volatile attributes
+    """
+    output_dir = tmp_path / 'output'
+    refs_dir = tmp_path / 'refs'
+    output_dir.mkdir()
+    refs_dir.mkdir()
+    (refs_dir / 'report.html').write_text('<p id="a1">Task  A</p>\n')
+    (output_dir / 'report.html').write_text('<p id="b7">\nTask A\n</p>')
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir), html_volatile_attributes=['id']
+    ) is None
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir)
+    ) is not None
+
+    (output_dir / 'report.html').write_text('<p id="b7">Task B</p>')
+    assert ReferenceGenerator.compare_reports(
+        str(output_dir), str(refs_dir), html_volatile_attributes=['id']
+    ) == '%s differs from %s\n@@ -3,1 +3,1 @@\n-A\n+B\n' % (
+        os.path.join(str(output_dir), 'report.html'),
+        os.path.join(str(refs_dir), 'report.html')
+    )
+
+
+def copy_reports(tjp_file, output_dir):
+    """Generates the reports of a test project by copying its "report.*"
+    files.
+    """
+    directory = os.path.dirname(tjp_file)
+    for name in os.listdir(directory):
+        if name.startswith('report.'):
+            with open(os.path.join(directory, name)) as f:
+                text = f.read()
+            with open(os.path.join(output_dir, name), 'w') as f:
+                f.write(text)
+
+
+def test_compare_directory_html_mode(tmp_path, monkeypatch):
+    """testing if compare_directory() passes the HTML option to the
+    comparison of the reports
+    """
+    monkeypatch.setattr(
+        ReferenceGenerator, 'generate_reports', staticmethod(copy_reports)
+    )
+    (tmp_path / 'refs').mkdir()
+    (tmp_path / 'Project.tjp').write_text('project\n')
+    (tmp_path / 'refs' / 'report.html').write_text('<p id="a1">A<br></p>')
+    (tmp_path / 'report.html').write_text('<p id="b2">\nA<br/>\n</p>')
+    summary = ReferenceGenerator.compare_directory(str(tmp_path))
+    assert len(summary.failed) == 1
+    summary = ReferenceGenerator.compare_directory(
+        str(tmp_path), html_volatile_attributes=['id']
+    )
+    assert len(summary.passed) == 1
+
+
+def test_compare_directory_csv_mode(tmp_path, monkeypatch):
+    """testing if compare_directory() passes the CSV tolerance to the
+    comparison of the reports
+    """
+    monkeypatch.setattr(
+        ReferenceGenerator, 'generate_reports', staticmethod(copy_reports)
+    )
+    (tmp_path / 'refs').mkdir()
+    (tmp_path / 'Project.tjp').write_text('project\n')
+    (tmp_path / 'refs' / 'report.csv').write_text(
+        '"BSI";"Effort"\n1;2.0\n2;3.0\n'
+    )
+    (tmp_path / 'report.csv').write_text('"BSI";"Effort"\n2;3.0\n1;2.0001\n')
+    summary = ReferenceGenerator.compare_directory(str(tmp_path))
+    assert len(summary.failed) == 1
+    summary = ReferenceGenerator.compare_directory(
+        str(tmp_path), csv_tolerance=1e-3
+    )
+    assert len(summary.failed) == 1
+    assert summary.failed[0].message.endswith(
+        ' differs from %s\nMoved row 1\n' % (tmp_path / 'refs' / 'report.csv')
+    )
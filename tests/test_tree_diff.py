@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+import glob
+import os
+
+from pytj.report_diff import read_csv
+from pytj.testing import ReferenceGenerator
+from pytj.tree_diff import TreeDiff, TreeNode
+
+
+TJP = '''project "Test" 2017-01-01 +2m
+
+task plan "Plan" {
+  task a "Plan A" {
+    effort 10d
+  }
+  task b "Plan B" {
+    effort 5d # a comment with a {
+  }
+}
+task build "Build" {
+  task c "Build C" {
+    effort 3d
+  }
+}
+'''
+
+
+def kinds(tree_diff):
+    """Returns the kinds and the paths of the changes.
+    """
+    result = []
+    for change in tree_diff.changes:
+        node = change.b_node if change.a_node is None else change.a_node
+        result.append((change.kind, '/'.join(node.path)))
+    return result
+
+
+def test_from_tjp():
+    """testing if the tasks of a .tjp file are nested by their braces
+    """
+    root = TreeNode.from_tjp(TJP)
+    assert [child.id for child in root.children] == ['task plan', 'task build']
+    plan = root.children[0]
+    assert [child.id for child in plan.children] == ['task a', 'task b']
+    assert plan.children[1].label == (
+        '  task b "Plan B" {', '    effort 5d # a comment with a {', '  }'
+    )
+    assert plan.label == ('task plan "Plan" {', '}')
+    assert root.label[0] == 'project "Test" 2017-01-01 +2m'
+
+
+def test_tree_diff_identical():
+    """testing if identical trees have no changes
+    """
+    assert TreeDiff(TreeNode.from_tjp(TJP), TreeNode.from_tjp(TJP)).changes \
+        == []
+
+
+def test_tree_diff_change_insert_delete():
+    """testing if the changed, inserted and deleted subtrees are found
+    """
+    b = TJP.replace('effort 10d', 'effort 12d').replace(
+        '''  task c "Build C" {
+    effort 3d
+  }
+''', '''  task d "Build D" {
+    effort 1d
+  }
+''')
+    tree_diff = TreeDiff(TreeNode.from_tjp(TJP), TreeNode.from_tjp(b))
+    assert sorted(kinds(tree_diff)) == [
+        ('change', 'task plan/task a'),
+        ('delete', 'task build/task c'),
+        ('insert', 'task build/task d'),
+    ]
+
+
+def test_tree_diff_moved_subtree():
+    """testing if a subtree moved to another parent is a single move and its
+    changes are found too
+    """
+    b = TJP.replace('''  task b "Plan B" {
+    effort 5d # a comment with a {
+  }
+''', '').replace('''  task c "Build C" {''', '''  task b "Plan B" {
+    effort 6d
+  }
+  task c "Build C" {''')
+    tree_diff = TreeDiff(TreeNode.from_tjp(TJP), TreeNode.from_tjp(b))
+    assert kinds(tree_diff) == [
+        ('move', 'task plan/task b'),
+        ('change', 'task plan/task b'),
+    ]
+    assert tree_diff.to_s() == (
+        'move task plan/task b -> task build/task b\n'
+        'change task plan/task b\n'
+    )
+
+
+def read_refs_csv(name):
+    """Returns the header and the rows of a CSV report of the TestSuite.
+    """
+    return read_csv(os.path.join(
+        ReferenceGenerator.test_suite_path, 'CSV-Reports', 'refs', name
+    ))
+
+
+def test_tree_diff_of_bsi_rows():
+    """testing if the rows of a CSV report are nested by their BSI numbers
+    and a reordering of the siblings is a move
+    """
+    header, rows = read_refs_csv('taskreport.csv')
+    a = TreeNode.from_bsi_rows(rows)
+    assert [child.id for child in a.children[0].children] == \
+        ['Plan A', 'Plan B', 'Plan C']
+
+    # the BSI numbers stay in order when the rows are reordered
+    b_rows = [list(row) for row in rows]
+    b_rows[1][1:], b_rows[2][1:] = b_rows[2][1:], b_rows[1][1:]
+    b_rows[3][5] = '6.0'
+    tree_diff = TreeDiff(a, TreeNode.from_bsi_rows(b_rows))
+    assert sorted(kinds(tree_diff)) == [
+        ('change', 'Plan Work/Plan C'), ('move', 'Plan Work/Plan A')
+    ]
+
+
+def test_tree_diff_of_bsi_rows_moved_to_another_parent():
+    """testing if a row moved to another parent, which gets a new BSI
+    number, is a move of the node with the id of the id column
+    """
+    header, rows = read_refs_csv('sortByTree.csv')
+    a = TreeNode.from_bsi_rows(rows, id_column=2)
+    assert [child.id for child in a.children] == \
+        ['plan', 'execute', 'check']
+
+    b_rows = [list(row) for row in rows]
+    plan_c = b_rows.pop(3)
+    b_rows.insert(b_rows.index(rows[-1]), [
+        '2.6', '  Plan C', 'execute.plan_c', plan_c[3]
+    ])
+    tree_diff = TreeDiff(a, TreeNode.from_bsi_rows(b_rows, id_column=2))
+    assert tree_diff.to_s() == 'move plan/plan_c -> execute/plan_c\n'
+
+
+def test_tree_diff_of_indented_rows():
+    """testing if the rows of a CSV report without a BSI column are nested
+    by the indentation of their names and a moved subtree is a move
+    """
+    header, rows = read_refs_csv('alert.csv')
+    a = TreeNode.from_indented_rows(rows)
+    assert [child.id for child in a.children] == \
+        ['Plan Work', 'Execute Work', 'Check Work']
+    step_2 = a.children[1].children[1]
+    assert [child.id for child in step_2.children] == \
+        ['Step 2.1', 'Step 2.2']
+    assert step_2.children[0].label == ('Green',)
+    assert TreeDiff(a, TreeNode.from_indented_rows(rows)).changes == []
+
+    # move "Step 2" with its children below "Plan Work"
+    b_rows = [list(row) for row in rows]
+    moved = b_rows[6:9]
+    del b_rows[6:9]
+    moved[2][1] = '    Green'
+    b_rows[4:4] = moved
+    tree_diff = TreeDiff(a, TreeNode.from_indented_rows(b_rows))
+    assert kinds(tree_diff) == [
+        ('move', 'Execute Work/Step 2'),
+        ('change', 'Execute Work/Step 2/Step 2.2'),
+    ]
+
+
+def test_tree_diff_of_the_test_suite():
+    """testing if every .tjp file of the TestSuite is parsed and equal to
+    itself
+    """
+    pattern = os.path.join(ReferenceGenerator.test_suite_path, '*', '*.tjp')
+    for path in glob.glob(pattern)[:50]:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        a = TreeNode.from_tjp(text)
+        assert TreeDiff(a, TreeNode.from_tjp(text)).changes == []
+        lines = [line for node in a.iter_nodes() for line in node.label]
+        assert sorted(lines) == sorted(text.split('\n'))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# pyTJ
+# Copyright (C) 2017 Erkan Ozgur Yilmaz
+#
+# This file is part of pyTJ.
+#
+# pyTJ is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# pyTJ is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with pyTJ.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+
+import pytest
+from pytj.utils import write_atomically
+
+
+def test_write_atomically(tmp_path):
+    """testing if write_atomically replaces the file with the given bytes or
+    text without leaving the temporary file behind
+    """
+    path = tmp_path / 'data.json'
+    write_atomically(str(path), b'{}')
+    assert path.read_bytes() == b'{}'
+    write_atomically(str(path), u'{"ç": 1}')
+    assert path.read_bytes() == u'{"ç": 1}'.encode('utf-8')
+    assert os.listdir(str(tmp_path)) == ['data.json']
+
+
+def test_write_atomically_keeps_the_old_file_on_errors(tmp_path):
+    """testing if write_atomically keeps the old file and removes the
+    temporary file if the data can not be written
+    """
+    path = tmp_path / 'data.json'
+    path.write_text('old')
+    with pytest.raises(TypeError):
+        write_atomically(str(path), 42)
+    assert path.read_text() == 'old'
+    assert os.listdir(str(tmp_path)) == ['data.json']